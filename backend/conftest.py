@@ -1,6 +1,11 @@
 import pytest
 import os
+from django.core.cache import cache
 from rest_framework.test import APIClient
+from core import cache as app_cache
+from core import link_tokens
+from core import ingest
+from core import search
 from core.models import Invitation, Person, GlobalConfig, Accommodation, Room, WhatsAppSessionStatus, WhatsAppTemplate
 
 @pytest.fixture(autouse=True)
@@ -11,6 +16,16 @@ def set_test_env():
     if 'DJANGO_TEST_MODE' in os.environ:
         del os.environ['DJANGO_TEST_MODE']
 
+@pytest.fixture(autouse=True)
+def clear_app_cache():
+    """Evita che valori cachati da un test (poi rollbackato) filtrino nel successivo"""
+    cache.clear()
+    app_cache.clear_local()
+    link_tokens.CODE_INDEX.clear()
+    search.NGRAM_INDEX.clear()
+    ingest.INTERACTIONS._drain(len(ingest.INTERACTIONS))
+    yield
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     GlobalConfig, ConfigurableText, Accommodation, Room, Invitation, Person,
     GuestInteraction, GuestHeatmap, WhatsAppSessionStatus, 
-    WhatsAppMessageQueue, WhatsAppMessageEvent, WhatsAppTemplate
+    WhatsAppMessageQueue, WhatsAppMessageEvent, WhatsAppTemplate, AssignmentJob, ImportJob
 )
 
 @admin.register(GlobalConfig)
@@ -16,7 +16,7 @@ class GlobalConfigAdmin(admin.ModelAdmin):
             'fields': ('letter_text', 'unauthorized_message')
         }),
         ('Sicurezza', {
-            'fields': ('invitation_link_secret',)
+            'fields': ('invitation_link_secret', 'invitation_link_previous_secrets')
         }),
         ('WhatsApp Config', {
             'fields': ('whatsapp_groom_number', 'whatsapp_groom_firstname', 'whatsapp_groom_lastname',
@@ -102,3 +102,17 @@ class WhatsAppTemplateAdmin(admin.ModelAdmin):
     search_fields = ['name', 'content']
     list_filter = ['condition', 'trigger_status', 'is_active']
     ordering = ['-updated_at']
+
+@admin.register(AssignmentJob)
+class AssignmentJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'progress_done', 'progress_total', 'best_strategy', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    readonly_fields = ['results', 'params', 'started_at', 'finished_at']
+    ordering = ['-created_at']
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'status', 'last_line', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['stats', 'created_ids', 'last_line', 'started_at', 'heartbeat_at', 'finished_at']
+    ordering = ['-created_at']
@@ -16,14 +16,13 @@ class DynamicPieChartEngine:
             invitation__in=self.invitations_queryset
         ).select_related('invitation').prefetch_related('invitation__labels').select_related('assigned_room')
 
-        # Load Global Config for costs
-        config = GlobalConfig.objects.first()
-        # Default prices if config missing (fallback)
-        price_adult = float(config.price_adult_meal) if config else 0.0
-        price_child = float(config.price_child_meal) if config else 0.0
-        price_acc_adult = float(config.price_accommodation_adult) if config else 0.0
-        price_acc_child = float(config.price_accommodation_child) if config else 0.0
-        price_transfer = float(config.price_transfer) if config else 0.0
+        # Load Global Config for costs (cached singleton)
+        config = GlobalConfig.load()
+        price_adult = float(config.price_adult_meal)
+        price_child = float(config.price_child_meal)
+        price_acc_adult = float(config.price_accommodation_adult)
+        price_acc_child = float(config.price_accommodation_child)
+        price_transfer = float(config.price_transfer)
 
         for person in persons:
             inv = person.invitation
@@ -0,0 +1,1084 @@
+"""
+Solver in memoria per l'auto-assegnazione degli alloggi (AccommodationViewSet.auto_assign).
+
+Snapshot.load() legge lo stato con un numero fisso di query (alloggi, stanze,
+persone, inviti, affinità, non-affinità) come tuple. Ogni esecuzione di una
+strategia costruisce dal snapshot un Plan: oggetti con __slots__ per stanze,
+persone, inviti e alloggi, con contatori di occupazione, mappe dei proprietari
+delle stanze e insiemi di affinità. Le prove di piazzamento modificano solo il
+Plan; un journal di operazioni permette di annullare un gruppo o un invito
+che non entra per intero (al posto dei savepoint).
+
+Regole (invariate rispetto all'algoritmo su DB):
+- reset_previous: libera le stanze degli ospiti non pinned e l'alloggio degli
+  inviti con almeno un ospite non pinned.
+- candidati: inviti confermati con alloggio richiesto e almeno un ospite non
+  pinned, senza stanza e partecipante.
+- una stanza appartiene a un solo invito; i bambini usano prima i posti
+  bambino, poi quelli adulto; un invito non entra in un alloggio che ospita
+  un invito non affine.
+- un invito è assegnato per intero o per niente; i gruppi affini provano lo
+  stesso alloggio, poi (se la strategia lo consente) i singoli inviti.
+
+Plan.apply() scrive solo il piano finale: un bulk_update per le persone e uno
+per gli inviti che sono cambiati rispetto al snapshot.
+
+simulate() esegue tutte le strategie in parallelo su un pool di processi
+(AUTO_ASSIGN_WORKERS) solo nel processo che lo abilita con enable_pool()
+(run_assignment_worker); nei worker web le strategie girano in linea. Il
+snapshot è fatto di sole tuple e viaggia verso i worker via pickle, i worker
+non toccano il DB. Ogni strategia ha un timeout
+(AUTO_ASSIGN_TIMEOUT): il solver controlla la scadenza a ogni invito e il
+chiamante non aspetta oltre, così la simulazione dura quanto la strategia più
+lenta invece della somma di tutte.
+
+La strategia OPTIMAL non usa ordinamenti euristici: OptimalSearch esplora
+con branch and bound tutte le assegnazioni (vedi la classe) entro
+AUTO_ASSIGN_OPTIMAL_BUDGET secondi e ritorna la migliore trovata, con il
+limite superiore che permette di misurare il gap delle strategie greedy.
+
+run_incremental() è per le conferme arrivate dopo un'assegnazione: tiene
+fisse tutte le stanze occupate (pinned o no) e piazza solo gli inviti ancora
+senza stanza, cercando le stanze libere in un FreeRoomIndex.
+"""
+import bisect
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Accommodation, Invitation, Person, Room
+
+
+STRATEGIES = {
+    'STANDARD': {
+        'name': 'Standard (Default)',
+        'description': 'Processa prima i gruppi affini, stanze ordinate per capienza decrescente.',
+        'invitation_sort': lambda i: i.id,
+        'room_sort': lambda r: -r.total_capacity,
+        'group_affinity': True
+    },
+    'SPACE_OPTIMIZER': {
+        'name': 'Space Optimizer (Tetris)',
+        'description': 'Priorità ai gruppi numerosi su stanze "Best Fit" (piccole ma sufficienti).',
+        'invitation_sort': lambda i: -i.coming,
+        'room_sort': lambda r: r.total_capacity,
+        'group_affinity': True
+    },
+    'CHILDREN_FIRST': {
+        'name': 'Children First',
+        'description': 'Priorità alle famiglie con bambini per occupare slot specifici.',
+        'invitation_sort': lambda i: -i.coming_children,
+        'room_sort': lambda r: -r.capacity_children,
+        'group_affinity': True
+    },
+    'PERFECT_MATCH': {
+        'name': 'Perfect Match Only',
+        'description': 'Cerca di riempire le stanze al 100% della capienza.',
+        'invitation_sort': lambda i: -i.coming,
+        'room_sort': lambda r: r.total_capacity,
+        'group_affinity': False,
+        'perfect_match_only': True
+    },
+    'SMALLEST_FIRST': {
+        'name': 'Smallest First',
+        'description': 'Riempimento dal basso (coppie e singoli prima).',
+        'invitation_sort': lambda i: i.coming,
+        'room_sort': lambda r: r.total_capacity,
+        'group_affinity': False
+    },
+    'AFFINITY_CLUSTER': {
+        'name': 'Affinity Cluster',
+        'description': 'Massimizza la coesione dei gruppi affini trattandoli come blocchi unici.',
+        'invitation_sort': lambda i: -i.cluster_size,
+        'room_sort': lambda r: -r.total_capacity,
+        'group_affinity': True,
+        'force_cluster': True
+    },
+    'OPTIMAL': {
+        'name': 'Optimal (Branch & Bound)',
+        'description': 'Massimizza gli ospiti assegnati con una ricerca esatta; a parità preferisce '
+                       'gli affini nella stessa struttura e meno letti sprecati.',
+        'exact': True
+    },
+}
+
+
+class SolverTimeout(Exception):
+    """La strategia ha superato il tempo concesso."""
+
+
+class Snapshot:
+    """Righe lette dal DB (tuple): il punto di partenza immutabile di ogni Plan."""
+    __slots__ = ('accommodations', 'rooms', 'persons', 'invitations', 'affinities', 'non_affinities')
+
+    @classmethod
+    def load(cls):
+        snapshot = cls()
+        snapshot.accommodations = list(Accommodation.objects.order_by('name', 'id').values_list('id', 'name'))
+        snapshot.rooms = list(Room.objects.order_by('id').values_list(
+            'id', 'accommodation_id', 'room_number', 'capacity_adults', 'capacity_children'
+        ))
+        snapshot.persons = list(Person.objects.order_by('id').values_list(
+            'id', 'invitation_id', 'first_name', 'last_name', 'is_child', 'not_coming',
+            'accommodation_pinned', 'assigned_room_id'
+        ))
+        snapshot.invitations = list(Invitation.objects.order_by('id').values_list(
+            'id', 'name', 'status', 'accommodation_requested', 'accommodation_id'
+        ))
+        # M2M simmetriche: la tabella through contiene entrambe le direzioni
+        snapshot.affinities = list(Invitation.affinities.through.objects.values_list('from_invitation_id', 'to_invitation_id'))
+        snapshot.non_affinities = list(
+            Invitation.non_affinities.through.objects.values_list('from_invitation_id', 'to_invitation_id')
+        )
+        return snapshot
+
+    def plan(self, reset_previous=False):
+        return Plan(self, reset_previous)
+
+
+class AccommodationState:
+    __slots__ = ('id', 'name', 'rooms', 'total_capacity', 'assigned_guests', 'occupants')
+
+    def __init__(self, pk, name):
+        self.id = pk
+        self.name = name
+        self.rooms = []
+        self.total_capacity = 0
+        self.assigned_guests = 0  # partecipanti degli inviti con accommodation = questo alloggio
+        self.occupants = {}       # invitation_id -> partecipanti nelle stanze dell'alloggio
+
+    def available_capacity(self):
+        return self.total_capacity - self.assigned_guests
+
+
+class RoomState:
+    __slots__ = ('id', 'accommodation', 'label', 'capacity_adults', 'capacity_children', 'total_capacity',
+                 'adults', 'children', 'owners')
+
+    def __init__(self, pk, accommodation, room_number, capacity_adults, capacity_children):
+        self.id = pk
+        self.accommodation = accommodation
+        self.label = f"{accommodation.name} - {room_number} (A:{capacity_adults}, B:{capacity_children})"
+        self.capacity_adults = capacity_adults
+        self.capacity_children = capacity_children
+        self.total_capacity = capacity_adults + capacity_children
+        self.adults = 0
+        self.children = 0
+        self.owners = {}  # invitation_id -> partecipanti nella stanza
+
+    def free_slots(self):
+        """(adulto, bambino) liberi: i bambini occupano prima i posti bambino (come Room.available_slots)."""
+        children_in_child_slots = min(self.children, self.capacity_children)
+        adult_free = self.capacity_adults - self.adults - (self.children - children_in_child_slots)
+        return adult_free, self.capacity_children - children_in_child_slots
+
+    def can_fit(self, person):
+        if len(self.owners) > 1:
+            return False  # Stanza condivisa da più inviti: stato corrotto
+        if self.owners and person.invitation_id not in self.owners:
+            return False  # Stanza di un altro invito
+        adult_free, child_free = self.free_slots()
+        if person.is_child:
+            return child_free > 0 or adult_free > 0
+        return adult_free > 0
+
+
+class PersonState:
+    __slots__ = ('id', 'invitation_id', 'label', 'is_child', 'not_coming', 'pinned', 'room', 'initial_room_id')
+
+    def __init__(self, pk, invitation_id, first_name, last_name, is_child, not_coming, pinned, room_id):
+        self.id = pk
+        self.invitation_id = invitation_id
+        self.label = f"{first_name} {last_name or ''}".strip()
+        self.is_child = is_child
+        self.not_coming = not_coming
+        self.pinned = pinned
+        self.room = None
+        self.initial_room_id = room_id
+
+
+class InvitationState:
+    __slots__ = ('id', 'name', 'status', 'accommodation_requested', 'accommodation', 'initial_accommodation_id',
+                 'persons', 'affinities', 'non_affinities', 'coming', 'coming_children', 'cluster_size')
+
+    def __init__(self, pk, name, status, accommodation_requested, accommodation_id):
+        self.id = pk
+        self.name = name
+        self.status = status
+        self.accommodation_requested = accommodation_requested
+        self.accommodation = None
+        self.initial_accommodation_id = accommodation_id
+        self.persons = []
+        self.affinities = set()
+        self.non_affinities = set()
+        self.coming = 0
+        self.coming_children = 0
+        self.cluster_size = 0
+
+    @property
+    def has_unpinned_guest(self):
+        return any(not p.pinned for p in self.persons)
+
+
+class Plan:
+    """Stato mutabile di una esecuzione: piazzamenti con journal per l'annullamento."""
+
+    def __init__(self, snapshot, reset_previous=False):
+        self.accommodations = [AccommodationState(*row) for row in snapshot.accommodations]
+        accommodations = {acc.id: acc for acc in self.accommodations}
+        self.rooms = {}
+        for pk, accommodation_id, room_number, capacity_adults, capacity_children in snapshot.rooms:
+            acc = accommodations[accommodation_id]
+            room = RoomState(pk, acc, room_number, capacity_adults, capacity_children)
+            acc.rooms.append(room)
+            acc.total_capacity += room.total_capacity
+            self.rooms[pk] = room
+
+        self.invitations = {row[0]: InvitationState(*row) for row in snapshot.invitations}
+        self.persons = [PersonState(*row) for row in snapshot.persons]
+        for person in self.persons:
+            inv = self.invitations[person.invitation_id]
+            inv.persons.append(person)
+            if not person.not_coming:
+                inv.coming += 1
+                inv.coming_children += person.is_child
+        for from_id, to_id in snapshot.affinities:
+            self.invitations[from_id].affinities.add(to_id)
+        for from_id, to_id in snapshot.non_affinities:
+            self.invitations[from_id].non_affinities.add(to_id)
+        for inv in self.invitations.values():
+            inv.cluster_size = inv.coming + sum(self.invitations[pk].coming for pk in inv.affinities)
+
+        self._journal = []
+        for person in self.persons:
+            if person.initial_room_id is not None and not (reset_previous and not person.pinned):
+                self._place(person, self.rooms[person.initial_room_id])
+        for inv in self.invitations.values():
+            if inv.initial_accommodation_id is not None and not (reset_previous and inv.has_unpinned_guest):
+                self._set_accommodation(inv, accommodations[inv.initial_accommodation_id])
+        self._journal.clear()
+        self.placements = []  # (person, room, invitation) nell'ordine di assegnazione
+        self.solver_stats = {}
+
+    # --- operazioni elementari (con journal) ---
+
+    def _place(self, person, room, journal=True):
+        person.room = room
+        if not person.not_coming:
+            if person.is_child:
+                room.children += 1
+            else:
+                room.adults += 1
+            room.owners[person.invitation_id] = room.owners.get(person.invitation_id, 0) + 1
+            occupants = room.accommodation.occupants
+            occupants[person.invitation_id] = occupants.get(person.invitation_id, 0) + 1
+        if journal:
+            self._journal.append(('place', person))
+
+    def _unplace(self, person):
+        room = person.room
+        person.room = None
+        if not person.not_coming:
+            if person.is_child:
+                room.children -= 1
+            else:
+                room.adults -= 1
+            for owners in (room.owners, room.accommodation.occupants):
+                owners[person.invitation_id] -= 1
+                if not owners[person.invitation_id]:
+                    del owners[person.invitation_id]
+
+    def _remove(self, person):
+        room = person.room
+        self._unplace(person)
+        self._journal.append(('remove', person, room))
+
+    def _set_accommodation(self, inv, acc, journal=True):
+        previous = inv.accommodation
+        if previous is not None:
+            previous.assigned_guests -= inv.coming
+        inv.accommodation = acc
+        if acc is not None:
+            acc.assigned_guests += inv.coming
+        if journal:
+            self._journal.append(('accommodation', inv, previous))
+
+    def mark(self):
+        return len(self._journal), len(self.placements)
+
+    def rollback(self, mark):
+        journal_length, placements_length = mark
+        while len(self._journal) > journal_length:
+            entry = self._journal.pop()
+            if entry[0] == 'place':
+                self._unplace(entry[1])
+            elif entry[0] == 'remove':
+                self._place(entry[1], entry[2], journal=False)
+            else:
+                _, inv, previous = entry
+                self._set_accommodation(inv, previous, journal=False)
+        del self.placements[placements_length:]
+
+    # --- algoritmo ---
+
+    def candidates(self):
+        return [
+            inv for inv in self.invitations.values()
+            if inv.status == Invitation.Status.CONFIRMED and inv.accommodation_requested and any(
+                not p.pinned and p.room is None and not p.not_coming for p in inv.persons
+            )
+        ]
+
+    def _affinity_group(self, inv, processed_ids):
+        affinities = [
+            self.invitations[pk] for pk in sorted(inv.affinities)
+            if pk not in processed_ids
+        ]
+        return [inv] + [
+            a for a in affinities
+            if a.status == Invitation.Status.CONFIRMED and a.accommodation_requested and a.has_unpinned_guest
+        ]
+
+    def assign_invitation(self, inv, acc, strategy):
+        """Tutti gli ospiti partecipanti senza stanza nell'alloggio, o nessuno."""
+        if strategy.get('perfect_match_only', False) and acc.available_capacity() < inv.coming:
+            return False
+        if inv.non_affinities.intersection(acc.occupants):
+            return False
+
+        persons = [p for p in inv.persons if p.room is None and not p.not_coming]
+        if not persons:
+            return True  # Already assigned
+
+        rooms = sorted(acc.rooms, key=strategy['room_sort'])
+        mark = self.mark()
+        for person in persons:
+            room = next((r for r in rooms if r.can_fit(person)), None)
+            if room is None:
+                self.rollback(mark)
+                return False
+            self._place(person, room)
+            self.placements.append((person, room, inv))
+        self._set_accommodation(inv, acc)
+        return True
+
+    def allowed_accommodations(self, inv):
+        """
+        Alloggi in cui può andare un invito: se ha già ospiti in stanza (o un
+        alloggio assegnato) resta lì, l'alloggio comunicato non cambia.
+        """
+        placed = [p.room.accommodation for p in inv.persons if p.room is not None]
+        if placed:
+            return list(dict.fromkeys(placed))
+        if inv.accommodation is not None:
+            return [inv.accommodation]
+        return self.accommodations
+
+    def place_invitation(self, inv, acc, rooms):
+        """
+        Piazza gli ospiti senza stanza nelle stanze date (già scelte per coprirli):
+        gli adulti prima, così i bambini occupano i posti rimasti.
+        """
+        persons = sorted((p for p in inv.persons if p.room is None and not p.not_coming), key=lambda p: p.is_child)
+        for person in persons:
+            room = next(r for r in rooms if r.can_fit(person))
+            self._place(person, room)
+            self.placements.append((person, room, inv))
+        self._set_accommodation(inv, acc)
+
+    def solve(self, strategy, deadline=None):
+        """deadline: istante time.monotonic() oltre il quale si interrompe con SolverTimeout."""
+        if strategy.get('exact', False):
+            stop_at = time.monotonic() + getattr(settings, 'AUTO_ASSIGN_OPTIMAL_BUDGET', 5.0)
+            OptimalSearch(self, stop_at if deadline is None else min(stop_at, deadline)).solve()
+            return
+
+        invitations = sorted(self.candidates(), key=strategy['invitation_sort'])
+        processed_ids = set()
+
+        for inv in invitations:
+            if inv.id in processed_ids:
+                continue
+            if deadline is not None and time.monotonic() > deadline:
+                raise SolverTimeout()
+
+            group = self._affinity_group(inv, processed_ids) if strategy.get('group_affinity', True) else [inv]
+            accommodations = sorted(self.accommodations, key=lambda a: a.available_capacity(), reverse=True)
+
+            assigned_group = False
+            for acc in accommodations:
+                mark = self.mark()
+                if all(self.assign_invitation(g_inv, acc, strategy) for g_inv in group):
+                    processed_ids.update(g_inv.id for g_inv in group)
+                    assigned_group = True
+                    break
+                self.rollback(mark)
+
+            if not assigned_group and not strategy.get('force_cluster', False):
+                for g_inv in group:
+                    if g_inv.id in processed_ids:
+                        continue
+                    for acc in accommodations:
+                        if self.assign_invitation(g_inv, acc, strategy):
+                            processed_ids.add(g_inv.id)
+                            break
+
+    def results(self, strategy_key, name=None):
+        unassigned = sum(
+            1 for p in self.persons
+            if p.room is None and not p.pinned and not p.not_coming
+            and self.invitations[p.invitation_id].status == Invitation.Status.CONFIRMED
+            and self.invitations[p.invitation_id].accommodation_requested
+        )
+        wasted_beds = sum(sum(r.free_slots()) for r in self.rooms.values() if r.owners)
+        return {
+            'strategy_code': strategy_key,
+            'strategy_name': name or STRATEGIES[strategy_key]['name'],
+            'assigned_guests': len(self.placements),
+            'unassigned_guests': unassigned,
+            'wasted_beds': wasted_beds,
+            'assignment_log': [
+                {'person': person.label, 'room': room.label, 'invitation': inv.name}
+                for person, room, inv in self.placements
+            ],
+            **self.solver_stats,
+        }
+
+    def apply(self):
+        """Scrive il piano: un bulk_update per persone e inviti cambiati rispetto al snapshot."""
+        persons = [
+            Person(id=p.id, assigned_room_id=p.room.id if p.room else None)
+            for p in self.persons if (p.room.id if p.room else None) != p.initial_room_id
+        ]
+        now = timezone.now()
+        invitations = [
+            Invitation(id=inv.id, accommodation_id=inv.accommodation.id if inv.accommodation else None, updated_at=now)
+            for inv in self.invitations.values()
+            if (inv.accommodation.id if inv.accommodation else None) != inv.initial_accommodation_id
+        ]
+        with transaction.atomic():
+            Person.objects.bulk_update(persons, ['assigned_room'])
+            Invitation.objects.bulk_update(invitations, ['accommodation', 'updated_at'])
+        return len(persons), len(invitations)
+
+
+class _Stop(Exception):
+    pass
+
+
+class OptimalSearch:
+    """
+    Branch and bound per la strategia OPTIMAL.
+
+    Variabili: per ogni invito candidato, nessun alloggio oppure un alloggio
+    e un insieme minimale di stanze libere che copre i suoi ospiti (le stanze
+    sono esclusive, quindi basta che gli adulti entrino nei posti adulto e il
+    totale nei posti totali). Le stanze identiche di un alloggio sono
+    intercambiabili: la ricerca lavora sui conteggi per tipo (adulti, bambini).
+    I posti liberi nelle stanze già dell'invito (ospiti pinned o non
+    resettati) si usano per primi. I vincoli di non-affinità si verificano
+    sugli occupanti correnti di ogni alloggio; pinned e assegnazioni
+    mantenute sono già nel Plan di partenza.
+
+    Obiettivo lessicografico: (ospiti assegnati, coppie affini nella stessa
+    struttura, -letti sprecati). Il limite superiore di ogni nodo combina
+    gli ospiti rimanenti con i posti liberi (adulti/bambini) e le coppie
+    affini ancora aperte; i rami che non possono battere la soluzione
+    migliore vengono potati. Allo scadere del tempo si tiene la migliore
+    soluzione trovata; upper_bound è il massimo dei limiti dei nodi della
+    frontiera non esplorata (i fratelli non avviati di ogni nodo aperto),
+    non il limite della radice.
+    """
+
+    def __init__(self, plan, stop_at):
+        self.plan = plan
+        self.stop_at = stop_at
+        self.nodes = 0
+
+        self.accommodations = sorted(plan.accommodations, key=lambda a: a.available_capacity(), reverse=True)
+        position = {acc.id: index for index, acc in enumerate(self.accommodations)}
+        self.free_rooms = [{} for _ in self.accommodations]  # tipo (adulti, bambini) -> [RoomState]
+        self.private = {}  # (invitation_id, indice alloggio) -> [RoomState] con posti liberi
+        for room in plan.rooms.values():
+            index = position[room.accommodation.id]
+            if not room.owners:
+                if room.total_capacity:
+                    self.free_rooms[index].setdefault((room.capacity_adults, room.capacity_children), []).append(room)
+            elif len(room.owners) == 1 and sum(room.free_slots()):
+                self.private.setdefault((next(iter(room.owners)), index), []).append(room)
+        self.counts = [{kind: len(rooms) for kind, rooms in free.items()} for free in self.free_rooms]
+        self.free_adults = sum(a * n for counts in self.counts for (a, _), n in counts.items())
+        self.free_total = sum((a + c) * n for counts in self.counts for (a, c), n in counts.items())
+        # I posti privati restano nel limite per tutta la ricerca (sovrastima valida)
+        private_free = [room.free_slots() for rooms in self.private.values() for room in rooms]
+        self.private_adults = sum(a for a, _ in private_free)
+        self.private_total = sum(a + c for a, c in private_free)
+        self.occupants = [dict(acc.occupants) for acc in self.accommodations]
+
+        self.order = []
+        self.demand = {}
+        for inv in plan.candidates():
+            persons = [p for p in inv.persons if p.room is None and not p.not_coming]
+            children = sum(p.is_child for p in persons)
+            self.demand[inv.id] = (len(persons) - children, children)
+            self.order.append(inv)
+        self.order.sort(key=lambda inv: (-sum(self.demand[inv.id]), inv.id))
+        # Chi ha già ospiti in stanza resta nel suo alloggio
+        self.allowed = {
+            inv.id: sorted(position[acc.id] for acc in plan.allowed_accommodations(inv)) for inv in self.order
+        }
+
+        # Alloggio deciso (None = non assegnato); gli inviti fuori ricerca sono fissi
+        depth_of = {inv.id: depth for depth, inv in enumerate(self.order)}
+        self.decided = {
+            inv.id: position[inv.accommodation.id]
+            for inv in plan.invitations.values() if inv.id not in depth_of and inv.accommodation is not None
+        }
+        count = len(self.order)
+        self.rest_adults = [0] * (count + 1)
+        self.rest_children = [0] * (count + 1)
+        for depth in range(count - 1, -1, -1):
+            adults, children = self.demand[self.order[depth].id]
+            self.rest_adults[depth] = self.rest_adults[depth + 1] + adults
+            self.rest_children[depth] = self.rest_children[depth + 1] + children
+        # Coppie affini ancora aperte alla profondità d: quelle con un membro in order[d:]
+        self.open_pairs = [0] * (count + 1)
+        for inv in self.order:
+            for other_id in inv.affinities:
+                if other_id in depth_of:
+                    if other_id < inv.id:
+                        continue  # coppia contata una volta
+                    last = max(depth_of[inv.id], depth_of[other_id])
+                elif other_id in self.decided:
+                    last = depth_of[inv.id]
+                else:
+                    continue
+                self.open_pairs[last] += 1
+        for depth in range(count - 1, -1, -1):
+            self.open_pairs[depth] += self.open_pairs[depth + 1]
+
+        self.choices = [None] * count
+        self.best = (-1, 0, 0)
+        self.best_choices = [None] * count
+        self.open_bound = 0
+
+    # --- ricerca ---
+
+    def _bound(self, depth, assigned):
+        free_adults = self.free_adults + self.private_adults
+        free_total = self.free_total + self.private_total
+        adults = min(self.rest_adults[depth], free_adults)
+        return assigned + adults + min(self.rest_children[depth], free_total - adults)
+
+    def _covers(self, index, adults, children):
+        """Multiinsiemi minimali di tipi di stanza che coprono adulti e bambini: [(((tipo, n), ...), posti)]."""
+        kinds = [kind for kind, n in self.counts[index].items() if n]
+        covers = []
+
+        def walk(position, chosen, cap_adults, cap_total):
+            if cap_adults >= adults and cap_total >= adults + children:
+                covers.append((tuple(chosen), cap_total))
+                return
+            if position == len(kinds):
+                return
+            kind = kinds[position]
+            walk(position + 1, chosen, cap_adults, cap_total)
+            for n in range(1, self.counts[index][kind] + 1):
+                chosen.append((kind, n))
+                covered = cap_adults + kind[0] * n >= adults and cap_total + sum(kind) * n >= adults + children
+                walk(position + 1, chosen, cap_adults + kind[0] * n, cap_total + sum(kind) * n)
+                chosen.pop()
+                if covered:
+                    break
+
+        walk(0, [], 0, 0)
+        minimal = []
+        for chosen, seats in covers:
+            cap_adults = sum(kind[0] * n for kind, n in chosen)
+            if all(
+                cap_adults - kind[0] < adults or seats - sum(kind) < adults + children
+                for kind, _ in chosen
+            ):
+                minimal.append((chosen, seats))
+        return minimal
+
+    def _options(self, inv):
+        adults, children = self.demand[inv.id]
+        options = []
+        for index in self.allowed[inv.id]:
+            if inv.non_affinities.intersection(self.occupants[index]):
+                continue
+            private_adults = private_children = 0
+            for room in self.private.get((inv.id, index), ()):
+                room_adults, room_children = room.free_slots()
+                private_adults += room_adults
+                private_children += room_children
+            rest_adults = max(0, adults - private_adults)
+            spare_adults = max(0, private_adults - adults)
+            rest_children = max(0, children - private_children - spare_adults)
+            private_used = adults + children - rest_adults - rest_children
+            if rest_adults or rest_children:
+                covers = self._covers(index, rest_adults, rest_children)
+            else:
+                covers = [((), 0)]
+            gain = sum(1 for other_id in inv.affinities if self.decided.get(other_id) == index)
+            for chosen, seats in covers:
+                waste = seats - rest_adults - rest_children - private_used
+                options.append((-gain, waste, index, chosen))
+        options.sort(key=lambda option: option[:3])
+        return options
+
+    def _take(self, inv, index, chosen, sign):
+        for (room_adults, room_children), n in chosen:
+            self.counts[index][(room_adults, room_children)] -= sign * n
+            self.free_adults -= sign * room_adults * n
+            self.free_total -= sign * (room_adults + room_children) * n
+        occupants = self.occupants[index]
+        occupants[inv.id] = occupants.get(inv.id, 0) + sign
+        if not occupants[inv.id]:
+            del occupants[inv.id]
+        if sign > 0:
+            self.decided[inv.id] = index
+        else:
+            del self.decided[inv.id]
+
+    def _search(self, depth, assigned, pairs, waste):
+        self.nodes += 1
+        if self.nodes % 256 == 0 and time.monotonic() > self.stop_at:
+            # Nodo interamente inesplorato: entra nel limite della frontiera
+            bound = assigned if depth == len(self.order) else self._bound(depth, assigned)
+            self.open_bound = max(self.open_bound, bound)
+            raise _Stop()
+        if depth == len(self.order):
+            if (assigned, pairs, -waste) > self.best:
+                self.best = (assigned, pairs, -waste)
+                self.best_choices = list(self.choices)
+            return
+
+        if (self._bound(depth, assigned), pairs + self.open_pairs[depth], -waste) <= self.best:
+            return
+
+        inv = self.order[depth]
+        need = sum(self.demand[inv.id])
+        options = self._options(inv)
+        started = 0  # opzioni avviate; l'ultima "opzione" è non assegnare l'invito
+        try:
+            for negative_gain, option_waste, index, chosen in options:
+                started += 1
+                self._take(inv, index, chosen, 1)
+                self.choices[depth] = (index, chosen)
+                try:
+                    self._search(depth + 1, assigned + need, pairs - negative_gain, waste + option_waste)
+                finally:
+                    self._take(inv, index, chosen, -1)
+            started += 1
+            self.choices[depth] = None
+            self._search(depth + 1, assigned, pairs, waste)
+        except _Stop:
+            # Il ramo in corso ha già registrato la sua frontiera: qui contano
+            # solo i fratelli non ancora avviati
+            pending = options[started:]
+            bound = self._bound(depth + 1, assigned) if started <= len(options) else 0
+            for _, _, index, chosen in pending:
+                self._take(inv, index, chosen, 1)
+                bound = max(bound, self._bound(depth + 1, assigned + need))
+                self._take(inv, index, chosen, -1)
+            self.open_bound = max(self.open_bound, bound)
+            raise
+
+    def solve(self):
+        proven = True
+        root_bound = self._bound(0, 0)
+        try:
+            self._search(0, 0, 0, 0)
+        except _Stop:
+            proven = False
+        self._apply(self.best_choices)
+        assigned = len(self.plan.placements)
+        upper_bound = assigned if proven else max(assigned, self.open_bound)
+        self.plan.solver_stats = {
+            'proven_optimal': proven,
+            'upper_bound': upper_bound,
+            # Il limite non è migliore di min(ospiti da piazzare, posti liberi): il gap non dice nulla
+            'upper_bound_trivial': not proven and upper_bound >= root_bound,
+            'explored_nodes': self.nodes,
+        }
+
+    def _apply(self, choices):
+        """Riporta la soluzione sul Plan."""
+        for inv, choice in zip(self.order, choices):
+            if choice is None:
+                continue
+            index, chosen = choice
+            rooms = list(self.private.get((inv.id, index), ()))
+            for kind, n in chosen:
+                free = self.free_rooms[index][kind]
+                rooms.extend(free[:n])
+                del free[:n]
+            self.plan.place_invitation(inv, self.accommodations[index], rooms)
+
+
+# ---------------------------------------------
+# ASSEGNAZIONE INCREMENTALE
+# ---------------------------------------------
+
+MAX_REPAIR_MOVES = 20
+
+
+def parse_repair_moves(value):
+    """max_repair_moves dalla richiesta: intero tra 0 e MAX_REPAIR_MOVES, altrimenti ValueError."""
+    try:
+        moves = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('max_repair_moves must be an integer')
+    if not 0 <= moves <= MAX_REPAIR_MOVES:
+        raise ValueError(f'max_repair_moves must be between 0 and {MAX_REPAIR_MOVES}')
+    return moves
+
+
+class FreeRoomIndex:
+    """
+    Stanze libere (senza proprietario) per alloggio, raggruppate per tipo
+    (posti adulto, posti bambino). I tipi di ogni alloggio sono una lista
+    ordinata per (capienza, posti adulto): il best fit è un bisect sulla
+    capienza richiesta, prendere e restituire una stanza è un pop/append.
+    """
+
+    def __init__(self, accommodations):
+        self.kinds = {}  # acc.id -> [(capienza, adulti, bambini)] ordinata
+        self.rooms = {}  # (acc.id, adulti, bambini) -> [RoomState]
+        for acc in accommodations:
+            self.rebuild(acc)
+
+    def rebuild(self, acc):
+        for key in [key for key in self.rooms if key[0] == acc.id]:
+            del self.rooms[key]
+        kinds = set()
+        for room in sorted(acc.rooms, key=lambda r: r.id, reverse=True):
+            if not room.owners and room.total_capacity:
+                kinds.add((room.total_capacity, room.capacity_adults, room.capacity_children))
+                self.rooms.setdefault((acc.id, room.capacity_adults, room.capacity_children), []).append(room)
+        self.kinds[acc.id] = sorted(kinds)
+
+    def best_fit(self, acc, adults, children):
+        """Il tipo più piccolo che contiene da solo adulti e bambini, o None."""
+        kinds = self.kinds[acc.id]
+        for kind in kinds[bisect.bisect_left(kinds, (adults + children,)):]:
+            if kind[1] >= adults:
+                return kind
+        return None
+
+    def largest(self, acc):
+        kinds = self.kinds[acc.id]
+        return kinds[-1] if kinds else None
+
+    def take(self, acc, kind):
+        rooms = self.rooms[(acc.id, kind[1], kind[2])]
+        room = rooms.pop()
+        if not rooms:
+            del self.rooms[(acc.id, kind[1], kind[2])]
+            self.kinds[acc.id].remove(kind)
+        return room
+
+    def give_back(self, room):
+        acc = room.accommodation
+        key = (acc.id, room.capacity_adults, room.capacity_children)
+        if key not in self.rooms:
+            bisect.insort(self.kinds[acc.id], (room.total_capacity, room.capacity_adults, room.capacity_children))
+        self.rooms.setdefault(key, []).append(room)
+
+
+class IncrementalAssigner:
+    """
+    Piazza gli inviti candidati senza toccare gli ospiti già in stanza.
+
+    Ogni invito (dal più numeroso) usa prima i posti liberi delle stanze che
+    già occupa, poi il best fit di FreeRoomIndex; se non basta una stanza
+    prende la più grande e ripete sul resto. Tra gli alloggi compatibili
+    (non-affinità) preferisce quello con un invito affine, poi quello con
+    meno letti sprecati.
+
+    Con max_repair_moves > 0, un invito che non entra può spostare un
+    invito non pinned dello stesso alloggio in altre stanze dello stesso
+    alloggio (l'alloggio comunicato non cambia), se così entrano entrambi.
+    """
+
+    def __init__(self, plan, max_repair_moves=0):
+        self.plan = plan
+        self.index = FreeRoomIndex(plan.accommodations)
+        self.moves_left = max_repair_moves
+        self.moves = []
+
+    def _private_rooms(self, inv, acc):
+        rooms = {p.room for p in inv.persons if p.room is not None and p.room.accommodation is acc}
+        return [r for r in rooms if list(r.owners) == [inv.id] and sum(r.free_slots())]
+
+    def _take_rooms(self, inv, acc):
+        """Prende dall'indice le stanze che coprono l'invito in acc: (stanze, letti sprecati) o None."""
+        persons = [p for p in inv.persons if p.room is None and not p.not_coming]
+        children = sum(p.is_child for p in persons)
+        adults = len(persons) - children
+        rooms = self._private_rooms(inv, acc)
+        seats = 0
+        for room in rooms:
+            room_adults, room_children = room.free_slots()
+            seats += room_adults + room_children
+            placed = min(adults, room_adults)
+            adults -= placed
+            children -= min(children, room_children + room_adults - placed)
+        taken = []
+        while adults or children:
+            kind = self.index.best_fit(acc, adults, children) or self.index.largest(acc)
+            if kind is None:
+                for room in taken:
+                    self.index.give_back(room)
+                return None
+            taken.append(self.index.take(acc, kind))
+            seats += kind[0]
+            placed = min(adults, kind[1])
+            adults -= placed
+            children -= min(children, kind[2] + kind[1] - placed)
+        return rooms + taken, seats - len(persons)
+
+    def _release(self, rooms):
+        for room in rooms:
+            if not room.owners:
+                self.index.give_back(room)
+
+    def place(self, inv):
+        best = None
+        for acc in self.plan.allowed_accommodations(inv):
+            if inv.non_affinities.intersection(acc.occupants):
+                continue
+            taken = self._take_rooms(inv, acc)
+            if taken is None:
+                continue
+            rooms, waste = taken
+            self._release(rooms)
+            affine = not inv.affinities.isdisjoint(acc.occupants)
+            key = (not affine, waste, -acc.available_capacity())
+            if best is None or key < best[0]:
+                best = (key, acc)
+        if best is not None:
+            acc = best[1]
+            rooms, _ = self._take_rooms(inv, acc)
+            self.plan.place_invitation(inv, acc, rooms)
+            return True
+        return self.moves_left > 0 and self._repair(inv)
+
+    def _movable(self, inv, acc):
+        """Inviti dell'alloggio spostabili: nessun ospite pinned, stanze solo loro."""
+        invitations = self.plan.invitations
+        movable = []
+        for inv_id in acc.occupants:
+            if inv_id == inv.id:
+                continue
+            other = invitations[inv_id]
+            placed = [p for p in other.persons if p.room is not None]
+            if any(p.pinned or len(p.room.owners) > 1 for p in placed):
+                continue
+            movable.append(other)
+        # Prima chi spreca più posti: liberarlo rende di più
+        return sorted(movable, key=lambda o: (-sum(sum(p.room.free_slots()) for p in o.persons if p.room), o.id))
+
+    def _repair(self, inv):
+        plan = self.plan
+        for acc in plan.allowed_accommodations(inv):
+            if inv.non_affinities.intersection(acc.occupants):
+                continue
+            for other in self._movable(inv, acc):
+                mark = plan.mark()
+                rooms = {p.room for p in other.persons if p.room is not None}
+                for person in other.persons:
+                    if person.room is not None:
+                        plan._remove(person)
+                self.index.rebuild(acc)
+                taken = self._take_rooms(inv, acc)
+                if taken is not None:
+                    plan.place_invitation(inv, acc, taken[0])
+                    moved = self._take_rooms(other, acc)
+                    if moved is not None and {r.id for r in moved[0]} != {r.id for r in rooms}:
+                        # other non è un candidato: i suoi piazzamenti non contano come nuovi
+                        count = len(plan.placements)
+                        plan.place_invitation(other, acc, moved[0])
+                        del plan.placements[count:]
+                        self.moves_left -= 1
+                        self.moves.append({
+                            'invitation': other.name,
+                            'from': sorted(r.label for r in rooms),
+                            'to': sorted(r.label for r in moved[0]),
+                        })
+                        self.index.rebuild(acc)
+                        return True
+                plan.rollback(mark)
+                self.index.rebuild(acc)
+        return False
+
+    def solve(self):
+        invitations = sorted(
+            self.plan.candidates(),
+            key=lambda inv: (-sum(1 for p in inv.persons if p.room is None and not p.not_coming), inv.id)
+        )
+        for inv in invitations:
+            self.place(inv)
+        self.plan.solver_stats = {'repair_moves': self.moves}
+
+
+def run_incremental(snapshot, max_repair_moves=0):
+    """Piazza solo gli inviti senza stanza, lasciando fermi gli altri. Ritorna (results, plan)."""
+    plan = snapshot.plan(reset_previous=False)
+    IncrementalAssigner(plan, max_repair_moves).solve()
+    return plan.results('INCREMENTAL', name='Incremental'), plan
+
+
+def run_strategy(snapshot, strategy_key, reset_previous=False, timeout=None):
+    """Esegue una strategia sul snapshot. Ritorna (results, plan)."""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    plan = snapshot.plan(reset_previous)
+    plan.solve(STRATEGIES[strategy_key], deadline)
+    return plan.results(strategy_key), plan
+
+
+# ---------------------------------------------
+# SIMULAZIONE PARALLELA
+# ---------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+# Worker del pool di questo processo: 0 (in linea) finché enable_pool() non lo attiva
+_pool_workers = 0
+
+
+def enable_pool(workers=None):
+    """
+    Abilita il pool per le simulazioni di questo processo. Da chiamare solo in
+    run_assignment_worker: un pool per ogni worker gunicorn moltiplicherebbe
+    i processi e fork() di un processo con thread e connessioni aperte non è sicuro.
+    """
+    global _pool_workers
+    if os.environ.get('DJANGO_TEST_MODE', 'False') == 'True':
+        return
+    _pool_workers = getattr(settings, 'AUTO_ASSIGN_WORKERS', 0) if workers is None else workers
+
+
+def _mp_context():
+    """forkserver (o spawn dove manca): i worker non ereditano thread, lock e socket DB del padre."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _executor(workers):
+    """Pool di processi condiviso tra i job (avviarlo costa più di una strategia)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # django.setup(): con spawn/forkserver il worker importa i modelli da zero
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(), initializer=django.setup)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _error(strategy_key, message):
+    return {'strategy_code': strategy_key, 'strategy_name': STRATEGIES[strategy_key]['name'], 'error': message}
+
+
+def simulate_strategy(snapshot, strategy_key, reset_previous=False, timeout=None):
+    """Risultati di una strategia (senza Plan, per tornare leggeri dal worker)."""
+    try:
+        results, _ = run_strategy(snapshot, strategy_key, reset_previous, timeout)
+        return results
+    except SolverTimeout:
+        return _error(strategy_key, f"Timeout after {timeout}s")
+    except Exception as e:
+        return _error(strategy_key, str(e))
+
+
+def iter_simulation(snapshot, reset_previous=False, workers=None, timeout=None):
+    """
+    Esegue tutte le strategie e ne cede i risultati man mano che terminano.
+    Con workers <= 1 (default se il pool non è abilitato, vedi enable_pool)
+    gira nel processo corrente, una strategia dopo l'altra. Chiudere il
+    generatore annulla le strategie ancora in coda.
+    """
+    if workers is None:
+        workers = _pool_workers
+    if timeout is None:
+        timeout = getattr(settings, 'AUTO_ASSIGN_TIMEOUT', None)
+
+    if workers <= 1:
+        for key in STRATEGIES:
+            yield simulate_strategy(snapshot, key, reset_previous, timeout)
+        return
+
+    pool = _executor(workers)
+    futures = {
+        pool.submit(simulate_strategy, snapshot, key, reset_previous, timeout): key for key in STRATEGIES
+    }
+    # Le strategie oltre il numero di worker aspettano in coda: il limite le include
+    deadline = None
+    if timeout is not None:
+        deadline = time.monotonic() + timeout * math.ceil(len(futures) / workers) + 1
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                expired, pending = pending, set()
+                for future in expired:
+                    future.cancel()
+                    yield _error(futures[future], f"Timeout after {timeout}s")
+                return
+            for future in done:
+                try:
+                    yield future.result()
+                except BrokenProcessPool as e:
+                    shutdown()  # un worker è morto: la prossima simulazione ricrea il pool
+                    yield _error(futures[future], str(e) or "Worker process died")
+                except Exception as e:
+                    yield _error(futures[future], str(e))
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def rank(results):
+    """
+    Aggiunge il gap rispetto all'ottimo (il limite superiore di OPTIMAL, l'ottimo
+    se dimostrato) e ordina per ospiti assegnati (desc) e letti sprecati (asc).
+    Se OPTIMAL non ha dimostrato l'ottimo il gap è solo un massimo
+    (optimality_gap_exact=False), e con upper_bound_trivial non è informativo.
+    """
+    optimal = next((r for r in results if r['strategy_code'] == 'OPTIMAL' and 'error' not in r), None)
+    if optimal is not None:
+        for result in results:
+            if 'error' not in result:
+                result['optimality_gap'] = optimal['upper_bound'] - result['assigned_guests']
+                result['optimality_gap_exact'] = optimal['proven_optimal']
+                result['optimality_gap_trivial'] = optimal['upper_bound_trivial']
+
+    # A parità vale l'ordine di STRATEGIES, non quello di completamento dei worker
+    order = {key: index for index, key in enumerate(STRATEGIES)}
+    results.sort(key=lambda x: (-x.get('assigned_guests', 0), x.get('wasted_beds', 9999), order[x['strategy_code']]))
+    return results
+
+
+def simulate(snapshot, reset_previous=False, workers=None, timeout=None):
+    """Tutte le strategie, ordinate con rank()."""
+    return rank(list(iter_simulation(snapshot, reset_previous, workers, timeout)))
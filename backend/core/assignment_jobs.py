@@ -0,0 +1,164 @@
+"""
+Job di auto-assign in background (modello AssignmentJob, su DB).
+
+La view crea il job (pending) e risponde subito con l'id; il worker
+(manage.py run_assignment_worker, stesso schema di run_whatsapp_worker)
+lo prende in carico con un UPDATE condizionato sullo stato, così due
+worker non eseguono mai lo stesso job. Durante l'esecuzione:
+- progress_done e results si aggiornano a ogni strategia terminata: il
+  polling vede i risultati parziali;
+- cancel_requested è controllato dopo ogni strategia e, con la riga del
+  job bloccata, nella stessa transazione che scrive il piano e segna il
+  job completed: un job annullato non modifica le assegnazioni e un
+  annullamento arrivato durante la scrittura trova il job già terminato.
+I risultati restano nel DB per confrontare le simulazioni senza rieseguirle.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import assignment
+from .models import AssignmentJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def submit(strategy='SIMULATION', reset_previous=False, max_repair_moves=0, dry_run=False):
+    """Crea un job pending. ValueError se la strategia o i parametri non sono validi."""
+    if strategy == 'SIMULATION':
+        kind, total = AssignmentJob.Kind.SIMULATION, len(assignment.STRATEGIES)
+    elif strategy == 'INCREMENTAL':
+        kind, total = AssignmentJob.Kind.INCREMENTAL, 1
+    elif strategy in assignment.STRATEGIES:
+        kind, total = AssignmentJob.Kind.EXECUTION, 1
+    else:
+        raise ValueError('Invalid Strategy')
+    params = {
+        'strategy': strategy,
+        'reset_previous': bool(reset_previous),
+        'max_repair_moves': assignment.parse_repair_moves(max_repair_moves),
+        'dry_run': bool(dry_run),
+    }
+    return AssignmentJob.objects.create(kind=kind, params=params, progress_total=total)
+
+
+def cancel(job):
+    """
+    Un job pending viene annullato subito; uno in esecuzione si ferma al
+    prossimo controllo del worker. False se il job è già terminato: l'UPDATE
+    attende il lock preso da _complete, quindi un annullamento arrivato
+    mentre il piano viene scritto risulta tardivo.
+    """
+    now = timezone.now()
+    if AssignmentJob.objects.filter(id=job.id, status=AssignmentJob.Status.PENDING).update(
+        status=AssignmentJob.Status.CANCELLED, cancel_requested=True, finished_at=now
+    ):
+        return True
+    return bool(AssignmentJob.objects.filter(id=job.id, status=AssignmentJob.Status.RUNNING).update(
+        cancel_requested=True
+    ))
+
+
+def claim_next():
+    """Il job pending più vecchio, passato a running; None se la coda è vuota."""
+    pending = AssignmentJob.objects.filter(status=AssignmentJob.Status.PENDING).order_by('created_at', 'id')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        if AssignmentJob.objects.filter(id=job_id, status=AssignmentJob.Status.PENDING).update(
+            status=AssignmentJob.Status.RUNNING, started_at=timezone.now()
+        ):
+            return AssignmentJob.objects.get(id=job_id)
+    return None
+
+
+def fail_interrupted():
+    """All'avvio del worker: i job rimasti running appartengono a un worker terminato."""
+    return AssignmentJob.objects.filter(status=AssignmentJob.Status.RUNNING).update(
+        status=AssignmentJob.Status.FAILED, error="Worker interrupted", finished_at=timezone.now()
+    )
+
+
+def _check_cancelled(job):
+    if AssignmentJob.objects.filter(id=job.id, cancel_requested=True).exists():
+        raise JobCancelled()
+
+
+def _update(job, **fields):
+    AssignmentJob.objects.filter(id=job.id).update(**fields)
+
+
+def _run_simulation(job, snapshot):
+    results = []
+    stream = assignment.iter_simulation(snapshot, job.params.get('reset_previous', False))
+    try:
+        for result in stream:
+            results.append(result)
+            _update(job, progress_done=len(results), results=results)
+            _check_cancelled(job)
+    finally:
+        stream.close()  # annulla le strategie ancora in coda
+    results = assignment.rank(results)
+    return results, results[0]['strategy_code'] if results else None, None
+
+
+def _run_single(job, snapshot):
+    params = job.params
+    if job.kind == AssignmentJob.Kind.INCREMENTAL:
+        result, plan = assignment.run_incremental(snapshot, params.get('max_repair_moves', 0))
+        write = not params.get('dry_run', False)
+    else:
+        result, plan = assignment.run_strategy(snapshot, params['strategy'], params.get('reset_previous', False))
+        write = True
+    return [result], result['strategy_code'], plan if write else None
+
+
+def _complete(job, results, best, plan):
+    """
+    Ultimo controllo di annullamento, scrittura del piano e stato completed
+    in una sola transazione sulla riga del job bloccata.
+    """
+    with transaction.atomic():
+        if AssignmentJob.objects.select_for_update().get(id=job.id).cancel_requested:
+            raise JobCancelled()
+        if plan is not None:
+            plan.apply()
+        _update(
+            job, status=AssignmentJob.Status.COMPLETED, results=results, best_strategy=best,
+            progress_done=job.progress_total, finished_at=timezone.now()
+        )
+
+
+def run(job):
+    """Esegue un job già in stato running e ne salva l'esito."""
+    logger.info(f"🧮 Assignment job {job.id} ({job.kind}) started")
+    try:
+        _check_cancelled(job)
+        snapshot = assignment.Snapshot.load()
+        if job.kind == AssignmentJob.Kind.SIMULATION:
+            results, best, plan = _run_simulation(job, snapshot)
+        else:
+            results, best, plan = _run_single(job, snapshot)
+        _complete(job, results, best, plan)
+    except JobCancelled:
+        logger.info(f"🛑 Assignment job {job.id} cancelled")
+        _update(job, status=AssignmentJob.Status.CANCELLED, finished_at=timezone.now())
+    except Exception as e:
+        logger.error(f"Assignment job {job.id} failed: {e}", exc_info=True)
+        _update(job, status=AssignmentJob.Status.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        logger.info(f"✅ Assignment job {job.id} completed")
+    job.refresh_from_db()
+    return job
+
+
+def run_pending():
+    """Esegue i job in coda uno alla volta. Ritorna quanti ne ha eseguiti."""
+    count = 0
+    while (job := claim_next()) is not None:
+        run(job)
+        count += 1
+    return count
@@ -0,0 +1,148 @@
+"""
+Cache applicativa con invalidazione basata su versione.
+
+Ogni namespace (es. 'configurable_texts') ha un token di versione salvato nel
+cache backend condiviso tra i worker gunicorn (vedi CACHES in settings).
+I valori calcolati vengono salvati sia nel backend condiviso che in un memo
+locale al processo, indicizzati per token: finché nessuno invalida il
+namespace, una lettura costa solo il lookup del token (nessuna query DB).
+
+Invalidare significa sostituire il token: le vecchie chiavi non vengono più
+lette e scadono da sole. Insieme al token viene salvato l'istante
+dell'invalidazione (changed_at): copre anche le cancellazioni, che non
+lasciano un updated_at da cui derivare un Last-Modified.
+
+Durante una richiesta HTTP (vedi RequestMemoMiddleware) i valori sono inoltre
+memorizzati per la durata della richiesta: letture ripetute dello stesso
+valore non toccano nemmeno il token di versione.
+"""
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# I payload versionati non cambiano mai: il TTL serve solo a liberare spazio
+PAYLOAD_TIMEOUT = 86400
+
+# Namespace noti
+CONFIGURABLE_TEXTS = 'configurable_texts'
+GLOBAL_CONFIG = 'global_config'
+INVITATION_CODES = 'invitation_codes'
+WHATSAPP_PROFILES = 'whatsapp_profiles'
+HEATMAP_GRIDS = 'heatmap_grids'
+SEARCH_INDEX = 'search_index'
+
+_local_memo = {}
+_local_lock = threading.Lock()
+
+# Memo per-richiesta: None fuori da una richiesta (worker, management command)
+_request_memo = contextvars.ContextVar('wedding_request_memo', default=None)
+
+
+@contextmanager
+def request_memo():
+    """Attiva il memo per-richiesta per la durata del blocco."""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def _version_key(namespace):
+    return f"wedding:{namespace}:version"
+
+
+def get_version(namespace):
+    """Ritorna il token di versione corrente del namespace (creandolo se assente)."""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() è atomico: se un altro worker ha già creato il token usiamo il suo
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key) or version
+    return version
+
+
+def _changed_at_key(namespace):
+    return f"wedding:{namespace}:changed_at"
+
+
+def changed_at(namespace):
+    """Epoch (secondi) dell'ultima invalidazione del namespace; None se mai invalidato."""
+    return cache.get(_changed_at_key(namespace))
+
+
+def invalidate(namespace):
+    """
+    Invalida il namespace per tutti i worker.
+
+    Il token viene sostituito subito (letture nella stessa transazione) e di
+    nuovo al commit, così un worker che ha ricalcolato il valore leggendo dati
+    non ancora committati non lascia in cache uno snapshot obsoleto.
+    """
+    def _bump():
+        cache.set_many({
+            _version_key(namespace): uuid.uuid4().hex,
+            _changed_at_key(namespace): int(time.time()),
+        }, timeout=None)
+
+    memo = _request_memo.get()
+    if memo:
+        for memo_key in [k for k in memo if k[0] == namespace]:
+            del memo[memo_key]
+
+    _bump()
+    transaction.on_commit(_bump)
+    logger.debug(f"♻️ Cache namespace '{namespace}' invalidated")
+
+
+def get_or_compute(namespace, key, compute):
+    """
+    Ritorna il valore di `key` per la versione corrente del namespace.
+    Ordine di lookup: memo di richiesta → memo di processo → cache condivisa → compute().
+    """
+    request_memo_dict = _request_memo.get()
+    if request_memo_dict is not None and (namespace, key) in request_memo_dict:
+        return request_memo_dict[(namespace, key)]
+
+    value = _get_versioned(namespace, key, compute)
+    if request_memo_dict is not None:
+        request_memo_dict[(namespace, key)] = value
+    return value
+
+
+def _get_versioned(namespace, key, compute):
+    version = get_version(namespace)
+
+    with _local_lock:
+        memo_version, memo = _local_memo.get(namespace, (None, None))
+        if memo_version != version:
+            memo = {}
+            _local_memo[namespace] = (version, memo)
+        if key in memo:
+            return memo[key]
+
+    shared_key = f"wedding:{namespace}:{version}:{key}"
+    value = cache.get(shared_key)
+    if value is None:
+        value = compute()
+        cache.set(shared_key, value, timeout=PAYLOAD_TIMEOUT)
+
+    with _local_lock:
+        memo[key] = value
+    return value
+
+
+def clear_local():
+    """Svuota il memo del processo corrente (usato dai test)."""
+    with _local_lock:
+        _local_memo.clear()
@@ -0,0 +1,287 @@
+"""
+Export in streaming di inviti, ospiti e logistica (CSV, JSONL, XLSX).
+
+Una riga per ospite con i campi dell'invito ripetuti; gli inviti senza ospiti
+producono una riga con i campi ospite vuoti (LEFT JOIN). Le colonne si
+scelgono con ?columns= tra quelle di COLUMNS.
+
+Memoria costante rispetto alla lista invitati:
+- gli inviti vengono letti a chunk con paginazione keyset sull'id (una
+  query per gli id del chunk, una per le righe con join su ospiti, stanze e
+  alloggi, una per le etichette se richieste). Niente cursori server-side:
+  con pgBouncer in transaction pooling (vedi docs/PGBOUNCER.md) non sono
+  utilizzabili e senza di essi .iterator() su psycopg2 caricherebbe tutto
+  il risultato in memoria.
+- ogni chunk viene serializzato e ceduto alla StreamingHttpResponse.
+- l'XLSX è scritto con zipfile su uno stream non seekable (data descriptor)
+  e celle inline: niente tabella sharedStrings da tenere in memoria,
+  l'equivalente del write-only mode di openpyxl senza la dipendenza.
+"""
+import csv
+import json
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from .models import Invitation
+
+# chiave → percorsi ORM (values_list) in ordine di priorità: vince il primo non nullo
+COLUMNS = {
+    'invitation_code': ('code',),
+    'invitation_name': ('name',),
+    'status': ('status',),
+    'origin': ('origin',),
+    'phone_number': ('phone_number',),
+    'first_name': ('guests__first_name',),
+    'last_name': ('guests__last_name',),
+    'is_child': ('guests__is_child',),
+    'not_coming': ('guests__not_coming',),
+    'dietary_requirements': ('guests__dietary_requirements',),
+    'accommodation': ('guests__assigned_room__accommodation__name', 'accommodation__name'),
+    'room': ('guests__assigned_room__room_number',),
+    'accommodation_requested': ('accommodation_requested',),
+    'transfer_requested': ('transfer_requested',),
+    'travel_transport_type': ('travel_transport_type',),
+    'travel_schedule': ('travel_schedule',),
+    'travel_car_with': ('travel_car_with',),
+    'labels': (),  # una query per chunk sulla tabella through
+}
+LABEL_SEPARATOR = ', '
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 500)
+
+
+def parse_columns(value):
+    """?columns=a,b → lista validata; None/'' → tutte. ValueError con le colonne sconosciute."""
+    if not value:
+        return list(COLUMNS)
+    columns = [column.strip() for column in value.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}" if unknown else "No columns requested")
+    return columns
+
+
+def iter_rows(queryset, columns, chunk_size=None):
+    """
+    Genera liste di righe (una lista per chunk di inviti), ogni riga è una
+    lista di valori nell'ordine di `columns`.
+    """
+    chunk_size = chunk_size or _chunk_size()
+    paths = list(dict.fromkeys(path for column in columns for path in COLUMNS[column]))
+    position = {path: index for index, path in enumerate(paths, start=1)}
+    with_labels = 'labels' in columns
+    through = Invitation.labels.through
+
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True).distinct()[:chunk_size]
+        )
+        if not ids:
+            return
+        last_id = ids[-1]
+
+        labels = {}
+        if with_labels:
+            rows = through.objects.filter(invitation_id__in=ids).order_by('invitationlabel__name')
+            for invitation_id, name in rows.values_list('invitation_id', 'invitationlabel__name'):
+                labels.setdefault(invitation_id, []).append(name)
+
+        chunk = []
+        rows = Invitation.objects.filter(id__in=ids).order_by('id', 'guests__id').values_list('id', *paths)
+        for row in rows:
+            values = []
+            for column in columns:
+                if column == 'labels':
+                    values.append(LABEL_SEPARATOR.join(labels.get(row[0], ())))
+                    continue
+                value = None
+                for path in COLUMNS[column]:
+                    value = row[position[path]]
+                    if value is not None:
+                        break
+                values.append(value)
+            chunk.append(values)
+        yield chunk
+
+
+# ---------------------------------------------
+# SERIALIZZAZIONE PER FORMATO
+# ---------------------------------------------
+
+class _Echo:
+    """Pseudo-buffer per csv.writer: write() ritorna la riga invece di scriverla."""
+    def write(self, value):
+        return value
+
+
+# Prefissi che Excel/LibreOffice interpretano come formula (CSV injection):
+# nomi e cognomi arrivano dagli ospiti tramite l'RSVP.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, chunks):
+    writer = csv.writer(_Echo())
+    # BOM: Excel apre correttamente accenti e caratteri non ASCII
+    yield ('\ufeff' + writer.writerow(columns)).encode('utf-8')
+    for chunk in chunks:
+        yield ''.join(writer.writerow([_csv_cell(value) for value in row]) for row in chunk).encode('utf-8')
+
+
+def stream_jsonl(columns, chunks):
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n' for row in chunk
+        ).encode('utf-8')
+
+
+class _ZipSink:
+    """Destinazione non seekable di ZipFile: accumula i byte scritti fino al drain()."""
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Invitati" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(columns, chunks):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(columns)
+            ).encode('utf-8'))
+            for chunk in chunks:
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode('utf-8'))
+                yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+async def aiter_stream(iterator):
+    """
+    Versione async di uno stream sync per ASGI: StreamingHttpResponse
+    consumerebbe un iteratore sync per intero prima di inviarlo. Ogni
+    chunk è prodotto nel thread sync condiviso (stessa connessione DB).
+    """
+    next_part = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while True:
+        part = await next_part(iterator, done)
+        if part is done:
+            return
+        yield part
+
+
+# ---------------------------------------------
+# RENDERER (negoziazione ?format= / Accept)
+# ---------------------------------------------
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Usati solo per la negoziazione del formato: il contenuto è prodotto in
+    streaming dalla view. render() serve per i payload di errore di DRF.
+    """
+    charset = 'utf-8'
+    stream = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode('utf-8')
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    stream = staticmethod(stream_csv)
+
+
+class JSONLRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    stream = staticmethod(stream_jsonl)
+
+
+class XLSXRenderer(_ExportRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+    charset = None
+    stream = staticmethod(stream_xlsx)
+
+
+RENDERERS = [CSVRenderer, JSONLRenderer, XLSXRenderer]
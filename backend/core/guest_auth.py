@@ -0,0 +1,142 @@
+"""
+Autenticazione ospiti per la Public API.
+
+Due modalità (settings.GUEST_AUTH_MODE):
+- 'session' (default): invitation_id salvato nella sessione Django (tabella django_session).
+- 'signed': l'endpoint di auth emette un cookie firmato (HMAC via django.core.signing)
+  con invitation_id e timestamp; le view pubbliche lo verificano senza toccare il DB.
+
+In modalità 'signed' le sessioni legacy restano valide: se la richiesta non ha
+il cookie firmato ma ha una sessione con invitation_id, la sessione viene letta
+una volta e la risposta emette il cookie firmato (upgrade trasparente).
+Le righe django_session rimaste si eliminano con `manage.py purge_guest_sessions`.
+"""
+import logging
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+MODE_SESSION = 'session'
+MODE_SIGNED = 'signed'
+
+GUEST_COOKIE_NAME = 'wedding_guest'
+_SALT = 'core.guest_auth'
+
+
+def is_signed_mode():
+    return getattr(settings, 'GUEST_AUTH_MODE', MODE_SESSION) == MODE_SIGNED
+
+
+def _max_age():
+    return getattr(settings, 'GUEST_TOKEN_MAX_AGE', settings.SESSION_COOKIE_AGE)
+
+
+def issue_token(invitation_id):
+    """Token firmato (HMAC + timestamp) per l'invito."""
+    return signing.TimestampSigner(salt=_SALT).sign(str(invitation_id))
+
+
+def verify_token(token):
+    """Ritorna l'invitation_id se il token è integro e non scaduto, altrimenti None."""
+    try:
+        value = signing.TimestampSigner(salt=_SALT).unsign(token, max_age=_max_age())
+        return int(value)
+    except signing.SignatureExpired:
+        logger.info("Guest token expired")
+    except (signing.BadSignature, ValueError):
+        logger.warning("Invalid guest token signature")
+    return None
+
+
+def set_cookie(response, invitation_id):
+    response.set_cookie(
+        GUEST_COOKIE_NAME,
+        issue_token(invitation_id),
+        max_age=_max_age(),
+        httponly=True,
+        secure=settings.SESSION_COOKIE_SECURE,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+
+
+def login(request, response, invitation, link_token):
+    """Registra l'ospite autenticato secondo la modalità configurata."""
+    if is_signed_mode():
+        set_cookie(response, invitation.id)
+        return
+    request.session['invitation_code'] = invitation.code
+    request.session['invitation_token'] = link_token
+    request.session['invitation_id'] = invitation.id
+    request.session.save()
+
+
+async def alogin(request, response, invitation, link_token):
+    """Versione async di login() per le view ASGI (sessione via API async)."""
+    if is_signed_mode():
+        set_cookie(response, invitation.id)
+        return
+    await request.session.aset('invitation_code', invitation.code)
+    await request.session.aset('invitation_token', link_token)
+    await request.session.aset('invitation_id', invitation.id)
+    await request.session.asave()
+
+
+def _cookie_invitation_id(request):
+    token = request.COOKIES.get(GUEST_COOKIE_NAME)
+    return verify_token(token) if token else None
+
+
+def get_invitation_id(request):
+    """
+    Risolve l'ospite dal cookie firmato o dalla sessione. In modalità 'signed'
+    una sessione legacy viene letta una volta e marcata per l'upgrade
+    (vedi finalize()).
+    """
+    if is_signed_mode():
+        invitation_id = _cookie_invitation_id(request)
+        if invitation_id:
+            return invitation_id
+        # Percorso di migrazione: sessione DB creata prima dell'attivazione
+        invitation_id = request.session.get('invitation_id')
+        if invitation_id:
+            request._guest_upgrade_id = invitation_id
+        return invitation_id
+    return request.session.get('invitation_id')
+
+
+async def aget_invitation_id(request):
+    """Versione async di get_invitation_id(): il cookie firmato non esce dall'event loop."""
+    if is_signed_mode():
+        invitation_id = _cookie_invitation_id(request)
+        if invitation_id:
+            return invitation_id
+        invitation_id = await request.session.aget('invitation_id')
+        if invitation_id:
+            request._guest_upgrade_id = invitation_id
+        return invitation_id
+    return await request.session.aget('invitation_id')
+
+
+def finalize(request, response):
+    """Completa l'upgrade delle sessioni legacy emettendo il cookie firmato."""
+    upgrade_id = getattr(request, '_guest_upgrade_id', None)
+    if upgrade_id:
+        set_cookie(response, upgrade_id)
+    return response
+
+
+class GuestAuthMixin:
+    """
+    Mixin per le APIView pubbliche: get_invitation_id() risolve l'ospite dal
+    cookie firmato o dalla sessione, finalize_response() completa l'upgrade
+    delle sessioni legacy emettendo il cookie firmato.
+    """
+
+    def get_invitation_id(self, request):
+        return get_invitation_id(request)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return finalize(request, response)
@@ -0,0 +1,143 @@
+"""
+Formato binario compatto per le tracce mouse di GuestHeatmap.
+
+Il frontend invia punti {x, y, t} (t = epoch ms); i dati storici/di test
+usano anche liste [x, y, t]. Un blob conserva la forma originale:
+
+    MAGIC(1) | zlib( header | dx[] | dy[] | dt[] )
+    header = version(B) shape(B) coord_width(B) count(I) x0(q) y0(q) t0(q)
+
+- Il primo punto è assoluto, i successivi sono delta rispetto al precedente.
+- dx/dy: int16 (array 'h') se tutti i delta ci stanno, altrimenti int32 ('i').
+- dt: uint32 (array 'I'): il campionamento è monotono, delta sempre >= 0.
+- Layout colonnare + zlib: i delta piccoli e ripetitivi comprimono molto.
+
+encode() ritorna None se i punti non sono rappresentabili senza perdita
+(coordinate float, chiavi extra, tempi non monotoni...): il chiamante
+conserva allora il JSON originale.
+"""
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+MAGIC = b'\xa7'
+VERSION = 1
+
+SHAPE_LIST = 0  # [x, y, t]
+SHAPE_DICT = 1  # {'x': .., 'y': .., 't': ..}
+
+_HEADER = struct.Struct('<BBBIqqq')
+_INT16 = (-32768, 32767)
+_UINT32_MAX = 0xFFFFFFFF
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+_DICT_KEYS = {'x', 'y', 't'}
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _columns(points):
+    """Ritorna (shape, xs, ys, ts) oppure None se il formato non è supportato."""
+    first = points[0]
+    if isinstance(first, dict):
+        shape = SHAPE_DICT
+        if any(not isinstance(p, dict) or p.keys() != _DICT_KEYS for p in points):
+            return None
+        xs = [p['x'] for p in points]
+        ys = [p['y'] for p in points]
+        ts = [p['t'] for p in points]
+    elif isinstance(first, (list, tuple)):
+        shape = SHAPE_LIST
+        if any(not isinstance(p, (list, tuple)) or len(p) != 3 for p in points):
+            return None
+        xs, ys, ts = (list(col) for col in zip(*points))
+    else:
+        return None
+    if not all(_is_int(v) for col in (xs, ys, ts) for v in col):
+        return None
+    return shape, xs, ys, ts
+
+
+def _deltas(values):
+    return [b - a for a, b in zip(values, values[1:])]
+
+
+def _to_bytes(arr):
+    if sys.byteorder != 'little':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(typecode, raw):
+    arr = array(typecode)
+    arr.frombytes(raw)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr
+
+
+def encode(points):
+    """Impacchetta la lista di punti in un blob compresso (None se non possibile)."""
+    if not points or not isinstance(points, list):
+        return None
+    columns = _columns(points)
+    if columns is None:
+        return None
+    shape, xs, ys, ts = columns
+    if not all(_INT64[0] <= v[0] <= _INT64[1] for v in (xs, ys, ts)):
+        return None
+
+    dx, dy, dt = _deltas(xs), _deltas(ys), _deltas(ts)
+    if any(d < 0 or d > _UINT32_MAX for d in dt):
+        return None
+    coord_code = 'h' if all(_INT16[0] <= d <= _INT16[1] for d in dx + dy) else 'i'
+    if coord_code == 'i' and not all(-(1 << 31) <= d < (1 << 31) for d in dx + dy):
+        return None
+
+    header = _HEADER.pack(VERSION, shape, array(coord_code).itemsize, len(points), xs[0], ys[0], ts[0])
+    body = b''.join((
+        header,
+        _to_bytes(array(coord_code, dx)),
+        _to_bytes(array(coord_code, dy)),
+        _to_bytes(array('I', dt)),
+    ))
+    return MAGIC + zlib.compress(body, 6)
+
+
+def decode(blob):
+    """Ricostruisce la lista di punti nella forma JSON originale."""
+    shape, xs, ys, ts = _decode_columns(blob)
+    if shape == SHAPE_DICT:
+        return [{'x': x, 'y': y, 't': t} for x, y, t in zip(xs, ys, ts)]
+    return [[x, y, t] for x, y, t in zip(xs, ys, ts)]
+
+
+def decode_xy(blob):
+    """Solo le coordinate (xs, ys) come iterabili: per aggregazioni senza costruire i punti."""
+    _, xs, ys, _ = _decode_columns(blob)
+    return xs, ys
+
+
+def _decode_columns(blob):
+    blob = bytes(blob)  # memoryview da psycopg2
+    if blob[:1] != MAGIC:
+        raise ValueError("Not a heatmap blob")
+    body = zlib.decompress(blob[1:])
+    version, shape, coord_width, count, x0, y0, t0 = _HEADER.unpack_from(body)
+    if version != VERSION:
+        raise ValueError(f"Unsupported heatmap blob version {version}")
+
+    coord_code = 'h' if coord_width == 2 else 'i'
+    n = count - 1
+    offset = _HEADER.size
+    dx = _from_bytes(coord_code, body[offset:offset + n * coord_width])
+    offset += n * coord_width
+    dy = _from_bytes(coord_code, body[offset:offset + n * coord_width])
+    offset += n * coord_width
+    dt = _from_bytes('I', body[offset:offset + n * 4])
+
+    return shape, accumulate(dx, initial=x0), accumulate(dy, initial=y0), accumulate(dt, initial=t0)
@@ -0,0 +1,119 @@
+"""
+Rasterizzazione server-side delle heatmap in una griglia di densità.
+
+Tutti i punti dei segmenti GuestHeatmap selezionati (un invito, un'etichetta
+o l'intero evento) vengono normalizzati sul viewport del segmento
+(x / screen_width, y / screen_height) e contati in una griglia cols × rows.
+La risposta contiene la densità normalizzata (0..1 rispetto alla cella più
+calda): pochi KB invece dei punti grezzi.
+
+Il risultato è cachato nel namespace HEATMAP_GRIDS, invalidato dai signal
+ad ogni nuovo chunk/segmento GuestHeatmap.
+"""
+import math
+from array import array
+
+from . import cache as app_cache
+from . import heatmap_codec
+
+DEFAULT_COLS = 64
+DEFAULT_ROWS = 36
+MAX_RESOLUTION = 256
+
+SCOPE_EVENT = 'event'
+SCOPE_INVITATION = 'invitation'
+SCOPE_LABEL = 'label'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _point_xy(point):
+    """(x, y) di un punto JSON; (None, None) se malformato (es. [1], 5, "a")."""
+    if isinstance(point, dict):
+        return point.get('x'), point.get('y')
+    if isinstance(point, (list, tuple)) and len(point) >= 2:
+        return point[0], point[1]
+    return None, None
+
+
+def valid_points(points):
+    """Solo i punti ben formati ({x, y, ...} o [x, y, ...] con coordinate numeriche)."""
+    return [p for p in points if all(_is_number(v) for v in _point_xy(p))]
+
+
+def _segment_xy(segment):
+    """
+    Coordinate (xs, ys) del segmento senza materializzare i punti JSON.
+    I punti malformati (righe salvate prima della validazione in ingest)
+    diventano None e finiscono in out_of_bounds.
+    """
+    if segment.mouse_blob:
+        return heatmap_codec.decode_xy(segment.mouse_blob)
+    pairs = [_point_xy(p) for p in segment.raw_mouse_data or []]
+    return [x for x, _ in pairs], [y for _, y in pairs]
+
+
+def rasterize(segments, cols=DEFAULT_COLS, rows=DEFAULT_ROWS):
+    """
+    Conta i punti per cella. I punti fuori dal viewport (es. pageY oltre la
+    piega dopo uno scroll) o di segmenti senza dimensioni sono esclusi e
+    riportati in out_of_bounds.
+    """
+    counts = array('I', [0]) * (cols * rows)
+    total = 0
+    out_of_bounds = 0
+
+    for segment in segments:
+        width, height = segment.screen_width, segment.screen_height
+        xs, ys = _segment_xy(segment)
+        if width <= 0 or height <= 0:
+            skipped = sum(1 for _ in xs)
+            total += skipped
+            out_of_bounds += skipped
+            continue
+        for x, y in zip(xs, ys):
+            total += 1
+            if not _is_number(x) or not _is_number(y):
+                out_of_bounds += 1
+                continue
+            # Aritmetica intera: cella = floor(x * cols / width)
+            cx = int(x * cols // width)
+            cy = int(y * rows // height)
+            if 0 <= cx < cols and 0 <= cy < rows:
+                counts[cy * cols + cx] += 1
+            else:
+                out_of_bounds += 1
+
+    max_count = max(counts) if counts else 0
+    grid = [
+        [round(counts[r * cols + c] / max_count, 4) if max_count else 0 for c in range(cols)]
+        for r in range(rows)
+    ]
+    return {
+        'cols': cols,
+        'rows': rows,
+        'points': total - out_of_bounds,
+        'out_of_bounds': out_of_bounds,
+        'max_count': max_count,
+        'grid': grid,
+    }
+
+
+def density_grid(scope, scope_id=None, cols=DEFAULT_COLS, rows=DEFAULT_ROWS):
+    """Griglia cachata per (scope, id, risoluzione)."""
+    from .models import GuestHeatmap
+
+    def _compute():
+        segments = GuestHeatmap.objects.only('screen_width', 'screen_height', 'mouse_blob', 'raw_mouse_data')
+        if scope == SCOPE_INVITATION:
+            segments = segments.filter(invitation_id=scope_id)
+        elif scope == SCOPE_LABEL:
+            segments = segments.filter(invitation__labels__id=scope_id).distinct()
+        result = rasterize(segments.iterator(chunk_size=200), cols, rows)
+        result.update({'scope': scope, 'scope_id': scope_id})
+        return result
+
+    key = f"{scope}:{scope_id}:{cols}x{rows}"
+    return app_cache.get_or_compute(app_cache.HEATMAP_GRIDS, key, _compute)
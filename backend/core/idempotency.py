@@ -0,0 +1,93 @@
+"""
+Deduplicazione delle submission RSVP ripetute (doppio tap, retry da rete instabile).
+
+- Con header `Idempotency-Key` l'esito viene salvato per chiave: ogni replay
+  della stessa chiave con lo stesso payload riceve la risposta originale; la
+  stessa chiave con un payload diverso è un errore del client
+  (KeyReusedError, la view risponde 422).
+- Senza header si usa un fingerprint SHA-256 del payload canonico. Viene
+  ricordato solo l'ultimo RSVP applicato all'invito, così una sequenza
+  conferma → declino → conferma viene comunque applicata per intero.
+
+Gli esiti stanno nella tabella RSVPIdempotencyRecord, con scadenza
+RSVP_IDEMPOTENCY_TTL, e vengono scritti dentro la transazione che tiene il lock
+dell'invito: una richiesta gemella bloccata su select_for_update li vede appena
+il lock viene rilasciato. Un replay costa una query, senza lock né scritture.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+LAST_KEY = ''  # record dell'ultimo RSVP applicato all'invito
+
+
+def _ttl():
+    return getattr(settings, 'RSVP_IDEMPOTENCY_TTL', 600)
+
+
+def fingerprint(data):
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class KeyReusedError(Exception):
+    """Idempotency-Key già usata per una submission con payload diverso."""
+
+
+class RSVPIdempotency:
+    """Chiavi di deduplicazione di una richiesta RSVP per un invito."""
+
+    def __init__(self, request, invitation_id):
+        self.invitation_id = invitation_id
+        self.fingerprint = fingerprint(request.data)
+        key = request.META.get(HEADER, '').strip()
+        self.key = hashlib.sha256(key.encode('utf-8')).hexdigest() if key and len(key) <= MAX_KEY_LENGTH else None
+
+    def replay(self):
+        """
+        (status_code, data) della risposta già data, oppure None.
+        KeyReusedError se la chiave esplicita era stata usata con un altro payload.
+        """
+        from .models import RSVPIdempotencyRecord
+
+        stored = RSVPIdempotencyRecord.objects.filter(
+            invitation_id=self.invitation_id,
+            key=self.key or LAST_KEY,
+            expires_at__gt=timezone.now(),
+        ).values('fingerprint', 'status_code', 'response').first()
+        if not stored:
+            return None
+        if stored['fingerprint'] != self.fingerprint:
+            if self.key:
+                raise KeyReusedError()
+            return None
+        return stored['status_code'], stored['response']
+
+    def store(self, status_code, data):
+        """
+        Salva l'esito. Va chiamato dentro la transazione che tiene il lock
+        dell'invito, prima del commit.
+        """
+        from .models import RSVPIdempotencyRecord
+
+        now = timezone.now()
+        outcome = {
+            'fingerprint': self.fingerprint,
+            'status_code': status_code,
+            'response': data,
+            'expires_at': now + timedelta(seconds=_ttl()),
+        }
+        records = RSVPIdempotencyRecord.objects.filter(invitation_id=self.invitation_id)
+        records.filter(expires_at__lte=now).delete()
+        # L'ultimo RSVP applicato viene sempre aggiornato: anche una submission con
+        # chiave esplicita invalida i fingerprint precedenti
+        for key in {LAST_KEY, self.key or LAST_KEY}:
+            RSVPIdempotencyRecord.objects.update_or_create(
+                invitation_id=self.invitation_id, key=key, defaults=outcome
+            )
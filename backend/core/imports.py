@@ -0,0 +1,547 @@
+"""
+Import massivo di inviti e ospiti da CSV o XLSX (una riga per invito).
+
+Colonne riconosciute (intestazione case-insensitive, alias italiani in
+COLUMN_ALIASES): name (obbligatoria), code, phone_number, origin, guests,
+labels, accommodation_offered, transfer_offered. `guests` e `labels` sono
+liste separate da virgola, punto e virgola o a capo; senza `guests` l'invito
+ha un solo ospite con il nome dell'invito (come l'import da rubrica).
+
+Pipeline:
+- read_rows() legge il file in streaming (csv.reader / iterparse sull'XML
+  dell'XLSX, senza dipendenze esterne) e produce una riga alla volta.
+- Le righe sono validate a chunk di IMPORT_CHUNK_SIZE. Codici esistenti,
+  telefoni esistenti ed etichette vengono letti una volta all'inizio: i
+  codici slug univoci si generano in memoria, senza una query per riga.
+- Ogni chunk è una transazione con un bulk_create per Invitation, Person e
+  tabella through delle etichette. bulk_create non emette post_save: niente
+  messaggi WhatsApp né verifica contatto per riga; gli indici in cache
+  (INVITATION_CODES, SEARCH_INDEX) vengono invalidati a fine chunk.
+- La verifica dei contatti è rimandata a utils.verify_whatsapp_contacts(),
+  a batch, dopo la scrittura.
+
+submit() salva l'upload in un ImportJob sul DB e risponde subito 202; il job
+è eseguito dal worker (manage.py run_import_worker, stesso schema di
+run_assignment_worker). Ogni chunk scrive nella sua transazione anche il
+checkpoint del job (ultima riga, statistiche, id creati): se il worker muore
+(deploy, OOM) al riavvio il job torna in coda e riprende dalla riga dopo
+l'ultimo chunk scritto, senza duplicare gli inviti. Anche la verifica contatti
+riprende da dove era arrivata. Il comando `import_invitations` usa la stessa
+pipeline.
+"""
+import csv
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+from django.core.validators import validate_slug
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import cache as app_cache
+from .models import ImportJob, Invitation, InvitationLabel, Person
+
+logger = logging.getLogger(__name__)
+
+COLUMN_ALIASES = {
+    'name': ('name', 'nome', 'invito', 'famiglia'),
+    'code': ('code', 'codice', 'slug'),
+    'phone_number': ('phone_number', 'phone', 'telefono', 'cellulare'),
+    'origin': ('origin', 'appartenenza', 'lato'),
+    'guests': ('guests', 'ospiti', 'invitati'),
+    'labels': ('labels', 'etichette'),
+    'accommodation_offered': ('accommodation_offered', 'alloggio'),
+    'transfer_offered': ('transfer_offered', 'transfer'),
+}
+_COLUMNS = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+ORIGIN_ALIASES = {
+    'groom': Invitation.Origin.GROOM, 'sposo': Invitation.Origin.GROOM,
+    'bride': Invitation.Origin.BRIDE, 'sposa': Invitation.Origin.BRIDE,
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'si', 'sì', 'x'}
+MAX_REPORTED_ERRORS = 100
+
+_LIST_SEPARATOR = re.compile(r'[,;\n]')
+_CODE_MAX_LENGTH = Invitation._meta.get_field('code').max_length
+_PHONE_MAX_LENGTH = Invitation._meta.get_field('phone_number').max_length
+_LABEL_MAX_LENGTH = InvitationLabel._meta.get_field('name').max_length
+
+
+class ImportFileError(Exception):
+    """File illeggibile o senza le colonne minime: l'import non parte."""
+
+
+def _chunk_size():
+    return getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+
+
+def _empty_stats():
+    return {'rows': 0, 'invitations': 0, 'guests': 0, 'error_count': 0, 'errors': []}
+
+
+# ---------------------------------------------
+# LETTURA STREAMING
+# ---------------------------------------------
+
+def _csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for line, values in enumerate(csv.reader(f, dialect), start=1):
+            yield line, values
+
+
+_XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_XLSX_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_CELL_REF = re.compile(r'([A-Z]+)')
+
+
+def _xlsx_first_sheet(archive):
+    """Percorso del primo foglio secondo workbook.xml e le sue relationships."""
+    try:
+        with archive.open('xl/workbook.xml') as f:
+            sheet = next(el for _, el in iterparse(f) if el.tag == f'{_XLSX_NS}sheet')
+        rel_id = sheet.get(f'{_XLSX_REL_NS}id')
+        with archive.open('xl/_rels/workbook.xml.rels') as f:
+            for _, el in iterparse(f):
+                if el.get('Id') == rel_id:
+                    target = el.get('Target').lstrip('/')
+                    return target if target.startswith('xl/') else f'xl/{target}'
+    except (KeyError, StopIteration):
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _xlsx_shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, el in iterparse(f):
+            if el.tag == f'{_XLSX_NS}si':
+                strings.append(''.join(t.text or '' for t in el.iter(f'{_XLSX_NS}t')))
+                el.clear()
+    return strings
+
+
+def _xlsx_column_index(ref):
+    index = 0
+    for ch in _CELL_REF.match(ref).group(1):
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def _xlsx_cell_value(cell, shared_strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f'{_XLSX_NS}t'))
+    value = cell.findtext(f'{_XLSX_NS}v') or ''
+    if kind == 's':
+        return shared_strings[int(value)] if value else ''
+    if kind in (None, 'n') and value:
+        # I telefoni salvati come numero non devono diventare '3331234567.0'
+        number = float(value)
+        return str(int(number)) if number.is_integer() else value
+    return value
+
+
+def _xlsx_rows(path):
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ImportFileError(f"Invalid XLSX file: {e}")
+    with archive:
+        shared_strings = _xlsx_shared_strings(archive)
+        with archive.open(_xlsx_first_sheet(archive)) as f:
+            for _, el in iterparse(f):
+                if el.tag != f'{_XLSX_NS}row':
+                    continue
+                values = []
+                for cell in el.iter(f'{_XLSX_NS}c'):
+                    ref = cell.get('r')
+                    index = _xlsx_column_index(ref) if ref else len(values)
+                    values.extend([''] * (index - len(values)))
+                    values.append(_xlsx_cell_value(cell, shared_strings))
+                yield int(el.get('r', 0)), values
+                el.clear()
+
+
+def read_rows(path, filename=None):
+    """
+    Generatore lazy di (numero riga, {colonna: valore}) da un file CSV o XLSX.
+    La prima riga non vuota è l'intestazione; colonne sconosciute ignorate.
+    """
+    name = (filename or str(path)).lower()
+    rows = _xlsx_rows(path) if name.endswith('.xlsx') else _csv_rows(path)
+    header = None
+    try:
+        for line, values in rows:
+            if not any(str(value).strip() for value in values):
+                continue
+            if header is None:
+                header = [_COLUMNS.get(str(value).strip().lower()) for value in values]
+                if 'name' not in header:
+                    raise ImportFileError("Missing required column 'name'")
+                continue
+            yield line, {column: str(value).strip() for column, value in zip(header, values) if column}
+    except UnicodeDecodeError:
+        raise ImportFileError("CSV files must be UTF-8 encoded")
+
+
+def _split_list(value):
+    return [item.strip() for item in _LIST_SEPARATOR.split(value or '') if item.strip()]
+
+
+def normalize_phone(raw):
+    """Stesse regole di normalizePhone del frontend: cifre e '+', 00 → +, mobile IT → +39."""
+    phone = re.sub(r'[^\d+]', '', raw or '')
+    if phone.startswith('00'):
+        phone = '+' + phone[2:]
+    if not phone.startswith('+') and len(phone) in (9, 10) and phone.startswith('3'):
+        phone = '+39' + phone
+    return phone
+
+
+# ---------------------------------------------
+# VALIDAZIONE E SCRITTURA A CHUNK
+# ---------------------------------------------
+
+class _Entry:
+    __slots__ = ('line', 'invitation', 'guests', 'labels')
+
+    def __init__(self, line, invitation, guests, labels):
+        self.line = line
+        self.invitation = invitation
+        self.guests = guests
+        self.labels = labels
+
+
+class InvitationImport:
+    """
+    Un import: legge il file, valida e scrive a chunk, tiene le statistiche.
+    on_progress(stats) viene chiamato dopo ogni chunk.
+    on_checkpoint(stats, last_line, created_ids) riceve lo stato dopo il chunk:
+    per un chunk scritto è chiamato dentro la sua transazione, così il
+    checkpoint e gli inviti vengono confermati (o persi) insieme. Per
+    riprendere, resume_after, stats e created_ids vengono dal checkpoint: le
+    righe fino a resume_after sono saltate.
+    """
+
+    def __init__(self, path, filename=None, origin=Invitation.Origin.GROOM, chunk_size=None, on_progress=None,
+                 on_checkpoint=None, resume_after=0, stats=None, created_ids=None):
+        self.path = path
+        self.filename = filename
+        self.origin = origin
+        self.chunk_size = chunk_size or _chunk_size()
+        self.on_progress = on_progress
+        self.on_checkpoint = on_checkpoint
+        self.resume_after = resume_after
+        self.created_ids = list(created_ids or [])
+        self.stats = {**_empty_stats(), **(stats or {})}
+        self.stats['errors'] = list(self.stats['errors'])
+        self._last_line = resume_after
+
+    def run(self):
+        self._codes = set(Invitation.objects.values_list('code', flat=True))
+        self._phones = set(Invitation.objects.exclude(phone_number=None).values_list('phone_number', flat=True))
+        self._labels = dict(InvitationLabel.objects.values_list('name', 'id'))
+
+        chunk = []
+        for line, row in read_rows(self.path, self.filename):
+            if line <= self.resume_after:
+                continue
+            self._last_line = line
+            self.stats['rows'] += 1
+            try:
+                chunk.append(self._validate(line, row))
+            except ValueError as e:
+                self._error(line, str(e))
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        self._flush(chunk)
+        return self.stats
+
+    def _error(self, line, message):
+        self.stats['error_count'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            self.stats['errors'].append({'row': line, 'error': message})
+
+    def _validate(self, line, row):
+        name = row.get('name', '')
+        if not name:
+            raise ValueError("name is required")
+
+        phone = normalize_phone(row.get('phone_number')) or None
+        if phone and len(phone) > _PHONE_MAX_LENGTH:
+            raise ValueError(f"phone_number '{row['phone_number']}' is too long")
+        if phone and phone in self._phones:
+            raise ValueError(f"phone_number {phone} already belongs to an invitation")
+
+        origin = self.origin
+        if row.get('origin'):
+            origin = ORIGIN_ALIASES.get(row['origin'].lower())
+            if origin is None:
+                raise ValueError(f"origin '{row['origin']}' must be groom or bride")
+
+        labels = _split_list(row.get('labels'))
+        for label in labels:
+            if len(label) > _LABEL_MAX_LENGTH:
+                raise ValueError(f"label '{label}' is longer than {_LABEL_MAX_LENGTH} characters")
+
+        guests = []
+        for full_name in _split_list(row.get('guests')) or [name]:
+            first_name, _, last_name = full_name.partition(' ')
+            guests.append({'first_name': first_name[:100], 'last_name': last_name.strip()[:100] or None})
+
+        code = self._code(row.get('code', ''), name, phone)
+        if phone:
+            self._phones.add(phone)
+        invitation = Invitation(
+            code=code,
+            name=name[:200],
+            phone_number=phone,
+            origin=origin,
+            status=Invitation.Status.IMPORTED,
+            accommodation_offered=row.get('accommodation_offered', '').lower() in TRUE_VALUES,
+            transfer_offered=row.get('transfer_offered', '').lower() in TRUE_VALUES,
+        )
+        return _Entry(line, invitation, guests, labels)
+
+    def _code(self, explicit, name, phone):
+        """Codice esplicito validato, oppure slug nome-telefono reso univoco in memoria."""
+        if explicit:
+            try:
+                validate_slug(explicit)
+            except ValidationError:
+                raise ValueError(f"code '{explicit}' is not a valid slug")
+            if len(explicit) > _CODE_MAX_LENGTH:
+                raise ValueError(f"code '{explicit}' is longer than {_CODE_MAX_LENGTH} characters")
+            if explicit in self._codes:
+                raise ValueError(f"code '{explicit}' already exists")
+            code = explicit
+        else:
+            # Stesso formato di generateSlug del frontend: "mario-rossi-39320..."
+            base = slugify(f"{name} {re.sub(r'[^0-9]', '', phone or '')}")[:_CODE_MAX_LENGTH - 5].strip('-') or 'invito'
+            code, suffix = base, 1
+            while code in self._codes:
+                suffix += 1
+                code = f"{base}-{suffix}"
+        self._codes.add(code)
+        return code
+
+    def _checkpoint(self, stats, created_ids):
+        if self.on_checkpoint:
+            self.on_checkpoint(stats, self._last_line, created_ids)
+
+    def _flush(self, chunk):
+        if not chunk:
+            # Solo righe scartate: nessuna scrittura, ma il checkpoint avanza
+            if self._last_line > self.resume_after:
+                self._checkpoint(self.stats, self.created_ids)
+        else:
+            try:
+                self._write(chunk)
+            except Exception as e:
+                # Es. codice inserito nel frattempo da un'altra richiesta: il chunk
+                # è rollbackato per intero, le righe vengono riportate come errori
+                logger.error(f"❌ Import chunk failed ({len(chunk)} rows): {e}")
+                for entry in chunk:
+                    self._error(entry.line, f"not imported: {e}")
+                self._checkpoint(self.stats, self.created_ids)
+            else:
+                app_cache.invalidate(app_cache.INVITATION_CODES)
+                app_cache.invalidate(app_cache.SEARCH_INDEX)
+        if self.on_progress:
+            self.on_progress(self.stats)
+
+    def _ensure_labels(self, chunk):
+        missing = {label for entry in chunk for label in entry.labels} - self._labels.keys()
+        if missing:
+            InvitationLabel.objects.bulk_create(
+                [InvitationLabel(name=name) for name in missing], ignore_conflicts=True
+            )
+            self._labels.update(InvitationLabel.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def _write(self, chunk):
+        through = Invitation.labels.through
+        with transaction.atomic():
+            self._ensure_labels(chunk)
+            invitations = Invitation.objects.bulk_create([entry.invitation for entry in chunk])
+            Person.objects.bulk_create([
+                Person(invitation=invitation, **guest)
+                for invitation, entry in zip(invitations, chunk)
+                for guest in entry.guests
+            ])
+            through.objects.bulk_create([
+                through(invitation_id=invitation.id, invitationlabel_id=self._labels[label])
+                for invitation, entry in zip(invitations, chunk)
+                for label in dict.fromkeys(entry.labels)
+            ])
+            stats = {
+                **self.stats,
+                'invitations': self.stats['invitations'] + len(chunk),
+                'guests': self.stats['guests'] + sum(len(entry.guests) for entry in chunk),
+            }
+            created_ids = self.created_ids + [invitation.id for invitation in invitations]
+            self._checkpoint(stats, created_ids)
+        self.stats, self.created_ids = stats, created_ids
+
+
+# ---------------------------------------------
+# JOB IN BACKGROUND
+# ---------------------------------------------
+
+def _max_attempts():
+    return getattr(settings, 'IMPORT_JOB_MAX_ATTEMPTS', 3)
+
+
+def submit(uploaded_file, origin=Invitation.Origin.GROOM):
+    """
+    Salva l'upload in un job queued e lo ritorna. In test (DJANGO_TEST_MODE)
+    il job non verifica i contatti, come la verifica nel signal post_save.
+    """
+    return ImportJob.objects.create(
+        filename=uploaded_file.name,
+        origin=origin,
+        source=uploaded_file.read(),
+        stats=_empty_stats(),
+        verify_contacts=os.environ.get('DJANGO_TEST_MODE', 'False') != 'True',
+    )
+
+
+def job_state(job):
+    """Stato del job per l'API: {'status': queued|running|verifying|completed|failed, ...statistiche}."""
+    state = {
+        'status': job.status,
+        **job.stats,
+        'contacts_verified': job.contacts_verified,
+        'started_at': job.started_at,
+        'heartbeat_at': job.heartbeat_at,
+        'finished_at': job.finished_at,
+    }
+    if job.error:
+        state['error'] = job.error
+    return state
+
+
+def get_job(job_id):
+    """Stato del job, None se sconosciuto."""
+    job = ImportJob.objects.defer('source').filter(id=job_id).first()
+    return job_state(job) if job else None
+
+
+def claim_next():
+    """Il job queued più vecchio, passato a running; None se la coda è vuota."""
+    queued = ImportJob.objects.filter(status=ImportJob.Status.QUEUED).order_by('created_at', 'id')
+    for job_id in queued.values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        if ImportJob.objects.filter(id=job_id, status=ImportJob.Status.QUEUED).update(
+            status=ImportJob.Status.RUNNING, attempts=F('attempts') + 1,
+            started_at=Coalesce('started_at', now), heartbeat_at=now,
+        ):
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def requeue_interrupted():
+    """
+    All'avvio del worker: i job rimasti running/verifying appartengono a un
+    worker terminato e tornano in coda, riprenderanno dal loro checkpoint.
+    """
+    return ImportJob.objects.filter(
+        status__in=[ImportJob.Status.RUNNING, ImportJob.Status.VERIFYING]
+    ).update(status=ImportJob.Status.QUEUED)
+
+
+def _update(job, **fields):
+    ImportJob.objects.filter(id=job.id).update(**fields)
+
+
+def _finish(job, status, **fields):
+    # Il file non serve più: il job resta solo come esito
+    now = timezone.now()
+    _update(job, status=status, source=None, heartbeat_at=now, finished_at=now, **fields)
+
+
+def _import(job, path):
+    """Scrive le righe non ancora importate, checkpoint a ogni chunk. Ritorna gli id creati."""
+    def checkpoint(stats, last_line, created_ids):
+        _update(job, stats=stats, last_line=last_line, created_ids=created_ids, heartbeat_at=timezone.now())
+
+    importer = InvitationImport(
+        path, job.filename, origin=job.origin, on_checkpoint=checkpoint,
+        resume_after=job.last_line, stats=job.stats, created_ids=job.created_ids,
+    )
+    importer.run()
+    return importer.created_ids, importer.stats
+
+
+def _verify(job, created_ids):
+    """Verifica i contatti degli inviti creati, saltando quelli già verificati."""
+    from .utils import verify_whatsapp_contacts
+
+    phone_ids = list(
+        Invitation.objects.filter(id__in=created_ids).exclude(phone_number=None)
+        .order_by('id').values_list('id', flat=True)
+    )
+    done = min(job.contacts_verified, len(phone_ids))
+    if done < len(phone_ids):
+        _update(job, status=ImportJob.Status.VERIFYING, heartbeat_at=timezone.now())
+        verify_whatsapp_contacts(
+            phone_ids[done:],
+            on_progress=lambda verified: _update(
+                job, contacts_verified=done + verified, heartbeat_at=timezone.now()
+            ),
+        )
+    return len(phone_ids)
+
+
+def run(job):
+    """Esegue (o riprende) un job già in stato running e ne salva l'esito."""
+    if job.attempts > _max_attempts():
+        logger.error(f"❌ Import {job.id} interrupted {job.attempts - 1} times: giving up")
+        _finish(job, ImportJob.Status.FAILED, error='Import interrupted too many times')
+        job.refresh_from_db()
+        return job
+
+    logger.info(f"📥 Import {job.id} ({job.filename}) started from line {job.last_line + 1}")
+    suffix = '.xlsx' if job.filename.lower().endswith('.xlsx') else '.csv'
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(job.source)
+    try:
+        created_ids, stats = _import(job, tmp.name)
+        verified = _verify(job, created_ids) if job.verify_contacts else 0
+        _finish(job, ImportJob.Status.COMPLETED, contacts_verified=verified)
+        logger.info(f"📥 Import {job.id} completed: {stats['invitations']} invitations, "
+                    f"{stats['error_count']} errors")
+    except ImportFileError as e:
+        _finish(job, ImportJob.Status.FAILED, error=str(e))
+    except Exception as e:
+        logger.exception(f"❌ Import {job.id} failed")
+        _finish(job, ImportJob.Status.FAILED, error=str(e))
+    finally:
+        os.unlink(tmp.name)
+    job.refresh_from_db()
+    return job
+
+
+def run_pending():
+    """Esegue i job in coda uno alla volta. Ritorna quanti ne ha eseguiti."""
+    count = 0
+    while (job := claim_next()) is not None:
+        run(job)
+        count += 1
+    return count
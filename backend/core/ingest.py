@@ -0,0 +1,161 @@
+"""
+Ingestion write-behind degli eventi GuestInteraction (tracking frontend ospiti).
+
+PublicLogInteractionView valida l'evento e lo accoda in un buffer in memoria
+del worker, rispondendo subito 202. Un thread flusher scrive gli eventi con
+bulk_create a batch (ogni INTERACTION_BUFFER_FLUSH_INTERVAL secondi o appena
+si accumula un batch), applicando nello stesso giro la transizione
+SENT → READ alla prima visita. Così il tracking usa una connessione DB per
+batch invece di una per click e non compete con le scritture RSVP.
+
+- Backpressure: oltre INTERACTION_BUFFER_MAX_SIZE eventi in coda, append()
+  rifiuta l'evento (la view risponde 503 + Retry-After) e conta lo scarto.
+- Errori: se il bulk_create di un batch fallisce il batch viene riscritto
+  riga per riga, così si scarta solo l'evento difettoso.
+- Shutdown: il buffer viene svuotato da atexit (stop ordinato del worker).
+- In test (DJANGO_TEST_MODE) il thread non parte: si chiama flush() a mano.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def mark_as_read_if_first_visit(invitation):
+    """
+    Auto-trigger status transition sent -> read on first analytics interaction.
+    """
+    from .models import Invitation
+
+    if invitation.status == Invitation.Status.SENT:
+        logger.info(f"📬 Auto-marking invitation {invitation.code} as READ (first visit detected)")
+        invitation.status = Invitation.Status.READ
+        invitation.save(update_fields=['status', 'updated_at'])
+
+
+class InteractionBuffer:
+    """Coda limitata di eventi GuestInteraction (dict di campi) con flusher in background."""
+
+    def __init__(self, max_size=None, batch_size=None, flush_interval=None):
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, 'INTERACTION_BUFFER_MAX_SIZE', 5000)
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'INTERACTION_BUFFER_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval or getattr(settings, 'INTERACTION_BUFFER_FLUSH_INTERVAL', 2.0)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def append(self, event):
+        """Accoda un evento; False se il buffer è pieno (evento scartato)."""
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    logger.warning(f"⚠️ Interaction buffer full ({self.max_size}), dropped {self.dropped} events")
+                self._wakeup.set()
+                return False
+            self._queue.append(event)
+            queued = len(self._queue)
+        self._ensure_flusher()
+        if queued >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _drain(self, limit):
+        with self._lock:
+            return [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+
+    def flush(self):
+        """Scrive tutti gli eventi in coda; ritorna il numero di righe create."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    written += self._write(batch)
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to flush {len(batch)} interactions ({e}), retrying row by row")
+                    written += self._write_rows(batch)
+        return written
+
+    def _write_rows(self, batch):
+        """Riscrive un batch fallito evento per evento: si perde solo la riga difettosa."""
+        written = 0
+        for event in batch:
+            try:
+                written += self._write([event])
+            except Exception as e:
+                logger.error(f"❌ Dropped interaction for invitation {event.get('invitation_id')}: {e}")
+        return written
+
+    def _write(self, batch):
+        from .models import Invitation, GuestInteraction
+
+        invitation_ids = {event['invitation_id'] for event in batch}
+        statuses = dict(Invitation.objects.filter(id__in=invitation_ids).values_list('id', 'status'))
+        # Inviti eliminati nel frattempo: eventi orfani scartati
+        rows = [GuestInteraction(**event) for event in batch if event['invitation_id'] in statuses]
+
+        with transaction.atomic():
+            GuestInteraction.objects.bulk_create(rows, batch_size=self.batch_size)
+
+        sent_ids = [pk for pk, status in statuses.items() if status == Invitation.Status.SENT]
+        for invitation in Invitation.objects.filter(id__in=sent_ids, status=Invitation.Status.SENT):
+            mark_as_read_if_first_visit(invitation)
+        return len(rows)
+
+    def _ensure_flusher(self):
+        if os.environ.get('DJANGO_TEST_MODE', 'False') == 'True':
+            return
+        # Dopo il fork di gunicorn il thread del master non esiste nel worker
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='interaction-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+INTERACTIONS = InteractionBuffer()
+
+
+@atexit.register
+def _flush_on_shutdown():
+    if len(INTERACTIONS):
+        logger.info(f"Flushing {len(INTERACTIONS)} buffered interactions before exit")
+        INTERACTIONS.flush()
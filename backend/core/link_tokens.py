@@ -0,0 +1,112 @@
+"""
+Token di verifica dei link invito pubblici (/?code=...&token=...).
+
+- Il token è un HMAC-SHA256 di "<code>-<id>" troncato a TOKEN_LENGTH caratteri
+  hex, confrontato sempre con hmac.compare_digest.
+- Rotazione: oltre a GlobalConfig.invitation_link_secret restano validi i
+  segreti elencati in invitation_link_previous_secrets (uno per riga), così i
+  link già inviati continuano a funzionare dopo il cambio chiave.
+- I link generati prima dell'introduzione dell'HMAC (sha256(data + secret))
+  vengono ancora accettati.
+- CodeIndex: mappa in memoria di tutti i code → (id, status) che permette
+  all'endpoint di auth di scartare codici malformati, sconosciuti o non
+  attivi e token errati senza query DB (es. durante uno scraping dei link).
+"""
+import hashlib
+import hmac
+import re
+import threading
+
+from . import cache as app_cache
+
+TOKEN_LENGTH = 16
+CODE_MAX_LENGTH = 50  # SlugField di Invitation.code
+
+_CODE_RE = re.compile(r'^[-a-zA-Z0-9_]+\Z')
+_TOKEN_RE = re.compile(rf'^[0-9a-f]{{{TOKEN_LENGTH}}}\Z')
+
+
+def _message(code, invitation_id):
+    return f"{code}-{invitation_id}".encode('utf-8')
+
+
+def generate(code, invitation_id, secret):
+    """Token HMAC per il link pubblico dell'invito."""
+    digest = hmac.new(secret.encode('utf-8'), _message(code, invitation_id), hashlib.sha256)
+    return digest.hexdigest()[:TOKEN_LENGTH]
+
+
+def _legacy(code, invitation_id, secret):
+    # Formato originale (pre-HMAC) dei link già distribuiti
+    data = _message(code, invitation_id)
+    return hashlib.sha256(data + secret.encode('utf-8')).hexdigest()[:TOKEN_LENGTH]
+
+
+def active_secrets(config):
+    """Segreto corrente seguito dai segreti precedenti ancora accettati."""
+    previous = (config.invitation_link_previous_secrets or '').splitlines()
+    return [config.invitation_link_secret] + [s.strip() for s in previous if s.strip()]
+
+
+def is_valid_code(code):
+    """Controllo sintattico del codice invito (SlugField), prima di qualsiasi lookup."""
+    return isinstance(code, str) and len(code) <= CODE_MAX_LENGTH and bool(_CODE_RE.match(code))
+
+
+def is_valid_token(token):
+    """Controllo sintattico del token: TOKEN_LENGTH caratteri hex."""
+    return isinstance(token, str) and bool(_TOKEN_RE.match(token))
+
+
+def verify(code, invitation_id, token, secrets):
+    """True se il token corrisponde a uno dei segreti attivi (confronto a tempo costante)."""
+    if not isinstance(token, str):
+        return False
+    token = token.encode('utf-8')
+    matched = False
+    # Nessun early-exit: il tempo non rivela quale segreto/formato ha fatto match
+    for secret in secrets:
+        for candidate in (generate(code, invitation_id, secret), _legacy(code, invitation_id, secret)):
+            matched |= hmac.compare_digest(candidate.encode('utf-8'), token)
+    return matched
+
+
+class CodeIndex:
+    """
+    Mappa completa code → (id, status), locale al processo e caricata con una
+    sola query per versione del namespace INVITATION_CODES (invalidato dai
+    signal su Invitation), così tutti i worker vedono creazioni e cambi di
+    stato. La tabella inviti è piccola: ogni lookup, anche di codici
+    inesistenti, si risolve in memoria senza query né voci per codice.
+    """
+
+    def __init__(self):
+        self._codes = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        from .models import Invitation
+
+        version = app_cache.get_version(app_cache.INVITATION_CODES)
+        codes = self._codes
+        if codes is not None and version == self._version:
+            return codes
+        codes = {
+            code: (pk, status)
+            for code, pk, status in Invitation.objects.values_list('code', 'id', 'status')
+        }
+        with self._lock:
+            self._codes, self._version = codes, version
+        return codes
+
+    def lookup(self, code):
+        """(id, status) dell'invito, None se il codice non esiste."""
+        return self.current().get(code)
+
+    def clear(self):
+        with self._lock:
+            self._codes, self._version = None, None
+
+
+CODE_INDEX = CodeIndex()
@@ -0,0 +1,63 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import heatmap_codec
+
+
+class Command(BaseCommand):
+    help = (
+        'Confronta dimensione e velocità di decodifica delle tracce heatmap: '
+        'JSON (formato storico) vs blob binario di core.heatmap_codec.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=500, help='Punti per traccia')
+        parser.add_argument('--traces', type=int, default=200, help='Numero di tracce sintetiche')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        traces = self._synthetic_traces(options['traces'], options['points'], options['seed'])
+        total_points = sum(len(t) for t in traces)
+
+        json_payloads = [json.dumps(t).encode('utf-8') for t in traces]
+        blobs = [heatmap_codec.encode(t) for t in traces]
+
+        json_size = sum(len(p) for p in json_payloads)
+        blob_size = sum(len(b) for b in blobs)
+
+        json_seconds = self._time(lambda: [json.loads(p) for p in json_payloads])
+        blob_seconds = self._time(lambda: [heatmap_codec.decode(b) for b in blobs])
+
+        self.stdout.write(f"Traces: {len(traces)} ({total_points} points)")
+        self.stdout.write(f"JSON size:   {json_size} bytes ({json_size / total_points:.1f} B/point)")
+        self.stdout.write(f"Binary size: {blob_size} bytes ({blob_size / total_points:.1f} B/point, "
+                          f"{json_size / blob_size:.1f}x smaller)")
+        self.stdout.write(f"JSON decode:   {total_points / json_seconds:,.0f} points/s")
+        self.stdout.write(f"Binary decode: {total_points / blob_seconds:,.0f} points/s")
+
+    def _synthetic_traces(self, count, points, seed):
+        """Tracce realistiche: {x, y, t} campionati ~ogni 100ms come HeatmapTracker."""
+        rng = random.Random(seed)
+        traces = []
+        for _ in range(count):
+            x, y, t = rng.randint(0, 1920), rng.randint(0, 1080), 1_760_000_000_000 + rng.randint(0, 10 ** 9)
+            trace = []
+            for _ in range(points):
+                x = max(0, x + rng.randint(-40, 40))
+                y = max(0, y + rng.randint(-30, 60))
+                t += rng.randint(100, 180)
+                trace.append({'x': x, 'y': y, 't': t})
+            traces.append(trace)
+        return traces
+
+    def _time(self, fn, rounds=3):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return max(best, 1e-9)
@@ -7,6 +7,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         # 1. Ensure Global Config exists
+        # (load() non scrive: senza record ritorna solo i default non salvati)
         config, _ = GlobalConfig.objects.get_or_create(pk=1)
         
         # 2. Create or Get Test Invitation
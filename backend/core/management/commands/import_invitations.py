@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import ImportFileError, InvitationImport
+from core.models import Invitation
+from core.utils import verify_whatsapp_contacts
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa inviti e ospiti da un file CSV o XLSX (una riga per invito, vedi core.imports). '
+        'Scrive a chunk con bulk_create e verifica i contatti WhatsApp a batch alla fine.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File .csv o .xlsx')
+        parser.add_argument('--origin', choices=Invitation.Origin.values, default=Invitation.Origin.GROOM,
+                            help='Appartenenza per le righe senza colonna origin')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--no-verify', action='store_true',
+                            help='Non verificare i contatti WhatsApp degli inviti importati')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        job = InvitationImport(
+            path, origin=options['origin'], chunk_size=options['chunk_size'],
+            on_progress=lambda stats: self.stdout.write(
+                f"Rows: {stats['rows']}  invitations: {stats['invitations']}  errors: {stats['error_count']}"
+            ),
+        )
+        try:
+            stats = job.run()
+        except ImportFileError as e:
+            raise CommandError(str(e))
+
+        for error in stats['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+
+        if not options['no_verify']:
+            phone_ids = list(
+                Invitation.objects.filter(id__in=job.created_ids).exclude(phone_number=None).values_list('id', flat=True)
+            )
+            if phone_ids:
+                verify_whatsapp_contacts(
+                    phone_ids, on_progress=lambda done: self.stdout.write(f"Contacts verified: {done}/{len(phone_ids)}")
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['invitations']} invitations ({stats['guests']} guests), "
+            f"{stats['error_count']} rows with errors"
+        ))
@@ -0,0 +1,51 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina le righe django_session scadute e, con --guests, le sessioni ospite '
+        '(invitation_id) rese inutili da GUEST_AUTH_MODE=signed. Le sessioni admin restano.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guests', action='store_true',
+                            help='Elimina anche le sessioni ospite non ancora scadute')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Mostra quante righe verrebbero eliminate senza eliminarle')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        expired_count = expired.count()
+        if not dry_run:
+            expired.delete()
+        self.stdout.write(f"Expired sessions: {expired_count}")
+
+        guest_count = 0
+        if options['guests']:
+            batch = []
+            active = Session.objects.filter(expire_date__gte=now).only('session_key', 'session_data')
+            for session in active.iterator(chunk_size=batch_size):
+                data = session.get_decoded()
+                # Solo sessioni ospite: mai toccare i login di Django Admin
+                if 'invitation_id' in data and '_auth_user_id' not in data:
+                    batch.append(session.session_key)
+                if len(batch) >= batch_size:
+                    guest_count += self._delete(batch, dry_run)
+                    batch = []
+            guest_count += self._delete(batch, dry_run)
+            self.stdout.write(f"Guest sessions: {guest_count}")
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {expired_count + guest_count} sessions"))
+
+    def _delete(self, session_keys, dry_run):
+        if session_keys and not dry_run:
+            Session.objects.filter(session_key__in=session_keys).delete()
+        return len(session_keys)
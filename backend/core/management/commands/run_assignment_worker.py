@@ -0,0 +1,34 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import assignment, assignment_jobs
+
+
+class Command(BaseCommand):
+    help = 'Processes queued auto-assign jobs (simulations, executions, incremental runs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit')
+
+    def handle(self, *args, **options):
+        interrupted = assignment_jobs.fail_interrupted()
+        if interrupted:
+            self.stdout.write(self.style.WARNING(f'Marked {interrupted} interrupted jobs as failed'))
+        # Il pool di processi per le simulazioni vive solo qui, non nei worker web
+        assignment.enable_pool()
+        self.stdout.write(self.style.SUCCESS('Starting Assignment Worker...'))
+        try:
+            while True:
+                try:
+                    count = assignment_jobs.run_pending()
+                    if count:
+                        self.stdout.write(self.style.SUCCESS(f'Processed {count} assignment jobs'))
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Worker Error: {str(e)}'))
+                if options['once']:
+                    break
+                time.sleep(float(os.getenv('ASSIGNMENT_WORKER_INTERVAL', 2)))
+        finally:
+            assignment.shutdown()
@@ -0,0 +1,29 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import imports
+
+
+class Command(BaseCommand):
+    help = 'Processes queued invitation imports (CSV/XLSX uploads), resuming interrupted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit')
+
+    def handle(self, *args, **options):
+        interrupted = imports.requeue_interrupted()
+        if interrupted:
+            self.stdout.write(self.style.WARNING(f'Requeued {interrupted} interrupted imports'))
+        self.stdout.write(self.style.SUCCESS('Starting Import Worker...'))
+        while True:
+            try:
+                count = imports.run_pending()
+                if count:
+                    self.stdout.write(self.style.SUCCESS(f'Processed {count} imports'))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Worker Error: {str(e)}'))
+            if options['once']:
+                break
+            time.sleep(float(os.getenv('IMPORT_WORKER_INTERVAL', 2)))
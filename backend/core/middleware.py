@@ -1,19 +1,18 @@
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from . import cache as app_cache
 
 logger = logging.getLogger(__name__)
 
-class JsonExceptionMiddleware:
+class JsonExceptionMiddleware(MiddlewareMixin):
     """
     Middleware che cattura le eccezioni non gestite e restituisce
     una risposta JSON invece della pagina HTML di debug/errore standard.
     Utile per le API chiamate dal frontend.
+    MiddlewareMixin lo rende utilizzabile sia sotto WSGI che ASGI.
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        return self.get_response(request)
 
     def process_exception(self, request, exception):
         # Intercetta solo se la richiesta è per le API
@@ -34,3 +33,29 @@ class JsonExceptionMiddleware:
             }, status=500)
         
         return None  # Lascia che Django gestisca le eccezioni non-API normalmente
+
+
+class RequestMemoMiddleware:
+    """
+    Attiva il memo per-richiesta di core.cache: valori come GlobalConfig
+    vengono letti al massimo una volta per richiesta, anche se richiesti
+    da più punti (view, serializer, signal, metodi dei modelli).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with app_cache.request_memo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Il contextvar del memo si propaga anche ai thread di sync_to_async
+        with app_cache.request_memo():
+            return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_suppliertype_supplier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='globalconfig',
+            name='invitation_link_previous_secrets',
+            field=models.TextField(blank=True, default='', help_text='Chiavi precedenti ancora accettate per i link già inviati (una per riga)', verbose_name='Chiavi Segrete Precedenti'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_globalconfig_invitation_link_previous_secrets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='guestinteraction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
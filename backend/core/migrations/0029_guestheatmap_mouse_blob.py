@@ -0,0 +1,180 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:30
+
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+# ---------------------------------------------------------------------------
+# Copia congelata del formato blob versione 1 (core/heatmap_codec.py al
+# momento della migrazione): la migrazione deve scrivere e leggere sempre
+# questo formato, anche quando il modulo vivo cambierà versione o sparirà.
+# ---------------------------------------------------------------------------
+
+MAGIC = b'\xa7'
+VERSION = 1
+SHAPE_LIST = 0
+SHAPE_DICT = 1
+_HEADER = struct.Struct('<BBBIqqq')
+_INT16 = (-32768, 32767)
+_UINT32_MAX = 0xFFFFFFFF
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+_DICT_KEYS = {'x', 'y', 't'}
+
+
+def _columns(points):
+    first = points[0]
+    if isinstance(first, dict):
+        shape = SHAPE_DICT
+        if any(not isinstance(p, dict) or p.keys() != _DICT_KEYS for p in points):
+            return None
+        xs = [p['x'] for p in points]
+        ys = [p['y'] for p in points]
+        ts = [p['t'] for p in points]
+    elif isinstance(first, (list, tuple)):
+        shape = SHAPE_LIST
+        if any(not isinstance(p, (list, tuple)) or len(p) != 3 for p in points):
+            return None
+        xs, ys, ts = (list(col) for col in zip(*points))
+    else:
+        return None
+    if not all(type(v) is int for col in (xs, ys, ts) for v in col):
+        return None
+    return shape, xs, ys, ts
+
+
+def _deltas(values):
+    return [b - a for a, b in zip(values, values[1:])]
+
+
+def _to_bytes(arr):
+    if sys.byteorder != 'little':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(typecode, raw):
+    arr = array(typecode)
+    arr.frombytes(raw)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr
+
+
+def encode(points):
+    if not points or not isinstance(points, list):
+        return None
+    columns = _columns(points)
+    if columns is None:
+        return None
+    shape, xs, ys, ts = columns
+    if not all(_INT64[0] <= v[0] <= _INT64[1] for v in (xs, ys, ts)):
+        return None
+
+    dx, dy, dt = _deltas(xs), _deltas(ys), _deltas(ts)
+    if any(d < 0 or d > _UINT32_MAX for d in dt):
+        return None
+    coord_code = 'h' if all(_INT16[0] <= d <= _INT16[1] for d in dx + dy) else 'i'
+    if coord_code == 'i' and not all(-(1 << 31) <= d < (1 << 31) for d in dx + dy):
+        return None
+
+    header = _HEADER.pack(VERSION, shape, array(coord_code).itemsize, len(points), xs[0], ys[0], ts[0])
+    body = b''.join((
+        header,
+        _to_bytes(array(coord_code, dx)),
+        _to_bytes(array(coord_code, dy)),
+        _to_bytes(array('I', dt)),
+    ))
+    return MAGIC + zlib.compress(body, 6)
+
+
+def decode(blob):
+    blob = bytes(blob)
+    if blob[:1] != MAGIC:
+        raise ValueError("Not a heatmap blob")
+    body = zlib.decompress(blob[1:])
+    version, shape, coord_width, count, x0, y0, t0 = _HEADER.unpack_from(body)
+    if version != VERSION:
+        raise ValueError(f"Unsupported heatmap blob version {version}")
+
+    coord_code = 'h' if coord_width == 2 else 'i'
+    n = count - 1
+    offset = _HEADER.size
+    dx = _from_bytes(coord_code, body[offset:offset + n * coord_width])
+    offset += n * coord_width
+    dy = _from_bytes(coord_code, body[offset:offset + n * coord_width])
+    offset += n * coord_width
+    dt = _from_bytes('I', body[offset:offset + n * 4])
+
+    xs, ys, ts = accumulate(dx, initial=x0), accumulate(dy, initial=y0), accumulate(dt, initial=t0)
+    if shape == SHAPE_DICT:
+        return [{'x': x, 'y': y, 't': t} for x, y, t in zip(xs, ys, ts)]
+    return [[x, y, t] for x, y, t in zip(xs, ys, ts)]
+
+
+# ---------------------------------------------------------------------------
+
+
+def pack_mouse_data(apps, schema_editor):
+    """Converte le tracce JSON esistenti nel formato binario compatto."""
+    GuestHeatmap = apps.get_model('core', 'GuestHeatmap')
+    batch = []
+    for heatmap in GuestHeatmap.objects.filter(mouse_blob__isnull=True).only('id', 'raw_mouse_data').iterator(chunk_size=BATCH_SIZE):
+        blob = encode(heatmap.raw_mouse_data)
+        if blob is None:
+            continue  # Punti non comprimibili senza perdita: restano JSON
+        heatmap.mouse_blob = blob
+        heatmap.raw_mouse_data = []
+        batch.append(heatmap)
+        if len(batch) >= BATCH_SIZE:
+            GuestHeatmap.objects.bulk_update(batch, ['mouse_blob', 'raw_mouse_data'])
+            batch = []
+    if batch:
+        GuestHeatmap.objects.bulk_update(batch, ['mouse_blob', 'raw_mouse_data'])
+
+
+def unpack_mouse_data(apps, schema_editor):
+    GuestHeatmap = apps.get_model('core', 'GuestHeatmap')
+    batch = []
+    for heatmap in GuestHeatmap.objects.filter(mouse_blob__isnull=False).only('id', 'mouse_blob').iterator(chunk_size=BATCH_SIZE):
+        heatmap.raw_mouse_data = decode(heatmap.mouse_blob)
+        heatmap.mouse_blob = None
+        batch.append(heatmap)
+        if len(batch) >= BATCH_SIZE:
+            GuestHeatmap.objects.bulk_update(batch, ['mouse_blob', 'raw_mouse_data'])
+            batch = []
+    if batch:
+        GuestHeatmap.objects.bulk_update(batch, ['mouse_blob', 'raw_mouse_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_guestinteraction_event_timestamp'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='guestheatmap',
+            old_name='mouse_data',
+            new_name='raw_mouse_data',
+        ),
+        migrations.AlterField(
+            model_name='guestheatmap',
+            name='raw_mouse_data',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='guestheatmap',
+            name='mouse_blob',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(pack_mouse_data, unpack_mouse_data),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_guestheatmap_mouse_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guestheatmap',
+            index=models.Index(fields=['invitation', 'session_id', 'timestamp'], name='heatmap_session_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:40
+
+from django.db import migrations
+
+# Indici GIN trigram per core.search (solo PostgreSQL: su SQLite la ricerca
+# usa l'indice n-gram in memoria). Le espressioni coincidono con quelle
+# generate da search._postgres_candidates (LOWER(...) %> token).
+TRIGRAM_INDEXES = [
+    ('core_invitation_name_trgm', 'core_invitation', 'LOWER("name") gin_trgm_ops'),
+    ('core_invitation_code_trgm', 'core_invitation', 'LOWER("code") gin_trgm_ops'),
+    ('core_invitation_phone_trgm', 'core_invitation', '"phone_number" gin_trgm_ops'),
+    ('core_person_first_name_trgm', 'core_person', 'LOWER("first_name") gin_trgm_ops'),
+    ('core_person_last_name_trgm', 'core_person', 'LOWER("last_name") gin_trgm_ops'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ({expression})')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_guestheatmap_session_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-17 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('simulation', 'Simulazione'), ('execution', 'Esecuzione'), ('incremental', 'Incrementale')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'In Attesa'), ('running', 'In Esecuzione'), ('completed', 'Completato'), ('failed', 'Fallito'), ('cancelled', 'Annullato')], default='pending', max_length=20)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='strategy, reset_previous, max_repair_moves, dry_run')),
+                ('progress_total', models.PositiveIntegerField(default=0)),
+                ('progress_done', models.PositiveIntegerField(default=0)),
+                ('results', models.JSONField(blank=True, default=list)),
+                ('best_strategy', models.CharField(blank=True, max_length=30, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Job Assegnazione Alloggi',
+                'verbose_name_plural': 'Job Assegnazione Alloggi',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_assignmentjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RSVPIdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(blank=True, default='', max_length=64)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('response', models.JSONField(default=dict)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('invitation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rsvp_idempotency_records', to='core.invitation')),
+            ],
+            options={
+                'verbose_name': 'Esito RSVP (idempotenza)',
+                'verbose_name_plural': 'Esiti RSVP (idempotenza)',
+                'constraints': [models.UniqueConstraint(fields=('invitation', 'key'), name='unique_rsvp_idempotency_key')],
+            },
+        ),
+    ]
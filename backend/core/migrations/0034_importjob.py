@@ -0,0 +1,40 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:11
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_rsvpidempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'In Coda'), ('running', 'In Esecuzione'), ('verifying', 'Verifica Contatti'), ('completed', 'Completato'), ('failed', 'Fallito')], default='queued', max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('origin', models.CharField(choices=[('groom', 'Lato Sposo'), ('bride', 'Lato Sposa')], default='groom', max_length=10)),
+                ('verify_contacts', models.BooleanField(default=True)),
+                ('source', models.BinaryField(blank=True, null=True)),
+                ('last_line', models.PositiveIntegerField(default=0, help_text='Ultima riga del file già elaborata')),
+                ('stats', models.JSONField(blank=True, default=dict, help_text='rows, invitations, guests, error_count, errors')),
+                ('created_ids', models.JSONField(blank=True, default=list)),
+                ('contacts_verified', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Job Import Inviti',
+                'verbose_name_plural': 'Job Import Inviti',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.exceptions import ValidationError
-import hashlib
+from django.utils import timezone
+from . import cache as app_cache
+from . import link_tokens
+from . import heatmap_codec
+from . import heatmap_grid
+import copy
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 class GlobalConfig(models.Model):
     """Singleton model for global configurations (prices, texts)"""
@@ -25,6 +34,12 @@ class GlobalConfig(models.Model):
         help_text="Chiave segreta per generare token di verifica link inviti",
         verbose_name="Chiave Segreta Link"
     )
+    invitation_link_previous_secrets = models.TextField(
+        blank=True,
+        default="",
+        help_text="Chiavi precedenti ancora accettate per i link già inviati (una per riga)",
+        verbose_name="Chiavi Segrete Precedenti"
+    )
     
     unauthorized_message = models.TextField(
         default="Spiacenti, questo invito non è valido o è scaduto. Contatta gli sposi per maggiori informazioni.",
@@ -55,6 +70,22 @@ class GlobalConfig(models.Model):
             raise ValidationError('There can be only one GlobalConfig instance')
         return super(GlobalConfig, self).save(*args, **kwargs)
 
+    @classmethod
+    def load(cls):
+        """
+        Accessor cachato del singleton (vedi core.cache): il record viene letto
+        dal DB al massimo una volta per modifica, invalidato dai signal di save.
+        Se il record non esiste ritorna un'istanza non salvata con i default
+        (il primo save() la crea). Ritorna sempre una copia, così le modifiche
+        del chiamante non sporcano la cache.
+        """
+        config = app_cache.get_or_compute(app_cache.GLOBAL_CONFIG, 'instance', cls._fetch)
+        return copy.copy(config)
+
+    @classmethod
+    def _fetch(cls):
+        return cls.objects.order_by('pk').first() or cls()
+
     def __str__(self):
         return "Configurazione Globale"
 
@@ -126,6 +157,61 @@ class InvitationLabel(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def _membership(invitation_ids, label_ids):
+        return Invitation.labels.through.objects.filter(
+            invitation_id__in=invitation_ids, invitationlabel_id__in=label_ids
+        )
+
+    # Tentativi di bulk_assign quando una richiesta concorrente inserisce una delle coppie
+    BULK_ASSIGN_ATTEMPTS = 3
+
+    @classmethod
+    def bulk_assign(cls, invitation_ids, label_ids):
+        """
+        Aggiunge le etichette agli inviti scrivendo direttamente la tabella
+        through: una SELECT delle coppie esistenti e un bulk_create delle
+        mancanti. Ritorna {label_id: nuove associazioni}.
+        L'insert è tutto o niente (savepoint): se una richiesta concorrente ha
+        inserito una coppia nel frattempo si rilegge e si riprova, così il
+        conteggio è quello delle righe davvero inserite.
+        Come update(), non emette m2m_changed.
+        """
+        through = Invitation.labels.through
+        for attempt in range(cls.BULK_ASSIGN_ATTEMPTS):
+            existing = set(cls._membership(invitation_ids, label_ids).values_list('invitation_id', 'invitationlabel_id'))
+            missing = [
+                through(invitation_id=invitation_id, invitationlabel_id=label_id)
+                for label_id in label_ids
+                for invitation_id in invitation_ids
+                if (invitation_id, label_id) not in existing
+            ]
+            try:
+                with transaction.atomic():
+                    through.objects.bulk_create(missing)
+                break
+            except IntegrityError:
+                if attempt == cls.BULK_ASSIGN_ATTEMPTS - 1:
+                    raise
+        affected = dict.fromkeys(label_ids, 0)
+        for row in missing:
+            affected[row.invitationlabel_id] += 1
+        return affected
+
+    @classmethod
+    def bulk_unassign(cls, invitation_ids, label_ids):
+        """
+        Rimuove le etichette con una DELETE per etichetta: il conteggio di
+        ciascuna è quello delle righe davvero cancellate.
+        Ritorna {label_id: associazioni rimosse}.
+        """
+        membership = cls._membership(invitation_ids, label_ids)
+        affected = dict.fromkeys(label_ids, 0)
+        with transaction.atomic():
+            for label_id in label_ids:
+                affected[label_id], _ = membership.filter(invitationlabel_id=label_id).delete()
+        return affected
+
     class Meta:
         verbose_name = "Etichetta Invito"
         verbose_name_plural = "Etichette Invito"
@@ -203,9 +289,9 @@ class Room(models.Model):
         }
     
     def adults_price(self):
-        config = GlobalConfig.objects.first()
-        price_acc_adult = float(config.price_accommodation_adult) if config else 0.0
-        price_acc_child = float(config.price_accommodation_child) if config else 0.0
+        config = GlobalConfig.load()
+        price_acc_adult = float(config.price_accommodation_adult)
+        price_acc_child = float(config.price_accommodation_child)
         child_usage = self.assigned_guests.filter(is_child=True, not_coming=False).count()
         adult_usage = self.assigned_guests.filter(is_child=False, not_coming=False).count()
         if price_acc_adult + price_acc_child == 0.0 or child_usage + adult_usage == 0:
@@ -216,9 +302,9 @@ class Room(models.Model):
         return adult_ratio * self.price / occupancy_ratio
     
     def children_price(self):
-        config = GlobalConfig.objects.first()
-        price_acc_adult = float(config.price_accommodation_adult) if config else 0.0
-        price_acc_child = float(config.price_accommodation_child) if config else 0.0
+        config = GlobalConfig.load()
+        price_acc_adult = float(config.price_accommodation_adult)
+        price_acc_child = float(config.price_accommodation_child)
         child_usage = self.assigned_guests.filter(is_child=True, not_coming=False).count()
         adult_usage = self.assigned_guests.filter(is_child=False, not_coming=False).count()
         if price_acc_adult + price_acc_child == 0.0 or child_usage + adult_usage == 0:
@@ -235,6 +321,48 @@ class Room(models.Model):
         unique_together = ['accommodation', 'room_number']
 
 
+class AssignmentJob(models.Model):
+    """
+    Esecuzione di auto-assign in background (vedi core/assignment_jobs.py).
+    I risultati restano salvati per confrontare le simulazioni nel tempo.
+    """
+    class Kind(models.TextChoices):
+        SIMULATION = 'simulation', 'Simulazione'
+        EXECUTION = 'execution', 'Esecuzione'
+        INCREMENTAL = 'incremental', 'Incrementale'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'In Attesa'
+        RUNNING = 'running', 'In Esecuzione'
+        COMPLETED = 'completed', 'Completato'
+        FAILED = 'failed', 'Fallito'
+        CANCELLED = 'cancelled', 'Annullato'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    params = models.JSONField(default=dict, blank=True, help_text="strategy, reset_previous, max_repair_moves, dry_run")
+
+    progress_total = models.PositiveIntegerField(default=0)
+    progress_done = models.PositiveIntegerField(default=0)
+    # Un risultato per strategia, aggiunto appena la strategia termina
+    results = models.JSONField(default=list, blank=True)
+    best_strategy = models.CharField(max_length=30, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    cancel_requested = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Job Assegnazione Alloggi"
+        verbose_name_plural = "Job Assegnazione Alloggi"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+
 class SupplierType(models.Model):
     """Tipo di fornitore (es. Catering, Fotografia, Fiori)"""
     name = models.CharField(max_length=120, unique=True, verbose_name="Nome Tipo Fornitore")
@@ -400,15 +528,41 @@ class Invitation(models.Model):
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+    DIETARY_LABEL_NAME = "Intolleranze"
+
+    def sync_dietary_label(self, has_dietary=None):
+        """
+        Allinea l'etichetta 'Intolleranze' alle intolleranze degli ospiti.
+        has_dietary può essere passato da chi ha già gli ospiti in memoria
+        (es. RSVP), evitando la query di verifica.
+        """
+        if has_dietary is None:
+            has_dietary = self.guests.filter(
+                dietary_requirements__isnull=False
+            ).exclude(dietary_requirements='').exists()
+
+        if has_dietary:
+            label, _ = InvitationLabel.objects.get_or_create(
+                name=self.DIETARY_LABEL_NAME,
+                defaults={'color': '#FF6B6B'}  # Rosso per visibilità
+            )
+            if not self.labels.filter(pk=label.pk).exists():
+                self.labels.add(label)
+                logger.info(f"🍽️ Auto-assigned 'Intolleranze' label to {self.name}")
+        else:
+            label = InvitationLabel.objects.filter(name=self.DIETARY_LABEL_NAME).first()
+            if label and self.labels.filter(pk=label.pk).exists():
+                self.labels.remove(label)
+                logger.info(f"❌ Removed 'Intolleranze' label from {self.name}")
+
     def generate_verification_token(self, secret_key):
         """Genera token HMAC per validazione link pubblico"""
-        data = f"{self.code}-{self.id}".encode('utf-8')
-        return hashlib.sha256(data + secret_key.encode('utf-8')).hexdigest()[:16]
+        return link_tokens.generate(self.code, self.id, secret_key)
 
     def verify_token(self, token, secret_key):
-        """Verifica token di accesso"""
-        expected = self.generate_verification_token(secret_key)
-        return token == expected
+        """Verifica token di accesso (accetta anche una lista di segreti attivi)"""
+        secrets = [secret_key] if isinstance(secret_key, str) else secret_key
+        return link_tokens.verify(self.code, self.id, token, secrets)
 
 
 class Person(models.Model):
@@ -451,6 +605,74 @@ class Person(models.Model):
         verbose_name = "Persona"
         verbose_name_plural = "Persone"
 
+class ImportJob(models.Model):
+    """
+    Import massivo CSV/XLSX in background (vedi core/imports.py), eseguito dal
+    worker run_import_worker. Il file resta nel DB finché il job non termina:
+    il worker gira in un altro container e, se viene interrotto, riprende
+    dall'ultimo chunk scritto (last_line) con le statistiche salvate insieme.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'In Coda'
+        RUNNING = 'running', 'In Esecuzione'
+        VERIFYING = 'verifying', 'Verifica Contatti'
+        COMPLETED = 'completed', 'Completato'
+        FAILED = 'failed', 'Fallito'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    filename = models.CharField(max_length=255)
+    origin = models.CharField(max_length=10, choices=Invitation.Origin.choices, default=Invitation.Origin.GROOM)
+    verify_contacts = models.BooleanField(default=True)
+    # Contenuto del file caricato, svuotato quando il job termina
+    source = models.BinaryField(null=True, blank=True, editable=False)
+
+    # Checkpoint scritto nella stessa transazione di ogni chunk
+    last_line = models.PositiveIntegerField(default=0, help_text="Ultima riga del file già elaborata")
+    stats = models.JSONField(default=dict, blank=True, help_text="rows, invitations, guests, error_count, errors")
+    created_ids = models.JSONField(default=list, blank=True)
+    contacts_verified = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Job Import Inviti"
+        verbose_name_plural = "Job Import Inviti"
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+class RSVPIdempotencyRecord(models.Model):
+    """
+    Esito di una submission RSVP applicata (vedi core/idempotency.py). Scritto
+    nella stessa transazione che tiene il lock dell'invito: una richiesta
+    gemella in attesa sul lock lo trova già al risveglio.
+    key: hash dell'Idempotency-Key, oppure '' per l'ultimo RSVP applicato.
+    """
+    invitation = models.ForeignKey(Invitation, on_delete=models.CASCADE, related_name='rsvp_idempotency_records')
+    key = models.CharField(max_length=64, blank=True, default='')
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['invitation', 'key'], name='unique_rsvp_idempotency_key'),
+        ]
+        verbose_name = "Esito RSVP (idempotenza)"
+        verbose_name_plural = "Esiti RSVP (idempotenza)"
+
+    def __str__(self):
+        return f"{self.invitation_id} - {self.key or 'last'}"
+
 # ---------------------------------------------
 # ANALYTICS MODELS
 # ---------------------------------------------
@@ -471,7 +693,8 @@ class GuestInteraction(models.Model):
         help_text="ID univoco sessione frontend"
     )
     event_type = models.CharField(max_length=50, choices=EventType.choices)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Orario dell'evento (non della scrittura): gli eventi arrivano a batch da core.ingest
+    timestamp = models.DateTimeField(default=timezone.now)
     
     # Dettagli Tecnici
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -499,9 +722,11 @@ class GuestHeatmap(models.Model):
     session_id = models.CharField(max_length=100, help_text="ID univoco sessione frontend")
     timestamp = models.DateTimeField(auto_now_add=True)
     
-    # Dati compressi: lista di [x, y, time_offset]
-    # Usiamo JSONField per flessibilità. In produzione ad alto traffico meglio TimeSeries DB.
-    mouse_data = models.JSONField(default=list)
+    # Traccia mouse compressa (core.heatmap_codec: delta-encoding + zlib).
+    # raw_mouse_data conserva solo i punti non comprimibili senza perdita (es. coordinate float).
+    # Leggere/scrivere sempre tramite la property mouse_data.
+    mouse_blob = models.BinaryField(null=True, blank=True, editable=False)
+    raw_mouse_data = models.JSONField(default=list, blank=True)
     
     screen_width = models.IntegerField(default=0)
     screen_height = models.IntegerField(default=0)
@@ -509,9 +734,69 @@ class GuestHeatmap(models.Model):
     def __str__(self):
         return f"Heatmap {self.invitation.code} - {self.timestamp}"
 
+    @property
+    def mouse_data(self):
+        """Punti nel formato JSON originale, decodificati al primo accesso."""
+        points = self.__dict__.get('_mouse_data_cache')
+        if points is None:
+            points = heatmap_codec.decode(self.mouse_blob) if self.mouse_blob else self.raw_mouse_data
+            self.__dict__['_mouse_data_cache'] = points
+        return points
+
+    @mouse_data.setter
+    def mouse_data(self, points):
+        blob = heatmap_codec.encode(points)
+        self.mouse_blob = blob
+        self.raw_mouse_data = [] if blob is not None else points
+        self.__dict__['_mouse_data_cache'] = points
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_mouse_data_cache', None)
+        return super().refresh_from_db(*args, **kwargs)
+
+    # Oltre questa soglia (o se cambia il viewport) si apre un nuovo segmento:
+    # limita il costo decode/encode di ogni append
+    SEGMENT_MAX_POINTS = 5000
+
+    @classmethod
+    def append_chunk(cls, invitation_id, session_id, points, screen_width, screen_height):
+        """
+        Accoda un chunk di punti all'ultimo segmento della sessione (una riga
+        per (invitation, session_id) finché resta sotto SEGMENT_MAX_POINTS).
+        Il lock sulla riga serializza chunk concorrenti della stessa sessione.
+        I punti malformati vengono scartati.
+        """
+        points = heatmap_grid.valid_points(points)
+        with transaction.atomic():
+            segment = (
+                cls.objects.select_for_update()
+                .filter(invitation_id=invitation_id, session_id=session_id)
+                .order_by('-timestamp', '-id')
+                .first()
+            )
+            if (
+                segment is not None
+                and segment.screen_width == screen_width
+                and segment.screen_height == screen_height
+                and len(segment.mouse_data) + len(points) <= cls.SEGMENT_MAX_POINTS
+            ):
+                segment.mouse_data = segment.mouse_data + list(points)
+                segment.save(update_fields=['mouse_blob', 'raw_mouse_data'])
+                return segment
+            return cls.objects.create(
+                invitation_id=invitation_id,
+                session_id=session_id,
+                mouse_data=list(points),
+                screen_width=screen_width,
+                screen_height=screen_height
+            )
+
     class Meta:
         verbose_name = "Heatmap Ospite"
         verbose_name_plural = "Heatmaps Ospiti"
+        indexes = [
+            models.Index(fields=['invitation', 'session_id', 'timestamp'], name='heatmap_session_idx'),
+        ]
 
 
 # ---------------------------------------------
@@ -547,6 +832,23 @@ class WhatsAppSessionStatus(models.Model):
         verbose_name = "Status Sessione WhatsApp"
         verbose_name_plural = "Status Sessioni WhatsApp"
 
+    @classmethod
+    def public_profile(cls, session_type):
+        """
+        Snapshot cachato del profilo mostrato agli ospiti (numero, nome, foto).
+        Invalidato dai signal ad ogni salvataggio dello status.
+        """
+        def _fetch():
+            session = cls.objects.filter(session_type=session_type).only('phone_number', 'name', 'picture').first()
+            if not session:
+                return {'whatsapp_number': '', 'whatsapp_name': '', 'whatsapp_picture': ''}
+            return {
+                'whatsapp_number': f"+{session.phone_number}",
+                'whatsapp_name': session.name,
+                'whatsapp_picture': session.picture
+            }
+        return dict(app_cache.get_or_compute(app_cache.WHATSAPP_PROFILES, session_type, _fetch))
+
 class WhatsAppMessageQueue(models.Model):
     """Coda di invio asincrona per evitare blocchi e gestire rate limits"""
     class Status(models.TextChoices):
@@ -0,0 +1,34 @@
+"""
+Paginazione keyset per le liste admin.
+
+La paginazione è opt-in: senza ?cursor / ?page_size la risposta resta la
+lista completa (i consumer esistenti si aspettano un array), con uno dei
+due parametri la risposta diventa {next, previous, results}.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class InvitationCursorPagination(CursorPagination):
+    """
+    Cursore su (-created_at, id): la posizione non slitta quando vengono
+    creati o eliminati inviti tra una pagina e l'altra.
+    Con ?ordering=... (OrderingFilter) il cursore segue l'ordinamento richiesto,
+    sempre completato da `id`: su campi con valori ripetuti (status, name)
+    l'ordine resta totale e nessun invito viene saltato o ripetuto.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,170 @@
+"""
+Payload JSON statici (lingue disponibili, database font) pre-caricati in memoria.
+
+I file vengono letti e serializzati una sola volta (CoreConfig.ready) in un
+payload bytes immutabile con ETag forte, servito direttamente dalle view.
+Ad ogni richiesta un os.stat() confronta l'mtime: se il file è stato
+rigenerato (es. i18n/scripts/generate_languages_config.sh) viene ricaricato.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+# Il contenuto cambia solo a deploy/rigenerazione: l'ETag copre la revalidazione
+CACHE_CONTROL = 'public, max-age=86400'
+
+_MISSING = object()
+
+# Snapshot immutabile: sostituito in blocco, mai modificato (data: i dati serializzati in body)
+Payload = namedtuple('Payload', ['body', 'etag', 'status_code', 'data'])
+
+
+class PreloadedJSONFile:
+    """
+    File JSON caricato in memoria come bytes pronti da servire.
+
+    - missing_data / error_data: payload alternativo se il file manca o non è
+      leggibile; se None viene servito un errore con missing_status / error_status.
+    - transform: funzione applicata ai dati parsati prima della serializzazione.
+    """
+
+    def __init__(self, relative_path, transform=None,
+                 missing_data=None, missing_status=503, missing_error='File not available',
+                 error_data=None, error_status=500, error_message='Failed to load file'):
+        self.relative_path = relative_path
+        self.transform = transform
+        self.missing_data = missing_data
+        self.missing_status = missing_status
+        self.missing_error = missing_error
+        self.error_data = error_data
+        self.error_status = error_status
+        self.error_message = error_message
+
+        self.payload = None
+        self._mtime = _MISSING
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(settings.BASE_DIR, self.relative_path)
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """(Ri)carica il file e ricostruisce payload ed ETag."""
+        with self._lock:
+            self._load(self._current_mtime())
+
+    def _load(self, mtime):
+        if mtime is None:
+            logger.error(f"Preloaded file not found at {self.path}")
+            self._set(self.missing_data, self.missing_status, self.missing_error)
+        else:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if self.transform:
+                    data = self.transform(data)
+                self._set(data, 200, None)
+            except (ValueError, OSError) as e:
+                logger.error(f"Error reading preloaded file {self.path}: {e}")
+                self._set(self.error_data, self.error_status, self.error_message)
+        # Anche in caso di errore memorizziamo l'mtime: si riprova solo se il file cambia
+        self._mtime = mtime
+
+    def _set(self, data, status_code, error):
+        if data is None:
+            data = {'error': error}
+        else:
+            status_code = 200
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+        self.payload = Payload(body, etag, status_code, data)
+
+    def get(self):
+        """Ritorna il Payload corrente (ricarica solo se l'mtime è cambiato)."""
+        mtime = self._current_mtime()
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+        return self.payload
+
+    def as_response(self, request):
+        """HttpResponse con il payload pre-serializzato (304 se l'ETag coincide)."""
+        payload = self.get()
+        if payload.status_code != 200:
+            return HttpResponse(payload.body, status=payload.status_code, content_type='application/json')
+
+        response = get_conditional_response(request, etag=payload.etag)
+        if response is None:
+            response = HttpResponse(payload.body, content_type='application/json; charset=utf-8')
+        response['ETag'] = payload.etag
+        response['Cache-Control'] = CACHE_CONTROL
+        return response
+
+
+def _fonts_to_google_format(fonts_data):
+    """Trasforma la struttura locale nel formato Google API atteso dal frontend"""
+    return {
+        'items': [
+            {
+                'family': font.get('name'),
+                'category': font.get('category', 'sans-serif'),
+                'variants': font.get('variants', []),
+                'subsets': font.get('subsets', [])
+            }
+            for font in fonts_data
+        ]
+    }
+
+
+LANGUAGES = PreloadedJSONFile(
+    'core/fixtures/languages.json',
+    # Fallback se il file non è stato generato
+    missing_data=[
+        {"code": "it", "label": "Italiano", "flag": "🇮🇹"},
+        {"code": "en", "label": "English", "flag": "🇬🇧"}
+    ],
+    error_data=[{"code": "it", "label": "Italiano", "flag": "🇮🇹"}],
+)
+
+
+
+def language_codes():
+    """
+    Codici delle lingue disponibili (core/fixtures/languages.json, rigenerato
+    dagli script i18n): unica lista per la validazione di ?lang=.
+    """
+    data = LANGUAGES.get().data
+    return frozenset(item['code'] for item in data if isinstance(item, dict) and 'code' in item)
+
+
+GOOGLE_FONTS = PreloadedJSONFile(
+    os.path.join('assets', 'fontInfo.json'),
+    transform=_fonts_to_google_format,
+    missing_status=503,
+    missing_error='Font database not available',
+    error_status=500,
+    error_message='Failed to load font database',
+)
+
+
+def load_all():
+    """Chiamato da CoreConfig.ready(): parsing una tantum all'avvio del worker."""
+    for loader in (LANGUAGES, GOOGLE_FONTS):
+        loader.load()
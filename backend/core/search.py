@@ -0,0 +1,238 @@
+"""
+Ricerca ranked e tollerante ai refusi su inviti e ospiti (type-ahead admin).
+
+Campi coperti: nome, codice e telefono dell'invito, nome e cognome degli ospiti.
+
+Due backend per trovare i candidati, un solo ranking:
+- PostgreSQL: operatore pg_trgm `%>` (word similarity) sugli indici GIN
+  trigram creati dalla migrazione 0031; un OR per token e campo.
+- Altri DB (SQLite in sviluppo/test): NgramIndex in memoria, un indice
+  invertito trigramma → parole → inviti, ricostruito quando cambia la versione del
+  namespace SEARCH_INDEX (invalidato dai signal su Invitation/Person).
+
+Il ranking (NgramIndex.rank) confronta ogni token della query con le parole
+del documento: prefisso > sottostringa > similarità trigrammi (Jaccard,
+come pg_trgm similarity()). Il punteggio è la media sui token del miglior
+match per token; le parole degli ospiti pesano GUEST_WEIGHT rispetto a
+quelle dell'invito.
+"""
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.functions import Lower
+
+from . import cache as app_cache
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MIN_SCORE = 0.3
+GUEST_WEIGHT = 0.95
+# Candidati massimi per campo letti dagli indici Postgres prima del ranking
+CANDIDATE_LIMIT = 500
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Minuscolo, senza accenti: 'Niccolò' -> 'niccolo'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return _WORD_RE.findall(normalize(text))
+
+
+def trigrams(word):
+    """Trigrammi con padding come pg_trgm: 'ab' -> {'  a', ' ab', 'ab '}."""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _word_score(token, token_trigrams, word, word_trigrams):
+    if word.startswith(token):
+        return 1.0
+    if token in word:
+        return 0.9
+    union = len(token_trigrams | word_trigrams)
+    return len(token_trigrams & word_trigrams) / union if union else 0.0
+
+
+class Document:
+    """Testo indicizzato di un invito: parole proprie e parole per ospite."""
+    __slots__ = ('invitation_id', 'words', 'guests')
+
+    def __init__(self, invitation_id, fields):
+        self.invitation_id = invitation_id
+        self.words = {word for field in fields for word in tokenize(field)}
+        self.guests = []
+
+    def add_guest(self, first_name, last_name):
+        full_name = f"{first_name} {last_name or ''}".strip()
+        self.guests.append((full_name, set(tokenize(full_name))))
+
+
+class NgramIndex:
+    """
+    Indice invertito trigramma → parole → (invito, ospite).
+    Ogni parola distinta viene confrontata con la query una volta sola,
+    qualunque sia il numero di inviti/ospiti che la contengono.
+    """
+
+    def __init__(self, documents=()):
+        self.documents = {doc.invitation_id: doc for doc in documents}
+        postings = defaultdict(list)
+        for doc in self.documents.values():
+            for word in doc.words:
+                postings[word].append((doc.invitation_id, None))
+            for guest_index, (_, guest_words) in enumerate(doc.guests):
+                for word in guest_words:
+                    postings[word].append((doc.invitation_id, guest_index))
+        self.postings = dict(postings)
+        self.word_trigrams = {word: trigrams(word) for word in self.postings}
+        trigram_words = defaultdict(set)
+        for word, word_trigrams in self.word_trigrams.items():
+            for trigram in word_trigrams:
+                trigram_words[trigram].add(word)
+        self.trigram_words = dict(trigram_words)
+
+    def rank(self, query, limit=DEFAULT_LIMIT, min_score=MIN_SCORE):
+        """[(score, invitation_id, ospiti che corrispondono)] ordinati per punteggio."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        totals = defaultdict(float)
+        guest_hits = defaultdict(set)
+        for token in tokens:
+            token_trigrams = trigrams(token)
+            words = set()
+            for trigram in token_trigrams:
+                words |= self.trigram_words.get(trigram, set())
+            best = {}
+            for word in words:
+                word_score = _word_score(token, token_trigrams, word, self.word_trigrams[word])
+                if word_score < min_score:
+                    continue
+                for invitation_id, guest_index in self.postings[word]:
+                    score = word_score
+                    if guest_index is not None:
+                        score *= GUEST_WEIGHT
+                        guest_hits[invitation_id].add(guest_index)
+                    if score > best.get(invitation_id, 0.0):
+                        best[invitation_id] = score
+            for invitation_id, score in best.items():
+                totals[invitation_id] += score
+
+        ranked = sorted(
+            ((round(total / len(tokens), 4), invitation_id) for invitation_id, total in totals.items()),
+            key=lambda item: (-item[0], item[1]),
+        )
+        return [
+            (score, invitation_id, [self.documents[invitation_id].guests[i][0] for i in sorted(guest_hits[invitation_id])])
+            for score, invitation_id in ranked[:limit]
+            if score >= min_score
+        ]
+
+
+def rank_documents(query, documents, limit=DEFAULT_LIMIT, min_score=MIN_SCORE):
+    return NgramIndex(documents).rank(query, limit=limit, min_score=min_score)
+
+
+def _load_documents(invitation_ids=None):
+    """Documenti dal DB: una query per gli inviti, una per gli ospiti."""
+    from .models import Invitation, Person
+
+    invitations = Invitation.objects.all()
+    persons = Person.objects.all()
+    if invitation_ids is not None:
+        invitations = invitations.filter(id__in=invitation_ids)
+        persons = persons.filter(invitation_id__in=invitation_ids)
+    documents = {
+        pk: Document(pk, (name, code, phone or ''))
+        for pk, name, code, phone in invitations.values_list('id', 'name', 'code', 'phone_number')
+    }
+    for invitation_id, first_name, last_name in persons.values_list('invitation_id', 'first_name', 'last_name'):
+        if invitation_id in documents:
+            documents[invitation_id].add_guest(first_name, last_name)
+    return list(documents.values())
+
+
+class LocalNgramIndex:
+    """
+    NgramIndex dell'intero evento, locale al processo, per i DB senza pg_trgm.
+    Come link_tokens.CodeIndex si ricostruisce al cambio di versione del
+    namespace SEARCH_INDEX, così tutti i worker vedono le modifiche.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        version = app_cache.get_version(app_cache.SEARCH_INDEX)
+        index = self._index
+        if index is not None and version == self._version:
+            return index
+        index = NgramIndex(_load_documents())
+        with self._lock:
+            self._index, self._version = index, version
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._index, self._version = None, None
+
+
+NGRAM_INDEX = LocalNgramIndex()
+
+
+def _postgres_candidates(query):
+    """Inviti candidati via indici GIN trigram (una query per tabella)."""
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from .models import Invitation, Person
+
+    invitation_filter = Q()
+    person_filter = Q()
+    for token in tokenize(query):
+        value = Value(token)
+        invitation_filter |= (
+            Q(TrigramWordSimilar(Lower('name'), value))
+            | Q(TrigramWordSimilar(Lower('code'), value))
+            | Q(TrigramWordSimilar(F('phone_number'), value))
+        )
+        person_filter |= Q(TrigramWordSimilar(Lower('first_name'), value)) | Q(TrigramWordSimilar(Lower('last_name'), value))
+    if not invitation_filter:
+        return []
+    ids = set(Invitation.objects.filter(invitation_filter).values_list('id', flat=True)[:CANDIDATE_LIMIT])
+    ids.update(Person.objects.filter(person_filter).values_list('invitation_id', flat=True)[:CANDIDATE_LIMIT])
+    return _load_documents(ids) if ids else []
+
+
+def search_invitations(query, limit=DEFAULT_LIMIT):
+    """Risultati ranked: [{id, name, code, phone_number, status, score, matched_guests}]."""
+    from .models import Invitation
+
+    if connection.vendor == 'postgresql':
+        ranked = rank_documents(query, _postgres_candidates(query), limit=limit)
+    else:
+        ranked = NGRAM_INDEX.current().rank(query, limit=limit)
+    if not ranked:
+        return []
+
+    # Dati freschi (es. status) per i soli risultati
+    rows = {
+        row['id']: row
+        for row in Invitation.objects.filter(id__in=[pk for _, pk, _ in ranked]).values(
+            'id', 'name', 'code', 'phone_number', 'status'
+        )
+    }
+    return [
+        dict(rows[pk], score=score, matched_guests=guests)
+        for score, pk, guests in ranked
+        if pk in rows
+    ]
@@ -5,7 +5,33 @@ from .models import (
     WhatsAppMessageQueue, WhatsAppMessageEvent, WhatsAppTemplate,
     ConfigurableText, InvitationLabel
 )
-from .models import SupplierType, Supplier
+from .models import SupplierType, Supplier, AssignmentJob
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldset: con ?fields=id,name,status vengono serializzati solo i
+    campi richiesti (i nomi sconosciuti sono ignorati). Senza parametro il
+    serializer resta invariato.
+    """
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Insieme dei campi richiesti, oppure None se il parametro è assente."""
+        raw = request.query_params.get(FIELDS_QUERY_PARAM) if request is not None else None
+        if not raw:
+            return None
+        return {name.strip() for name in raw.split(',') if name.strip()}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
 
 class GlobalConfigSerializer(serializers.ModelSerializer):
     class Meta:
@@ -51,7 +77,12 @@ class PublicPersonSerializer(serializers.ModelSerializer):
         
 
 class PublicInvitationSerializer(serializers.ModelSerializer):
-    """Serializer per endpoint pubblico con lettera renderizzata"""
+    """
+    Serializer per endpoint pubblico con lettera renderizzata.
+    Passare un invito con prefetch_related('guests') (vedi PUBLIC_PREFETCH):
+    guests e letter_content leggono la stessa lista senza query aggiuntive.
+    """
+    PUBLIC_PREFETCH = ('guests',)
     guests = PublicPersonSerializer(many=True, read_only=True)
     letter_content = serializers.SerializerMethodField()
     whatsapp = serializers.SerializerMethodField()
@@ -68,9 +99,7 @@ class PublicInvitationSerializer(serializers.ModelSerializer):
 
     def get_letter_content(self, obj):
         """Renderizza il template della lettera con placeholder sostituiti"""
-        config = self.context.get('config')
-        if not config:
-            config, _ = GlobalConfig.objects.get_or_create(pk=1)
+        config = self.context.get('config') or GlobalConfig.load()
         
         template = config.letter_text
         
@@ -87,18 +116,7 @@ class PublicInvitationSerializer(serializers.ModelSerializer):
         return rendered
 
     def get_whatsapp(self, obj):
-        whatsAppSessionStatus = WhatsAppSessionStatus.objects.get(session_type=obj.origin)
-        if not whatsAppSessionStatus:
-            return {
-                'whatsapp_number': '',
-                'whatsapp_name': '',
-                'whatsapp_picture': '',
-            }
-        return {
-            'whatsapp_number': f"+{whatsAppSessionStatus.phone_number}",
-            'whatsapp_name': whatsAppSessionStatus.name,
-            'whatsapp_picture': whatsAppSessionStatus.picture
-        }
+        return WhatsAppSessionStatus.public_profile(obj.origin)
     
     def get_travel_info(self, obj):
         return {
@@ -315,8 +333,14 @@ class InvitationSerializer(serializers.ModelSerializer):
             for related in non_affinities:
                 related.non_affinities.add(invitation)
 
-class InvitationListSerializer(serializers.ModelSerializer):
-    guests_count = serializers.IntegerField(source='guests.count', read_only=True)
+class InvitationListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Serializer della lista admin. Il queryset deve arrivare da
+    InvitationViewSet.get_queryset() (action 'list'): guests_count è
+    un'annotazione, guests/assigned_room/labels/accommodation sono precaricati.
+    Supporta ?fields= (vedi SparseFieldsetMixin).
+    """
+    guests_count = serializers.IntegerField(read_only=True)
     guests = PersonSerializer(many=True, read_only=True)
     accommodation_name = serializers.CharField(source='accommodation.name', read_only=True)
     contact_verified_display = serializers.CharField(source='get_contact_verified_display', read_only=True)
@@ -340,9 +364,12 @@ class GuestInteractionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class GuestHeatmapSerializer(serializers.ModelSerializer):
+    # Stessa forma JSON di sempre: il blob binario resta interno al modello
+    mouse_data = serializers.JSONField(read_only=True)
+
     class Meta:
         model = GuestHeatmap
-        fields = '__all__'
+        fields = ['id', 'invitation', 'session_id', 'timestamp', 'mouse_data', 'screen_width', 'screen_height']
 
 class WhatsAppSessionStatusSerializer(serializers.ModelSerializer):
     class Meta:
@@ -387,3 +414,20 @@ class SupplierSerializer(serializers.ModelSerializer):
         if value < 0:
             raise serializers.ValidationError('Cost must be >= 0')
         return value
+
+
+class AssignmentJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AssignmentJob
+        fields = [
+            'id', 'kind', 'status', 'params', 'progress_total', 'progress_done', 'results', 'best_strategy',
+            'error', 'cancel_requested', 'created_at', 'started_at', 'finished_at'
+        ]
+
+
+class AssignmentJobSummarySerializer(AssignmentJobSerializer):
+    """Per l'elenco: i risultati senza assignment_log (può contenere centinaia di righe)."""
+    results = serializers.SerializerMethodField()
+
+    def get_results(self, obj):
+        return [{k: v for k, v in result.items() if k != 'assignment_log'} for result in obj.results]
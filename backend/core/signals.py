@@ -3,8 +3,9 @@ import os
 import requests
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from .models import Invitation, InvitationLabel, WhatsAppTemplate, WhatsAppMessageQueue, GlobalConfig, Person, Room
+from .models import Invitation, WhatsAppMessageQueue, GlobalConfig, Person, Room, ConfigurableText, WhatsAppSessionStatus, GuestHeatmap
+from . import cache as app_cache
+from . import status_transitions
 
 logger = logging.getLogger(__name__)
 
@@ -12,19 +13,41 @@ logger = logging.getLogger(__name__)
 def track_invitation_changes(sender, instance, **kwargs):
     """
     Traccia lo stato precedente dell'invito prima del salvataggio
-    per rilevare cambiamenti di status o numero di telefono.
+    per rilevare cambiamenti di status, numero di telefono, codice o nome.
     """
     if instance.pk:
         try:
             original = Invitation.objects.get(pk=instance.pk)
             instance._previous_status = original.status
             instance._previous_phone = original.phone_number
+            instance._previous_code = original.code
+            instance._previous_name = original.name
         except Invitation.DoesNotExist:
             instance._previous_status = None
             instance._previous_phone = None
+            instance._previous_code = None
+            instance._previous_name = None
     else:
         instance._previous_status = None
         instance._previous_phone = None
+        instance._previous_code = None
+        instance._previous_name = None
+
+
+# Campo → attributo col valore precedente (vedi track_invitation_changes)
+CODE_INDEX_FIELDS = {'code': '_previous_code', 'status': '_previous_status'}
+SEARCHABLE_INVITATION_FIELDS = {'name': '_previous_name', 'code': '_previous_code', 'phone_number': '_previous_phone'}
+SEARCHABLE_PERSON_FIELDS = {'first_name', 'last_name', 'invitation', 'invitation_id'}
+
+
+def _invitation_changed(instance, created, update_fields, fields):
+    """True se è una creazione o se il salvataggio ha cambiato uno dei campi tracciati."""
+    if created:
+        return True
+    if update_fields is not None and not fields.keys() & set(update_fields):
+        return False
+    return any(getattr(instance, field) != getattr(instance, previous, None) for field, previous in fields.items())
+
 
 @receiver(post_save, sender=Person)
 def auto_assign_dietary_label(sender, instance, created, **kwargs):
@@ -37,39 +60,12 @@ def auto_assign_dietary_label(sender, instance, created, **kwargs):
     if kwargs.get('update_fields') is not None and 'dietary_requirements' not in kwargs['update_fields']:
         return
     
-    invitation = instance.invitation
-    
-    # Se il campo dietary_requirements è valorizzato (non None e non stringa vuota)
+    # Valorizzato (non None e non stringa vuota): basta assicurare l'etichetta,
+    # altrimenti verifica se altri ospiti dell'invito hanno intolleranze
     if instance.dietary_requirements and instance.dietary_requirements.strip():
-        # Crea o recupera l'etichetta
-        label, _ = InvitationLabel.objects.get_or_create(
-            name="Intolleranze",
-            defaults={'color': '#FF6B6B'}  # Rosso per visibilità
-        )
-        
-        # Aggiungi all'invito se non c'è già
-        if not invitation.labels.filter(pk=label.pk).exists():
-            invitation.labels.add(label)
-            logger.info(f"🍽️ Auto-assigned 'Intolleranze' label to {invitation.name}")
-    
-    # Logica di rimozione (se il campo è stato svuotato o se l'etichetta c'era già ma va verificata)
+        instance.invitation.sync_dietary_label(has_dietary=True)
     else:
-        # Controlla se altri ospiti dell'invito hanno intolleranze
-        # Escludiamo l'istanza corrente nel controllo (anche se qui ha già il valore aggiornato, è più sicuro queryare il DB o la relazione)
-        # Nota: post_save, quindi instance è già salvata col nuovo valore vuoto.
-        
-        has_dietary = invitation.guests.filter(
-            dietary_requirements__isnull=False
-        ).exclude(dietary_requirements='').exists()
-        
-        if not has_dietary:
-            try:
-                label = InvitationLabel.objects.get(name="Intolleranze")
-                if invitation.labels.filter(pk=label.pk).exists():
-                    invitation.labels.remove(label)
-                    logger.info(f"❌ Removed 'Intolleranze' label from {invitation.name}")
-            except InvitationLabel.DoesNotExist:
-                pass
+        instance.invitation.sync_dietary_label()
 
 @receiver(post_save, sender=Invitation)
 def trigger_whatsapp_on_status_change(sender, instance, created, **kwargs):
@@ -136,65 +132,20 @@ def trigger_whatsapp_on_status_change(sender, instance, created, **kwargs):
     logger.info(f"🔄 Status change detected for {instance.code}: {instance._previous_status} -> {new_status}")
 
     # Cerca template attivi per il nuovo stato
-    templates = WhatsAppTemplate.objects.filter(
-        condition=WhatsAppTemplate.Condition.STATUS_CHANGE,
-        trigger_status=new_status,
-        is_active=True
-    )
-
-    if not templates.exists():
+    templates = status_transitions.active_status_templates(new_status)
+    if not templates:
         logger.debug(f"No active templates found for status {new_status}")
         return
 
-    # Recupera Configurazione Globale (per link secret)
-    try:
-        config = GlobalConfig.objects.get(pk=1)
-    except GlobalConfig.DoesNotExist:
+    # Config globale (link secret) e formattazione dei template: vedi core.status_transitions.
+    # Senza record salvato il secret è quello di default: nessun link firmato.
+    config = GlobalConfig.load()
+    if config.pk is None:
         logger.warning("GlobalConfig not found, skipping automated message generation")
         return
-
-    # Genera Link Pubblico
-    token = instance.generate_verification_token(config.invitation_link_secret)
-    frontend_url = os.environ.get('FRONTEND_PUBLIC_URL', 'http://localhost')
-    public_link = f"{frontend_url}?code={instance.code}&token={token}"
-
-    # Risolve Contatti (Sposo vs Sposa)
-    if instance.origin == Invitation.Origin.GROOM:
-        sender_session = 'groom'
-    else:
-        sender_session = 'bride'
-
-    # Itera sui template (potrebbero essercene molteplici, anche se logicamente uno per status è meglio)
-    for template in templates:
-        if not instance.phone_number and not template.recipient == WhatsAppTemplate.Recipient.SPOUSE:
-            logger.warning(f"Skipping automated message for {instance.name}: No phone number")
-            continue
-
-        # Formattazione Messaggio
-        try:
-            message_body = template.content.format(
-                name=instance.name,
-                code=instance.code,
-                link=public_link,
-                guest_names=", ".join([str(p) for p in instance.guests.all()])
-            )
-        except KeyError as e:
-            logger.error(f"Template formatting error for {template.name}: missing key {e}")
-            message_body = template.content # Fallback senza formattazione
-        except Exception as e:
-            logger.error(f"Unexpected formatting error: {e}")
-            continue
-
-        # Creazione Messaggio in Coda
-        queue_item = WhatsAppMessageQueue.objects.create(
-            session_type=sender_session,
-            recipient_number=instance.phone_number if template.recipient == WhatsAppTemplate.Recipient.GUEST else 'spouse',
-            message_body=message_body,
-            status=WhatsAppMessageQueue.Status.PENDING,
-            scheduled_for=timezone.now() # Invia il prima possibile
-        )
-        
-        logger.info(f"✅ Enqueued automated message for {instance.name} (Template: {template.name}) -> ID: {queue_item.id}")
+    messages = status_transitions.status_change_messages(instance, templates, config)
+    for queue_item in WhatsAppMessageQueue.objects.bulk_create(messages):
+        logger.info(f"✅ Enqueued automated message for {instance.name} -> ID: {queue_item.id}")
 
 
 @receiver(post_delete, sender=Room)
@@ -211,3 +162,66 @@ def reset_accommodation_pin_on_room_delete(sender, instance, **kwargs):
     ).update(accommodation_pinned=False)
     
     logger.info(f"🔓 Reset accommodation_pinned for guests in deleted room: {instance}")
+
+
+@receiver(post_save, sender=ConfigurableText)
+@receiver(post_delete, sender=ConfigurableText)
+def invalidate_configurable_texts_cache(sender, instance, **kwargs):
+    """
+    Invalida il dizionario testi servito da PublicConfigurableTextView.
+    Copre sia le scritture da ConfigurableTextViewSet che da Django Admin.
+    """
+    app_cache.invalidate(app_cache.CONFIGURABLE_TEXTS)
+
+
+@receiver(post_save, sender=GlobalConfig)
+@receiver(post_delete, sender=GlobalConfig)
+def invalidate_global_config_cache(sender, instance, **kwargs):
+    """Invalida il singleton cachato letto da GlobalConfig.load()."""
+    app_cache.invalidate(app_cache.GLOBAL_CONFIG)
+
+
+# post_delete non passa `created`: il default True fa invalidare sempre alla cancellazione.
+
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def invalidate_invitation_codes_index(sender, instance, created=True, update_fields=None, **kwargs):
+    """
+    Invalida l'indice code → (id, status) usato dall'endpoint di auth pubblico,
+    solo se code o status sono cambiati (non ad ogni modifica dell'invito).
+    """
+    if _invitation_changed(instance, created, update_fields, CODE_INDEX_FIELDS):
+        app_cache.invalidate(app_cache.INVITATION_CODES)
+
+
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def invalidate_search_index(sender, instance, created=True, update_fields=None, **kwargs):
+    """
+    Nome, codice o telefono cercabili cambiati: l'indice n-gram in memoria va
+    ricostruito. Un cambio di stato (es. SENT → READ) non lo tocca.
+    """
+    if _invitation_changed(instance, created, update_fields, SEARCHABLE_INVITATION_FIELDS):
+        app_cache.invalidate(app_cache.SEARCH_INDEX)
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_search_index_for_person(sender, instance, update_fields=None, **kwargs):
+    """Come sopra per gli ospiti: salta i salvataggi parziali che non toccano nome o invito."""
+    if update_fields is None or SEARCHABLE_PERSON_FIELDS & set(update_fields):
+        app_cache.invalidate(app_cache.SEARCH_INDEX)
+
+
+@receiver(post_save, sender=WhatsAppSessionStatus)
+@receiver(post_delete, sender=WhatsAppSessionStatus)
+def invalidate_whatsapp_profiles_cache(sender, instance, **kwargs):
+    """Invalida lo snapshot profilo mostrato nella landing ospite."""
+    app_cache.invalidate(app_cache.WHATSAPP_PROFILES)
+
+
+@receiver(post_save, sender=GuestHeatmap)
+@receiver(post_delete, sender=GuestHeatmap)
+def invalidate_heatmap_grids_cache(sender, instance, **kwargs):
+    """Nuovi punti heatmap: le griglie di densità cachate vanno ricalcolate."""
+    app_cache.invalidate(app_cache.HEATMAP_GRIDS)
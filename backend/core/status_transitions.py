@@ -0,0 +1,122 @@
+"""
+Transizioni di stato degli inviti e messaggi WhatsApp automatici collegati.
+
+Il percorso per singolo invito passa da Invitation.save() e dai signal
+(track_invitation_changes + trigger_whatsapp_on_status_change): una SELECT
+dello stato precedente, template, config e ospiti, un INSERT in coda.
+
+bulk_transition() applica la stessa transizione a molti inviti (es.
+bulk-send) in una transazione con un numero costante di statement:
+stati precedenti con una SELECT ... FOR UPDATE, un solo UPDATE, template e
+GlobalConfig letti una volta, ospiti precaricati e messaggi accodati con
+un unico bulk_create.
+"""
+import logging
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache as app_cache
+
+logger = logging.getLogger(__name__)
+
+
+def active_status_templates(new_status):
+    """Template STATUS_CHANGE attivi per lo stato di destinazione."""
+    from .models import WhatsAppTemplate
+
+    return list(WhatsAppTemplate.objects.filter(
+        condition=WhatsAppTemplate.Condition.STATUS_CHANGE,
+        trigger_status=new_status,
+        is_active=True
+    ))
+
+
+def public_link(invitation, config):
+    token = invitation.generate_verification_token(config.invitation_link_secret)
+    frontend_url = os.environ.get('FRONTEND_PUBLIC_URL', 'http://localhost')
+    return f"{frontend_url}?code={invitation.code}&token={token}"
+
+
+def status_change_messages(invitation, templates, config, scheduled_for=None):
+    """Messaggi in coda (non ancora salvati) generati dai template per l'invito."""
+    from .models import Invitation, WhatsAppMessageQueue, WhatsAppTemplate
+
+    link = public_link(invitation, config)
+    # Risolve Contatti (Sposo vs Sposa)
+    sender_session = 'groom' if invitation.origin == Invitation.Origin.GROOM else 'bride'
+    guest_names = None
+    messages = []
+
+    for template in templates:
+        if not invitation.phone_number and not template.recipient == WhatsAppTemplate.Recipient.SPOUSE:
+            logger.warning(f"Skipping automated message for {invitation.name}: No phone number")
+            continue
+
+        if guest_names is None:
+            guest_names = ", ".join([str(p) for p in invitation.guests.all()])
+        try:
+            message_body = template.content.format(
+                name=invitation.name,
+                code=invitation.code,
+                link=link,
+                guest_names=guest_names
+            )
+        except KeyError as e:
+            logger.error(f"Template formatting error for {template.name}: missing key {e}")
+            message_body = template.content  # Fallback senza formattazione
+        except Exception as e:
+            logger.error(f"Unexpected formatting error: {e}")
+            continue
+
+        messages.append(WhatsAppMessageQueue(
+            session_type=sender_session,
+            recipient_number=invitation.phone_number if template.recipient == WhatsAppTemplate.Recipient.GUEST else 'spouse',
+            message_body=message_body,
+            status=WhatsAppMessageQueue.Status.PENDING,
+            scheduled_for=scheduled_for or timezone.now()  # Invia il prima possibile
+        ))
+    return messages
+
+
+def bulk_transition(invitation_ids, new_status):
+    """
+    Porta gli inviti a new_status. Ritorna {id: stato_precedente} per gli
+    inviti trovati; solo quelli con stato diverso vengono aggiornati e
+    generano messaggi automatici.
+
+    La verifica del contatto WhatsApp dei signal non viene eseguita: dipende
+    da modifiche del numero di telefono, che una transizione di stato non fa.
+    """
+    from .models import GlobalConfig, Invitation, WhatsAppMessageQueue
+
+    with transaction.atomic():
+        previous = dict(
+            Invitation.objects.select_for_update()
+            .filter(id__in=invitation_ids)
+            .values_list('id', 'status')
+        )
+        changed_ids = [pk for pk, status in previous.items() if status != new_status]
+        if not changed_ids:
+            return previous
+
+        now = timezone.now()
+        Invitation.objects.filter(id__in=changed_ids).update(status=new_status, updated_at=now)
+        logger.info(f"🔄 Bulk status change to {new_status}: {len(changed_ids)} invitations")
+
+        templates = active_status_templates(new_status)
+        if templates:
+            config = GlobalConfig.load()
+            if config.pk is None:
+                logger.warning("GlobalConfig not found, skipping automated message generation")
+            else:
+                messages = []
+                for invitation in Invitation.objects.filter(id__in=changed_ids).prefetch_related('guests'):
+                    messages.extend(status_change_messages(invitation, templates, config, scheduled_for=now))
+                WhatsAppMessageQueue.objects.bulk_create(messages)
+                logger.info(f"✅ Enqueued {len(messages)} automated messages for status {new_status}")
+
+        # update() non emette post_save: l'indice code → stato va invalidato qui
+        app_cache.invalidate(app_cache.INVITATION_CODES)
+    return previous
@@ -3,6 +3,8 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from django.db import IntegrityError
 from unittest.mock import patch
+from core import preload
+import os
 from core.models import Invitation, InvitationLabel, ConfigurableText, Person, Accommodation, Room, GlobalConfig
 
 @pytest.mark.django_db
@@ -79,6 +81,51 @@ class TestInvitationAdminViews:
         assert self.label1 not in labels
         assert self.label2 in labels
 
+    def test_bulk_labels_reports_affected_pairs(self):
+        self.inv1.labels.add(self.label1)
+        url = '/api/admin/invitations/bulk-labels/'
+        ids = [self.inv1.id, self.inv2.id, self.inv3.id]
+
+        response = self.client.post(url, {
+            'invitation_ids': ids, 'label_ids': [self.label1.id, self.label2.id], 'action': 'add'
+        }, format='json')
+        assert response.data['affected_per_label'] == {self.label1.id: 2, self.label2.id: 3}
+
+        response = self.client.post(url, {
+            'invitation_ids': [self.inv1.id, self.inv2.id], 'label_ids': [self.label2.id], 'action': 'remove'
+        }, format='json')
+        assert response.data['affected_per_label'] == {self.label2.id: 2}
+        assert set(self.inv3.labels.all()) == {self.label1, self.label2}
+
+    def test_bulk_assign_skips_pairs_inserted_concurrently(self):
+        through = Invitation.labels.through
+        original = InvitationLabel._membership
+        reads = []
+
+        def stale_membership(invitation_ids, label_ids):
+            # Prima lettura prima che un'altra richiesta inserisse inv1 ↔ label1
+            reads.append(1)
+            return through.objects.none() if len(reads) == 1 else original(invitation_ids, label_ids)
+
+        self.inv1.labels.add(self.label1)
+        with patch.object(InvitationLabel, '_membership', side_effect=stale_membership):
+            affected = InvitationLabel.bulk_assign([self.inv1.id, self.inv2.id], [self.label1.id])
+
+        assert affected == {self.label1.id: 1}
+        assert len(reads) == 2
+        assert set(self.label1.invitations.all()) == {self.inv1, self.inv2}
+
+    def test_bulk_labels_query_count_is_constant(self, django_assert_max_num_queries):
+        invitations = [Invitation.objects.create(name=f"Bulk {i}", code=f"BL{i}") for i in range(50)]
+        url = '/api/admin/invitations/bulk-labels/'
+        # validazione inviti + label, coppie esistenti, bulk insert (+ savepoint)
+        with django_assert_max_num_queries(6):
+            self.client.post(url, {
+                'invitation_ids': [inv.id for inv in invitations],
+                'label_ids': [self.label1.id, self.label2.id], 'action': 'add'
+            }, format='json')
+        assert self.label1.invitations.count() == 50
+
     def test_mark_as_sent_single(self):
         url = f'/api/admin/invitations/{self.inv1.id}/mark-as-sent/'
         response = self.client.post(url)
@@ -196,28 +243,57 @@ class TestPublicConfigViews:
         url = '/api/public/languages/'
         response = self.client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert isinstance(response.data, list)
+        assert isinstance(response.json(), list)
 
     def test_public_languages_fallback(self):
         url = '/api/public/languages/'
-        # Mock os.path.exists per ritornare False (file non trovato)
-        with patch('os.path.exists', return_value=False):
+        # File non trovato (es. script di generazione mai eseguito)
+        with patch.object(preload.LANGUAGES, 'relative_path', 'core/fixtures/missing.json'):
             response = self.client.get(url)
             assert response.status_code == status.HTTP_200_OK
-            assert isinstance(response.data, list)
+            data = response.json()
+            assert isinstance(data, list)
             # Dovrebbe ritornare il fallback di 2 lingue (it, en)
-            assert len(response.data) == 2
-            assert response.data[0]['code'] == 'it'
-            assert response.data[1]['code'] == 'en'
+            assert len(data) == 2
+            assert data[0]['code'] == 'it'
+            assert data[1]['code'] == 'en'
 
-    def test_public_languages_fallback_on_error(self):
+    def test_public_languages_fallback_on_error(self, tmp_path):
         url = '/api/public/languages/'
-        # Mock open() per sollevare un'eccezione (file non leggibile)
-        with patch('builtins.open', side_effect=IOError("File read error")):
+        # File non parsabile
+        broken = tmp_path / 'languages.json'
+        broken.write_text('[{"code": ')
+        with patch.object(preload.LANGUAGES, 'relative_path', str(broken)):
             response = self.client.get(url)
             assert response.status_code == status.HTTP_200_OK
-            assert isinstance(response.data, list)
+            data = response.json()
+            assert isinstance(data, list)
             # Dovrebbe ritornare il fallback di 1 lingua (it) nel caso di errore
-            assert len(response.data) == 1
-            assert response.data[0]['code'] == 'it'
+            assert len(data) == 1
+            assert data[0]['code'] == 'it'
+
+    def test_public_languages_conditional_get(self):
+        url = '/api/public/languages/'
+        response = self.client.get(url)
+        assert response['ETag']
+        assert 'max-age' in response['Cache-Control']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_public_languages_reloaded_when_file_changes(self, tmp_path):
+        url = '/api/public/languages/'
+        fixture = tmp_path / 'languages.json'
+        fixture.write_text('[{"code": "it", "label": "Italiano", "flag": ""}]')
+        with patch.object(preload.LANGUAGES, 'relative_path', str(fixture)):
+            first = self.client.get(url)
+            assert [l['code'] for l in first.json()] == ['it']
+
+            # Rigenerazione (generate_languages_config.sh): cambia l'mtime
+            fixture.write_text('[{"code": "it", "label": "Italiano", "flag": ""}, {"code": "es", "label": "Español", "flag": ""}]')
+            os.utime(fixture, ns=(fixture.stat().st_atime_ns, fixture.stat().st_mtime_ns + 10**9))
+
+            second = self.client.get(url)
+            assert [l['code'] for l in second.json()] == ['it', 'es']
+            assert second['ETag'] != first['ETag']
 
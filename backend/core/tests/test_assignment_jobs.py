@@ -0,0 +1,131 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from core import assignment, assignment_jobs
+from core.models import Accommodation, AssignmentJob, Invitation, Person, Room
+
+URL = '/api/admin/accommodations/auto-assign/jobs/'
+
+
+@pytest.mark.django_db
+class TestAssignmentJobs:
+    def setup_method(self):
+        self.client = APIClient()
+        hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        self.room = Room.objects.create(accommodation=hotel, room_number="1", capacity_adults=2, capacity_children=0)
+        self.invitation = Invitation.objects.create(
+            name="Famiglia Rossi", code="rossi", status=Invitation.Status.CONFIRMED, accommodation_requested=True
+        )
+        Person.objects.create(invitation=self.invitation, first_name="Mario")
+        Person.objects.create(invitation=self.invitation, first_name="Anna")
+
+    def _assigned_rooms(self):
+        return set(self.invitation.guests.values_list('assigned_room', flat=True))
+
+    def test_simulation_job_is_queued_then_persisted(self):
+        response = self.client.post(URL, {}, format='json')
+        assert response.status_code == 202
+        job_id = response.data['id']
+        assert response.data['status'] == 'pending' and response.data['progress_total'] == len(assignment.STRATEGIES)
+
+        assert assignment_jobs.run_pending() == 1
+
+        job = self.client.get(f'{URL}{job_id}/').data
+        assert job['status'] == 'completed' and job['progress_done'] == job['progress_total']
+        assert len(job['results']) == len(assignment.STRATEGIES)
+        assert job['best_strategy'] == job['results'][0]['strategy_code']
+        assert job['results'][0]['assignment_log']
+        assert self._assigned_rooms() == {None}  # la simulazione non scrive
+
+        # L'elenco permette il confronto senza rieseguire, senza i log
+        listed = self.client.get(URL, {'kind': 'simulation'}).data
+        assert [j['id'] for j in listed] == [job_id]
+        assert 'assignment_log' not in listed[0]['results'][0]
+
+    def test_cancel_while_running_keeps_partial_results(self, monkeypatch):
+        job = assignment_jobs.submit('SIMULATION')
+        real = assignment.iter_simulation
+
+        def stream(snapshot, reset_previous=False):
+            results = real(snapshot, reset_previous)
+            yield next(results)
+            self.client.post(f'{URL}{job.id}/cancel/')
+            yield next(results)
+            raise AssertionError("il worker avrebbe dovuto fermarsi")
+
+        monkeypatch.setattr(assignment, 'iter_simulation', stream)
+        assignment_jobs.run_pending()
+
+        job.refresh_from_db()
+        assert job.status == AssignmentJob.Status.CANCELLED and job.finished_at
+        assert job.progress_done == 2 and len(job.results) == 2
+
+    def test_execution_job_writes_and_cancelled_job_does_not(self):
+        cancelled = self.client.post(URL, {'strategy': 'STANDARD'}, format='json').data
+        assert self.client.post(f"{URL}{cancelled['id']}/cancel/").data['status'] == 'cancelled'
+        assignment_jobs.run_pending()
+        assert self._assigned_rooms() == {None}
+
+        executed = self.client.post(URL, {'strategy': 'STANDARD'}, format='json').data
+        assignment_jobs.run_pending()
+        assert self.client.get(f"{URL}{executed['id']}/").data['status'] == 'completed'
+        assert self._assigned_rooms() == {self.room.id}
+        assert self.client.post(f"{URL}{executed['id']}/cancel/").status_code == 409
+
+    def test_cancel_after_planning_blocks_the_write(self, monkeypatch):
+        job = assignment_jobs.submit('STANDARD')
+        real = assignment.run_strategy
+
+        def run_strategy(*args):
+            planned = real(*args)
+            assert assignment_jobs.cancel(job)  # arriva tra il calcolo e la scrittura
+            return planned
+
+        monkeypatch.setattr(assignment, 'run_strategy', run_strategy)
+        job = assignment_jobs.run(assignment_jobs.claim_next())
+        assert job.status == AssignmentJob.Status.CANCELLED
+        assert self._assigned_rooms() == {None}
+
+    def test_plan_and_completion_commit_together(self, monkeypatch):
+        job = assignment_jobs.submit('STANDARD')
+        real = assignment.Plan.apply
+
+        def apply(plan):
+            real(plan)
+            raise RuntimeError("scrittura interrotta")
+
+        monkeypatch.setattr(assignment.Plan, 'apply', apply)
+        job = assignment_jobs.run(assignment_jobs.claim_next())
+        assert job.status == AssignmentJob.Status.FAILED
+        assert self._assigned_rooms() == {None}  # il piano è tornato indietro con la transazione
+        assert self.client.post(f'{URL}{job.id}/cancel/').status_code == 409
+
+    def test_incremental_dry_run_job(self):
+        job = assignment_jobs.submit('INCREMENTAL', dry_run=True)
+        job = assignment_jobs.run(assignment_jobs.claim_next())
+
+        assert job.kind == AssignmentJob.Kind.INCREMENTAL
+        assert job.results[0]['assigned_guests'] == 2
+        assert self._assigned_rooms() == {None}
+
+    def test_validation(self):
+        assert self.client.post(URL, {'strategy': 'NOPE'}, format='json').status_code == 400
+        assert self.client.post(URL, {'strategy': 'INCREMENTAL', 'max_repair_moves': -1}, format='json').status_code == 400
+        assert self.client.get(f'{URL}999/').status_code == 404
+
+    def test_worker_command_fails_interrupted_jobs(self):
+        stale = assignment_jobs.submit('SIMULATION')
+        AssignmentJob.objects.filter(id=stale.id).update(status=AssignmentJob.Status.RUNNING)
+        queued = assignment_jobs.submit('SIMULATION')
+        out = io.StringIO()
+
+        call_command('run_assignment_worker', '--once', stdout=out)
+
+        assert "Marked 1 interrupted jobs as failed" in out.getvalue()
+        assert "Processed 1 assignment jobs" in out.getvalue()
+        stale.refresh_from_db()
+        queued.refresh_from_db()
+        assert (stale.status, stale.error) == (AssignmentJob.Status.FAILED, "Worker interrupted")
+        assert queued.status == AssignmentJob.Status.COMPLETED
@@ -0,0 +1,359 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core import assignment
+from core.models import Accommodation, Invitation, Person, Room
+
+
+def _family(name, adults=2, children=0, **kwargs):
+    inv = Invitation.objects.create(
+        name=name, code=name.lower().replace(' ', '-'),
+        status=Invitation.Status.CONFIRMED, accommodation_requested=True, **kwargs
+    )
+    Person.objects.bulk_create(
+        [Person(invitation=inv, first_name=f"Adulto {i}") for i in range(adults)]
+        + [Person(invitation=inv, first_name=f"Bimbo {i}", is_child=True) for i in range(children)]
+    )
+    return inv
+
+
+@pytest.mark.django_db
+class TestAssignmentSolver:
+    def setup_method(self):
+        self.client = APIClient()
+        self.hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        self.villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        self.double = Room.objects.create(accommodation=self.hotel, room_number="101", capacity_adults=2, capacity_children=0)
+        self.family_room = Room.objects.create(accommodation=self.villa, room_number="1", capacity_adults=2, capacity_children=1)
+
+    def test_simulation_queries_do_not_grow_with_invitations(self):
+        def simulate():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/admin/accommodations/auto-assign/', {}, format='json')
+            assert response.status_code == 200
+            return len(ctx.captured_queries)
+
+        _family("Famiglia 0")
+        few = simulate()
+        for i in range(1, 30):
+            _family(f"Famiglia {i}")
+        assert simulate() == few
+        # La simulazione non scrive
+        assert not Person.objects.filter(assigned_room__isnull=False).exists()
+
+    def test_children_use_child_slots_and_rooms_are_not_shared(self):
+        rossi = _family("Rossi", adults=2, children=1)
+        bianchi = _family("Bianchi", adults=2)
+
+        results, plan = assignment.run_strategy(assignment.Snapshot.load(), 'STANDARD')
+
+        assert results['assigned_guests'] == 5 and results['unassigned_guests'] == 0
+        rooms = {p.invitation_id: p.room.id for p in plan.persons}
+        assert rooms[rossi.id] == self.family_room.id
+        assert rooms[bianchi.id] == self.double.id
+        assert results['wasted_beds'] == 0
+
+    def test_failed_group_is_rolled_back_completely(self):
+        # Gruppo affine da 5: non entra in nessun alloggio, né come blocco né diviso
+        big = _family("Grande", adults=3)
+        small = _family("Piccola", adults=2)
+        big.affinities.add(small)
+
+        plan = assignment.Snapshot.load().plan()
+        plan.solve(assignment.STRATEGIES['AFFINITY_CLUSTER'])
+
+        assert plan.placements == []
+        assert all(p.room is None for p in plan.persons)
+        assert all(r.adults == r.children == 0 and not r.owners for r in plan.rooms.values())
+        assert all(a.assigned_guests == 0 and not a.occupants for a in plan.accommodations)
+
+    def test_non_affine_invitations_are_kept_apart(self):
+        Room.objects.create(accommodation=self.hotel, room_number="102", capacity_adults=2, capacity_children=0)
+        first = _family("Prima")
+        second = _family("Seconda")
+        first.non_affinities.add(second)
+
+        results, plan = assignment.run_strategy(assignment.Snapshot.load(), 'SMALLEST_FIRST')
+
+        assert results['assigned_guests'] == 4
+        accommodations = {inv.id: inv.accommodation.id for inv in plan.invitations.values()}
+        assert accommodations[first.id] != accommodations[second.id]
+
+    def test_apply_writes_only_changed_rows(self):
+        pinned = _family("Pinned", adults=2, accommodation=self.hotel)
+        pinned.guests.update(assigned_room=self.double, accommodation_pinned=True)
+        new = _family("Nuova", adults=2)
+
+        results, plan = assignment.run_strategy(assignment.Snapshot.load(), 'STANDARD', reset_previous=True)
+        with CaptureQueriesContext(connection) as ctx:
+            assert plan.apply() == (2, 1)
+
+        assert results['assigned_guests'] == 2
+        assert len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]) == 2
+        assert set(new.guests.values_list('assigned_room', flat=True)) == {self.family_room.id}
+        new.refresh_from_db()
+        assert new.accommodation == self.villa
+        assert set(pinned.guests.values_list('assigned_room', flat=True)) == {self.double.id}
+
+    def test_invalid_strategy(self):
+        response = self.client.post('/api/admin/accommodations/auto-assign/', {'strategy': 'NOPE'}, format='json')
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestParallelSimulation:
+    def setup_method(self):
+        hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        for number in range(4):
+            Room.objects.create(accommodation=hotel, room_number=str(number), capacity_adults=2, capacity_children=1)
+        for i in range(6):
+            _family(f"Famiglia {i}", adults=2, children=i % 2)
+
+    def teardown_method(self):
+        assignment.shutdown()
+
+    def test_process_pool_matches_inline_ranking(self):
+        snapshot = assignment.Snapshot.load()
+
+        inline = assignment.simulate(snapshot, workers=0)
+        parallel = assignment.simulate(snapshot, workers=2, timeout=30)
+
+        assert [r['strategy_code'] for r in parallel] == [r['strategy_code'] for r in inline]
+        assert parallel == inline
+        assert len(parallel) == len(assignment.STRATEGIES)
+        assert all((a['assigned_guests'], -a['wasted_beds']) >= (b['assigned_guests'], -b['wasted_beds'])
+                   for a, b in zip(parallel, parallel[1:]))
+
+    def test_pool_uses_explicit_start_method(self):
+        pool = assignment._executor(2)
+        assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+    def test_web_request_runs_inline(self, settings, monkeypatch):
+        settings.AUTO_ASSIGN_WORKERS = 4
+        monkeypatch.setattr(assignment, '_executor', lambda workers: pytest.fail("pool in a web worker"))
+
+        response = APIClient().post('/api/admin/accommodations/auto-assign/', {}, format='json')
+
+        assert response.status_code == 200
+        assert len(response.data['results']) == len(assignment.STRATEGIES)
+
+    def test_enable_pool_only_outside_tests(self, settings, monkeypatch):
+        settings.AUTO_ASSIGN_WORKERS = 3
+        monkeypatch.setattr(assignment, '_pool_workers', 0)
+        assignment.enable_pool()
+        assert assignment._pool_workers == 0
+
+        monkeypatch.setenv('DJANGO_TEST_MODE', 'False')
+        assignment.enable_pool()
+        assert assignment._pool_workers == 3
+
+    def test_timeout_is_reported_per_strategy(self):
+        results = assignment.simulate(assignment.Snapshot.load(), workers=0, timeout=0)
+
+        assert {r['strategy_code'] for r in results} == set(assignment.STRATEGIES)
+        greedy = [r for r in results if r['strategy_code'] != 'OPTIMAL']
+        assert all(r['error'] == "Timeout after 0s" for r in greedy)
+
+    def test_endpoint_ranks_results(self, settings):
+        settings.AUTO_ASSIGN_TIMEOUT = 30
+        response = APIClient().post('/api/admin/accommodations/auto-assign/', {}, format='json')
+
+        assert response.status_code == 200
+        results = response.data['results']
+        assert response.data['best_strategy'] == results[0]['strategy_code']
+        assert results[0]['assigned_guests'] == 11  # 4 stanze: le 3 famiglie con bambino e una coppia
+
+
+@pytest.mark.django_db
+class TestOptimalStrategy:
+    def setup_method(self):
+        self.hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        self.triple = Room.objects.create(accommodation=self.hotel, room_number="3", capacity_adults=3, capacity_children=0)
+        self.double = Room.objects.create(accommodation=self.hotel, room_number="2", capacity_adults=2, capacity_children=0)
+
+    def test_finds_packing_missed_by_greedy(self):
+        couple = _family("Coppia", adults=2)
+        trio = _family("Trio", adults=3)
+        snapshot = assignment.Snapshot.load()
+
+        standard, _ = assignment.run_strategy(snapshot, 'STANDARD')
+        optimal, plan = assignment.run_strategy(snapshot, 'OPTIMAL')
+
+        # STANDARD dà la tripla alla coppia (id minore) e il trio resta fuori
+        assert standard['assigned_guests'] == 2
+        assert optimal['assigned_guests'] == 5 and optimal['wasted_beds'] == 0
+        assert optimal['proven_optimal'] and optimal['upper_bound'] == 5
+        rooms = {p.invitation_id: p.room.id for p in plan.persons}
+        assert rooms == {couple.id: self.double.id, trio.id: self.triple.id}
+
+        results = {r['strategy_code']: r for r in assignment.simulate(snapshot, workers=0)}
+        assert results['OPTIMAL']['optimality_gap'] == 0
+        assert results['STANDARD']['optimality_gap'] == 3
+
+    def test_respects_pinned_children_and_non_affinities(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        family_room = Room.objects.create(accommodation=villa, room_number="1", capacity_adults=2, capacity_children=1)
+        pinned = _family("Pinned", adults=2, accommodation=self.hotel)
+        pinned.guests.update(assigned_room=self.double, accommodation_pinned=True)
+        family = _family("Famiglia", adults=2, children=1)
+        rival = _family("Rivale", adults=2)
+        rival.non_affinities.add(pinned)
+
+        results, plan = assignment.run_strategy(assignment.Snapshot.load(), 'OPTIMAL', reset_previous=True)
+
+        assert results['assigned_guests'] == 5 and results['proven_optimal']
+        rooms = {p.id: p.room.id for p in plan.persons if p.room}
+        # Il rivale non può stare in hotel con i pinned; il bambino usa un posto adulto della tripla
+        assert {rooms[p.id] for p in rival.guests.all()} == {family_room.id}
+        assert {rooms[p.id] for p in family.guests.all()} == {self.triple.id}
+        assert {rooms[p.id] for p in pinned.guests.all()} == {self.double.id}
+
+    def test_prefers_affine_invitations_together(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        Room.objects.create(accommodation=villa, room_number="1", capacity_adults=2, capacity_children=0)
+        first = _family("Prima", adults=2)
+        second = _family("Seconda", adults=2)
+        first.affinities.add(second)
+
+        _, plan = assignment.run_strategy(assignment.Snapshot.load(), 'OPTIMAL')
+
+        assert plan.invitations[first.id].accommodation.id == self.hotel.id
+        assert plan.invitations[second.id].accommodation.id == self.hotel.id
+
+    def test_budget_returns_best_so_far_with_bound(self, settings):
+        settings.AUTO_ASSIGN_OPTIMAL_BUDGET = 0
+        for number in range(6):
+            Room.objects.create(accommodation=self.hotel, room_number=f"x{number}", capacity_adults=3, capacity_children=1)
+        for i in range(30):
+            _family(f"Famiglia {i}", adults=1 + i % 3, children=i % 2)
+
+        results, _ = assignment.run_strategy(assignment.Snapshot.load(), 'OPTIMAL')
+
+        assert not results['proven_optimal']
+        assert 0 < results['assigned_guests'] <= results['upper_bound']
+        assert isinstance(results['upper_bound_trivial'], bool)
+
+        ranked = assignment.rank([results])
+        assert ranked[0]['optimality_gap_exact'] is False
+
+    def test_partially_placed_invitation_keeps_accommodation(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        Room.objects.create(accommodation=villa, room_number="1", capacity_adults=3, capacity_children=0)
+        family = _family("Famiglia", adults=2, accommodation=self.hotel)
+        family.guests.update(assigned_room=self.double)
+        Person.objects.create(invitation=family, first_name="Ritardatario")
+
+        results, plan = assignment.run_strategy(assignment.Snapshot.load(), 'OPTIMAL')
+
+        # In villa entrerebbe con 0 letti sprecati, ma l'alloggio comunicato è l'hotel
+        assert results['assigned_guests'] == 1
+        assert plan.invitations[family.id].accommodation.id == self.hotel.id
+        assert {p.room.accommodation.id for p in plan.persons if p.invitation_id == family.id} == {self.hotel.id}
+
+    def test_execution_writes_optimal_plan(self):
+        couple = _family("Coppia", adults=2)
+        trio = _family("Trio", adults=3)
+
+        response = APIClient().post('/api/admin/accommodations/auto-assign/', {'strategy': 'OPTIMAL'}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['result']['assigned_guests'] == 5
+        assert set(trio.guests.values_list('assigned_room', flat=True)) == {self.triple.id}
+        assert set(couple.guests.values_list('assigned_room', flat=True)) == {self.double.id}
+
+
+@pytest.mark.django_db
+class TestIncrementalAssignment:
+    url = '/api/admin/accommodations/auto-assign/incremental/'
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        self.triple = Room.objects.create(accommodation=self.hotel, room_number="3", capacity_adults=3, capacity_children=0)
+        self.double = Room.objects.create(accommodation=self.hotel, room_number="2", capacity_adults=2, capacity_children=0)
+        self.couple = _family("Coppia", adults=2, accommodation=self.hotel)
+        self.couple.guests.update(assigned_room=self.triple)
+
+    def test_keeps_existing_rooms_and_places_late_confirmations(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        for number in range(3):
+            Room.objects.create(accommodation=villa, room_number=str(number), capacity_adults=2, capacity_children=1)
+        late = _family("Ritardataria", adults=2, children=1)
+        big = _family("Numerosa", adults=4, children=1)
+
+        response = self.client.post(self.url, {}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['result']['assigned_guests'] == 8
+        assert set(self.couple.guests.values_list('assigned_room', flat=True)) == {self.triple.id}
+        assert set(late.guests.values_list('assigned_room__accommodation', flat=True)) == {villa.id}
+        # Più grande di ogni stanza: diviso su due stanze della villa
+        assert big.guests.values('assigned_room').distinct().count() == 2
+        big.refresh_from_db()
+        assert big.accommodation == villa
+
+    def test_prefers_accommodation_of_affine_invitation(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        Room.objects.create(accommodation=villa, room_number="1", capacity_adults=2, capacity_children=0)
+        friends = _family("Amici", adults=2)
+        friends.affinities.add(self.couple)
+
+        result, plan = assignment.run_incremental(assignment.Snapshot.load())
+
+        assert result['assigned_guests'] == 2
+        assert plan.invitations[friends.id].accommodation.id == self.hotel.id
+
+    def test_repair_moves_unpinned_invitation_within_accommodation(self):
+        trio = _family("Trio", adults=3)
+
+        result, _ = assignment.run_incremental(assignment.Snapshot.load())
+        assert result['assigned_guests'] == 0 and result['unassigned_guests'] == 3
+
+        response = self.client.post(self.url, {'max_repair_moves': 1}, format='json')
+        assert response.data['result']['assigned_guests'] == 3
+        assert [move['invitation'] for move in response.data['result']['repair_moves']] == ["Coppia"]
+        assert set(trio.guests.values_list('assigned_room', flat=True)) == {self.triple.id}
+        assert set(self.couple.guests.values_list('assigned_room', flat=True)) == {self.double.id}
+        self.couple.refresh_from_db()
+        assert self.couple.accommodation == self.hotel
+
+    def test_pinned_guests_are_never_moved(self):
+        self.couple.guests.update(accommodation_pinned=True)
+        _family("Trio", adults=3)
+
+        result, plan = assignment.run_incremental(assignment.Snapshot.load(), max_repair_moves=5)
+
+        assert result['assigned_guests'] == 0 and result['repair_moves'] == []
+        assert {p.room.id for p in plan.persons if p.room} == {self.triple.id}
+
+    def test_dry_run_validation_and_constant_queries(self):
+        assert self.client.post(self.url, {'max_repair_moves': 'x'}, format='json').status_code == 400
+        assert self.client.post(self.url, {'max_repair_moves': 99}, format='json').status_code == 400
+
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        Room.objects.bulk_create([
+            Room(accommodation=villa, room_number=str(n), capacity_adults=2, capacity_children=1) for n in range(300)
+        ])
+        for i in range(200):
+            _family(f"Famiglia {i}", adults=2, children=i % 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'dry_run': True}, format='json')
+        assert response.data['mode'] == 'SIMULATION'
+        assert response.data['result']['assigned_guests'] == 500
+        assert len(ctx.captured_queries) == 6  # solo il snapshot
+        assert not Person.objects.filter(invitation__name__startswith="Famiglia", assigned_room__isnull=False).exists()
+
+    def test_partially_placed_invitation_stays_in_its_accommodation(self):
+        villa = Accommodation.objects.create(name="Villa Sole", address="Via Po 2")
+        Room.objects.create(accommodation=villa, room_number="1", capacity_adults=1, capacity_children=0)
+        Person.objects.create(invitation=self.couple, first_name="Ritardatario")
+        self.double.delete()  # in hotel resta solo la tripla, con un posto libero
+
+        response = self.client.post(self.url, {}, format='json')
+
+        assert response.data['result']['assigned_guests'] == 1
+        assert set(self.couple.guests.values_list('assigned_room', flat=True)) == {self.triple.id}
+        self.couple.refresh_from_db()
+        assert self.couple.accommodation == self.hotel
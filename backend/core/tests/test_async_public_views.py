@@ -0,0 +1,158 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import path
+from core import cache as app_cache
+from core import guest_auth, ingest
+from core.middleware import RequestMemoMiddleware
+from core.models import ConfigurableText, GuestHeatmap, GuestInteraction, Invitation
+from core.views import (
+    AsyncPublicConfigurableTextView, AsyncPublicInvitationAuthView,
+    AsyncPublicLogHeatmapView, AsyncPublicLogInteractionView,
+)
+
+# Stesse rotte di wedding/urls.py in ASGI_MODE
+urlpatterns = [
+    path('api/public/auth/', AsyncPublicInvitationAuthView.as_view()),
+    path('api/public/log-interaction/', AsyncPublicLogInteractionView.as_view()),
+    path('api/public/log-heatmap/', AsyncPublicLogHeatmapView.as_view()),
+    path('api/public/texts/', AsyncPublicConfigurableTextView.as_view()),
+]
+
+pytestmark = pytest.mark.urls(__name__)
+
+
+@pytest.fixture
+def sent_invitation(invitation_factory, global_config):
+    inv = invitation_factory("async-test", "Async Test", [{'first_name': 'Mario'}])
+    inv.status = Invitation.Status.SENT
+    inv.save()
+    inv.link_token = inv.generate_verification_token(global_config.invitation_link_secret)
+    return inv
+
+
+@pytest.fixture
+def authed_client(api_client, sent_invitation):
+    api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+    return api_client
+
+
+@pytest.mark.django_db
+class TestAsyncPublicAuth:
+    def test_auth_returns_invitation_and_creates_session(self, api_client, sent_invitation):
+        response = api_client.post('/api/public/auth/', {
+            'code': sent_invitation.code, 'token': sent_invitation.link_token
+        }, format='json')
+
+        assert response.status_code == 200
+        assert response.json()['valid'] is True
+        assert response.json()['invitation']['name'] == "Async Test"
+        assert Session.objects.get().get_decoded()['invitation_id'] == sent_invitation.id
+
+    def test_auth_signed_mode_sets_cookie(self, api_client, sent_invitation, settings):
+        settings.GUEST_AUTH_MODE = 'signed'
+        response = api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+
+        assert response.status_code == 200
+        assert guest_auth.verify_token(response.cookies[guest_auth.GUEST_COOKIE_NAME].value) == sent_invitation.id
+        assert not Session.objects.exists()
+
+    def test_auth_rejections_match_sync_view(self, api_client, sent_invitation):
+        assert api_client.post('/api/public/auth/', {'code': sent_invitation.code}).status_code == 400
+        assert api_client.post('/api/public/auth/', {'code': 'missing', 'token': 'x'}).status_code == 404
+        assert api_client.post('/api/public/auth/', {
+            'code': sent_invitation.code, 'token': '0' * 16
+        }).status_code == 403
+
+    def test_auth_rejects_malformed_json(self, api_client, db):
+        response = api_client.generic('POST', '/api/public/auth/', '{not json', content_type='application/json')
+        assert response.status_code == 400
+
+    def test_get_is_not_allowed(self, api_client, db):
+        assert api_client.get('/api/public/auth/').status_code == 405
+
+
+@pytest.mark.django_db
+class TestAsyncPublicTexts:
+    def test_texts_fallback_and_conditional_get(self, api_client):
+        ConfigurableText.objects.create(key='home.title', language='it', content='Ciao')
+        ConfigurableText.objects.create(key='home.title', language='en', content='Hello')
+        ConfigurableText.objects.create(key='home.footer', language='it', content='Fine')
+
+        response = api_client.get('/api/public/texts/?lang=en')
+
+        assert response.status_code == 200
+        assert response.json() == {'home.title': 'Hello', 'home.footer': 'Fine'}
+        cached = api_client.get('/api/public/texts/?lang=en', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == 304
+
+
+@pytest.mark.django_db
+class TestAsyncPublicTracking:
+    def test_log_interaction_is_buffered(self, authed_client, sent_invitation):
+        response = authed_client.post('/api/public/log-interaction/', {
+            'event_type': 'click_cta', 'metadata': {'button_id': 'rsvp'}
+        }, format='json', HTTP_USER_AGENT='Mozilla/5.0 (iPhone; Mobile)')
+
+        assert response.status_code == 202
+        assert ingest.INTERACTIONS.flush() == 1
+        interaction = GuestInteraction.objects.get(invitation=sent_invitation)
+        assert interaction.device_type == 'mobile'
+        assert interaction.metadata == {'button_id': 'rsvp'}
+
+    def test_log_interaction_requires_guest(self, api_client, db):
+        response = api_client.post('/api/public/log-interaction/', {'event_type': 'x'}, format='json')
+        assert response.status_code == 401
+
+    def test_log_interaction_validation_and_backpressure(self, authed_client, monkeypatch):
+        assert authed_client.post('/api/public/log-interaction/', {'metadata': {}}, format='json').status_code == 400
+
+        monkeypatch.setattr(ingest.INTERACTIONS, 'append', lambda event: False)
+        response = authed_client.post('/api/public/log-interaction/', {'event_type': 'x'}, format='json')
+        assert response.status_code == 503
+        assert response['Retry-After'] == '5'
+
+    def test_legacy_session_is_upgraded(self, authed_client, sent_invitation, settings):
+        settings.GUEST_AUTH_MODE = 'signed'
+        response = authed_client.post('/api/public/log-interaction/', {'event_type': 'x'}, format='json')
+
+        assert response.status_code == 202
+        assert guest_auth.verify_token(response.cookies[guest_auth.GUEST_COOKIE_NAME].value) == sent_invitation.id
+
+    def test_log_heatmap_appends_segment_and_marks_read(self, authed_client, sent_invitation):
+        points = [{'x': 10, 'y': 20, 't': 1}, {'x': 11, 'y': 21, 't': 2}]
+        response = authed_client.post('/api/public/log-heatmap/', {
+            'mouse_data': points, 'session_id': 's1', 'screen_width': 1920, 'screen_height': 1080
+        }, format='json')
+
+        assert response.status_code == 200
+        assert GuestHeatmap.objects.get(invitation=sent_invitation).mouse_data == points
+        sent_invitation.refresh_from_db()
+        assert sent_invitation.status == Invitation.Status.READ
+
+    def test_log_heatmap_rejects_bad_payload(self, authed_client):
+        response = authed_client.post('/api/public/log-heatmap/', {
+            'mouse_data': [{'x': 1, 'y': 1, 't': 1}], 'screen_width': 'wide'
+        }, format='json')
+        assert response.status_code == 400
+        assert authed_client.post('/api/public/log-heatmap/', {'mouse_data': []}, format='json').status_code == 400
+        response = authed_client.post('/api/public/log-heatmap/', {
+            'mouse_data': [[1], 5, 'a'], 'screen_width': 100, 'screen_height': 100
+        }, format='json')
+        assert response.status_code == 400
+
+
+def test_request_memo_middleware_async_path():
+    seen = {}
+
+    async def get_response(request):
+        seen['memo'] = app_cache._request_memo.get()
+        return HttpResponse()
+
+    middleware = RequestMemoMiddleware(get_response)
+    async_to_sync(middleware)(RequestFactory().get('/'))
+
+    assert seen['memo'] == {}
+    assert app_cache._request_memo.get() is None
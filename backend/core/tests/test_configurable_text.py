@@ -1,7 +1,13 @@
 """Tests for ConfigurableText model, serializer, and API endpoints."""
+import json
+import time
+from unittest.mock import patch
+
 import pytest
 from django.urls import reverse
+from django.utils.http import parse_http_date
 from rest_framework import status
+from core import cache as app_cache, preload
 from core.models import ConfigurableText
 from django.db import transaction, IntegrityError
 
@@ -168,6 +174,30 @@ class TestConfigurableTextAdminAPI:
         assert response.status_code == status.HTTP_201_CREATED
         assert ConfigurableText.objects.filter(key='card.cosaltro.content', language='it').exists()
     
+    def test_create_rejects_unsupported_language(self, admin_client):
+        """?lang= fuori da preload.LANGUAGES non crea righe."""
+        url = reverse('admin-texts-detail', kwargs={'key': 'card.cosaltro.content'})
+
+        response = admin_client.put(f"{url}?lang=zz", {'content': 'x'}, content_type='application/json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not ConfigurableText.objects.exists()
+
+    def test_language_added_by_i18n_scripts_is_accepted(self, admin_client, api_client, tmp_path, monkeypatch):
+        """La lista delle lingue è quella rigenerata in languages.json, senza copie in settings."""
+        languages = tmp_path / 'languages.json'
+        languages.write_text(json.dumps([{'code': 'it'}, {'code': 'en'}, {'code': 'fr'}]))
+        monkeypatch.setattr(preload.LANGUAGES, 'relative_path', str(languages))
+        url = reverse('admin-texts-detail', kwargs={'key': 'home.title'})
+
+        try:
+            response = admin_client.put(f"{url}?lang=fr", {'content': 'Bonjour'}, content_type='application/json')
+            assert response.status_code == status.HTTP_201_CREATED
+            assert api_client.get(reverse('public-texts'), {'lang': 'fr'}).data == {'home.title': 'Bonjour'}
+        finally:
+            monkeypatch.undo()
+            preload.LANGUAGES.load()
+
     def test_update_configurable_text_via_api(self, admin_client):
         """Test PUT /api/admin/texts/<key>/ updates existing text."""
         text = ConfigurableText.objects.create(
@@ -255,3 +285,109 @@ class TestConfigurableTextAdminAPI:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data) == 1
         assert response.data[0]['key'] == 'card.viaggio.content'
+
+
+@pytest.mark.django_db
+class TestConfigurableTextPublicCache:
+    """Test cache + conditional GET on /api/public/texts/."""
+
+    def test_steady_state_hits_no_db(self, api_client, django_assert_num_queries):
+        """Dopo la prima richiesta il dizionario è servito dalla cache."""
+        ConfigurableText.objects.create(key='home.title', language='it', content='Ciao')
+        url = reverse('public-texts')
+
+        api_client.get(url, {'lang': 'en'})
+        with django_assert_num_queries(0):
+            response = api_client.get(url, {'lang': 'en'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'home.title': 'Ciao'}
+
+    def test_language_override_and_fallback(self, api_client):
+        """Le chiavi mancanti in 'en' ricadono su 'it'."""
+        ConfigurableText.objects.create(key='a', language='it', content='A it')
+        ConfigurableText.objects.create(key='b', language='it', content='B it')
+        ConfigurableText.objects.create(key='b', language='en', content='B en')
+
+        response = api_client.get(reverse('public-texts'), {'lang': 'en'})
+
+        assert response.data == {'a': 'A it', 'b': 'B en'}
+
+    def test_save_and_delete_invalidate_cache(self, api_client):
+        """post_save / post_delete invalidano il dizionario cachato."""
+        text = ConfigurableText.objects.create(key='home.title', language='it', content='Prima')
+        url = reverse('public-texts')
+        assert api_client.get(url).data == {'home.title': 'Prima'}
+
+        text.content = 'Dopo'
+        text.save()
+        assert api_client.get(url).data == {'home.title': 'Dopo'}
+
+        text.delete()
+        assert api_client.get(url).data == {}
+
+    def test_admin_write_invalidates_cache(self, api_client, admin_client):
+        """Le scritture da ConfigurableTextViewSet invalidano il dizionario."""
+        url = reverse('public-texts')
+        assert api_client.get(url).data == {}
+
+        admin_client.put(
+            reverse('admin-texts-detail', kwargs={'key': 'card.new'}),
+            {'content': 'Nuovo'}, content_type='application/json'
+        )
+
+        assert api_client.get(url).data == {'card.new': 'Nuovo'}
+
+    def test_unknown_language_falls_back_without_new_cache_keys(self, api_client):
+        """?lang= fuori da preload.LANGUAGES serve 'it' e non aggiunge chiavi al memo."""
+        ConfigurableText.objects.create(key='home.title', language='it', content='Ciao')
+        url = reverse('public-texts')
+
+        for i in range(5):
+            assert api_client.get(url, {'lang': f'xx{i}'}).data == {'home.title': 'Ciao'}
+
+        _, memo = app_cache._local_memo[app_cache.CONFIGURABLE_TEXTS]
+        assert set(memo) == {'it'}
+
+    def test_last_modified_advances_on_delete(self, api_client):
+        """Cancellare il testo più recente non fa tornare indietro Last-Modified."""
+        ConfigurableText.objects.create(key='a', language='it', content='A')
+        text = ConfigurableText.objects.create(key='b', language='it', content='B')
+        url = reverse('public-texts')
+        first = api_client.get(url)
+
+        with patch('core.cache.time.time', return_value=time.time() + 60):
+            text.delete()
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'a': 'A'}
+        assert parse_http_date(response['Last-Modified']) > parse_http_date(first['Last-Modified'])
+
+    def test_conditional_get_returns_304(self, api_client):
+        """ETag e Last-Modified permettono la revalidazione con 304."""
+        ConfigurableText.objects.create(key='home.title', language='it', content='Ciao')
+        url = reverse('public-texts')
+
+        first = api_client.get(url)
+        assert first['ETag']
+        assert first['Last-Modified']
+
+        by_etag = api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert by_etag.status_code == status.HTTP_304_NOT_MODIFIED
+
+        by_date = api_client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        assert by_date.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_etag_changes_after_update(self, api_client):
+        """Un contenuto modificato produce un nuovo ETag (200 con body)."""
+        text = ConfigurableText.objects.create(key='home.title', language='it', content='Ciao')
+        url = reverse('public-texts')
+        old_etag = api_client.get(url)['ETag']
+
+        text.content = 'Ciao ciao'
+        text.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=old_etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != old_etag
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core import exports, imports
+from core.models import Accommodation, Invitation, InvitationLabel, Person, Room
+
+
+def _content(response):
+    assert response.status_code == 200
+    assert response.streaming
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+class TestExport:
+    def setup_method(self):
+        self.client = APIClient()
+        hotel = Accommodation.objects.create(name="Hotel Mare", address="Via Roma 1")
+        room = Room.objects.create(accommodation=hotel, room_number="101", capacity_adults=2, capacity_children=0)
+        self.rossi = Invitation.objects.create(
+            name="Famiglia Rossi", code="rossi", phone_number="+393331234567",
+            status=Invitation.Status.CONFIRMED, accommodation=hotel
+        )
+        Person.objects.create(invitation=self.rossi, first_name="Mario", last_name="Rossi", assigned_room=room)
+        Person.objects.create(invitation=self.rossi, first_name="Anna", last_name="Rossi", is_child=True,
+                              dietary_requirements="Glutine")
+        self.rossi.labels.add(
+            InvitationLabel.objects.create(name="Parenti"), InvitationLabel.objects.create(name="Amici")
+        )
+        self.empty = Invitation.objects.create(name="Senza Ospiti", code="vuoto")
+
+    def test_csv_one_row_per_guest_with_logistics(self):
+        content = _content(self.client.get('/api/admin/export/?format=csv'))
+
+        assert content.startswith('\ufeff'.encode('utf-8'))
+        header, *rows = content.decode('utf-8-sig').splitlines()
+        assert header.split(',') == list(exports.COLUMNS)
+        assert len(rows) == 3
+        mario = dict(zip(exports.COLUMNS, rows[0].split(',', len(exports.COLUMNS) - 1)))
+        assert (mario['invitation_code'], mario['first_name'], mario['room']) == ("rossi", "Mario", "101")
+        assert mario['accommodation'] == "Hotel Mare"
+        # "Intolleranze" aggiunta dal signal per le intolleranze di Anna
+        assert rows[0].endswith('"Amici, Intolleranze, Parenti"')
+        assert rows[2].startswith("vuoto,Senza Ospiti,created")
+
+    def test_csv_neutralizes_formula_cells(self):
+        Person.objects.filter(first_name="Mario").update(first_name='=HYPERLINK("http://x")', last_name="@SUM(A1)")
+        Person.objects.filter(first_name="Anna").update(first_name="\tAnna", last_name="-1+2")
+
+        content = _content(self.client.get('/api/admin/export/', {
+            'format': 'csv', 'columns': 'first_name,last_name,phone_number,is_child'
+        }))
+
+        _, mario, anna, _ = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        assert mario == ['\'=HYPERLINK("http://x")', "'@SUM(A1)", "'+393331234567", 'False']
+        assert anna == ["'\tAnna", "'-1+2", "'+393331234567", 'True']
+
+    def test_selected_columns_jsonl_and_filters(self):
+        response = self.client.get('/api/admin/export/', {
+            'format': 'jsonl', 'columns': 'first_name,dietary_requirements,accommodation', 'status': 'confirmed'
+        })
+        assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+        lines = [json.loads(line) for line in _content(response).decode().splitlines()]
+        assert lines == [
+            {'first_name': 'Mario', 'dietary_requirements': None, 'accommodation': 'Hotel Mare'},
+            # Ospite senza stanza: vale l'alloggio dell'invito
+            {'first_name': 'Anna', 'dietary_requirements': 'Glutine', 'accommodation': 'Hotel Mare'},
+        ]
+
+    def test_unknown_columns_are_rejected(self):
+        response = self.client.get('/api/admin/export/', {'columns': 'first_name,password'})
+        assert response.status_code == 400
+        assert response.json()['error'] == "Unknown columns: password"
+
+    def test_xlsx_is_a_valid_workbook(self, tmp_path):
+        response = self.client.get('/api/admin/export/', {'format': 'xlsx', 'columns': 'invitation_name,first_name,is_child'})
+        content = _content(response)
+        assert 'attachment; filename="invitations_export_' in response['Content-Disposition']
+
+        assert zipfile.ZipFile(io.BytesIO(content)).testzip() is None
+        path = tmp_path / 'export.xlsx'
+        path.write_bytes(content)
+        rows = [values for _, values in imports._xlsx_rows(str(path))]
+        assert rows[0] == ['invitation_name', 'first_name', 'is_child']
+        assert rows[1:] == [['Famiglia Rossi', 'Mario', '0'], ['Famiglia Rossi', 'Anna', '1'], ['Senza Ospiti', '', '']]
+
+    def test_queries_grow_with_chunks_not_rows(self, settings):
+        settings.EXPORT_CHUNK_SIZE = 10
+        for i in range(25):
+            inv = Invitation.objects.create(name=f"Famiglia {i}", code=f"fam-{i}")
+            Person.objects.bulk_create([Person(invitation=inv, first_name=f"Ospite {j}") for j in range(3)])
+
+        with CaptureQueriesContext(connection) as ctx:
+            content = _content(self.client.get('/api/admin/export/?format=jsonl'))
+
+        assert len(content.splitlines()) == 3 + 25 * 3
+        # 3 chunk × (id, righe, etichette) + la query vuota che chiude la paginazione
+        assert len(ctx.captured_queries) == 3 * 3 + 1
+
+    def test_async_stream_for_asgi(self):
+        columns = ['invitation_code', 'first_name']
+        stream = exports.aiter_stream(exports.stream_csv(columns, exports.iter_rows(Invitation.objects.all(), columns)))
+
+        async def collect():
+            return [part async for part in stream]
+
+        parts = async_to_sync(collect)()
+        assert b''.join(parts).decode('utf-8-sig').splitlines() == [
+            'invitation_code,first_name', 'rossi,Mario', 'rossi,Anna', 'vuoto,'
+        ]
@@ -0,0 +1,125 @@
+import pytest
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from core import guest_auth, ingest
+from core.models import Invitation, GuestInteraction
+
+
+@pytest.fixture
+def signed_mode(settings):
+    settings.GUEST_AUTH_MODE = 'signed'
+
+
+@pytest.fixture
+def sent_invitation(invitation_factory, global_config):
+    inv = invitation_factory("signed-test", "Signed Test", [{'first_name': 'Mario'}])
+    inv.status = Invitation.Status.SENT
+    inv.save()
+    inv.link_token = inv.generate_verification_token(global_config.invitation_link_secret)
+    return inv
+
+
+@pytest.mark.django_db
+class TestSignedGuestAuth:
+    def test_auth_sets_signed_cookie_without_session(self, api_client, signed_mode, sent_invitation):
+        response = api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+
+        assert response.status_code == 200
+        cookie = response.cookies[guest_auth.GUEST_COOKIE_NAME]
+        assert cookie['httponly']
+        assert guest_auth.verify_token(cookie.value) == sent_invitation.id
+        assert not Session.objects.exists()
+
+    def test_public_calls_do_not_touch_session_table(self, api_client, signed_mode, sent_invitation):
+        api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+
+        with patch.object(SessionStore, 'load') as session_load:
+            response = api_client.post('/api/public/log-interaction/', {
+                'event_type': 'click_cta', 'metadata': {}
+            }, format='json')
+
+        assert response.status_code == 202
+        session_load.assert_not_called()
+        ingest.INTERACTIONS.flush()
+        assert GuestInteraction.objects.filter(invitation=sent_invitation).count() == 1
+
+    def test_tampered_cookie_is_rejected(self, api_client, signed_mode, sent_invitation):
+        forged = guest_auth.issue_token(sent_invitation.id).replace(str(sent_invitation.id), '999', 1)
+        api_client.cookies[guest_auth.GUEST_COOKIE_NAME] = forged
+
+        response = api_client.post('/api/public/rsvp/', {'status': 'confirmed'}, format='json')
+
+        assert response.status_code == 401
+
+    def test_expired_cookie_is_rejected(self, api_client, signed_mode, sent_invitation, settings):
+        settings.GUEST_TOKEN_MAX_AGE = 60
+        token = guest_auth.issue_token(sent_invitation.id)
+        api_client.cookies[guest_auth.GUEST_COOKIE_NAME] = token
+
+        with patch('django.core.signing.time.time', return_value=timezone.now().timestamp() + 3600):
+            response = api_client.post('/api/public/rsvp/', {'status': 'confirmed'}, format='json')
+
+        assert response.status_code == 401
+
+    def test_legacy_session_is_upgraded_to_signed_cookie(self, api_client, sent_invitation, settings):
+        # Auth avvenuta prima dell'attivazione (modalità session)
+        api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+        assert Session.objects.count() == 1
+
+        settings.GUEST_AUTH_MODE = 'signed'
+        response = api_client.post('/api/public/rsvp/', {'status': 'confirmed'}, format='json')
+
+        assert response.status_code == 200
+        cookie = response.cookies[guest_auth.GUEST_COOKIE_NAME]
+        assert guest_auth.verify_token(cookie.value) == sent_invitation.id
+
+    def test_session_mode_is_default(self, api_client, sent_invitation):
+        response = api_client.post('/api/public/auth/', {'code': sent_invitation.code, 'token': sent_invitation.link_token})
+
+        assert guest_auth.GUEST_COOKIE_NAME not in response.cookies
+        assert api_client.session['invitation_id'] == sent_invitation.id
+
+
+@pytest.mark.django_db
+class TestPurgeGuestSessionsCommand:
+    def _make_session(self, data, expire_delta=timedelta(days=1)):
+        store = SessionStore()
+        for key, value in data.items():
+            store[key] = value
+        store.create()
+        Session.objects.filter(session_key=store.session_key).update(expire_date=timezone.now() + expire_delta)
+        return store.session_key
+
+    def test_purge_expired_only_by_default(self):
+        self._make_session({'invitation_id': 1}, expire_delta=timedelta(days=-1))
+        self._make_session({'invitation_id': 2})
+
+        out = StringIO()
+        call_command('purge_guest_sessions', stdout=out)
+
+        assert Session.objects.count() == 1
+        assert 'Deleted 1 sessions' in out.getvalue()
+
+    def test_purge_guest_sessions_keeps_admin_logins(self):
+        self._make_session({'invitation_id': 1})
+        self._make_session({'invitation_id': 2})
+        admin_key = self._make_session({'_auth_user_id': '1'})
+
+        call_command('purge_guest_sessions', '--guests', '--batch-size', '1', stdout=StringIO())
+
+        assert list(Session.objects.values_list('session_key', flat=True)) == [admin_key]
+
+    def test_dry_run_deletes_nothing(self):
+        self._make_session({'invitation_id': 1}, expire_delta=timedelta(days=-1))
+        self._make_session({'invitation_id': 2})
+
+        out = StringIO()
+        call_command('purge_guest_sessions', '--guests', '--dry-run', stdout=out)
+
+        assert Session.objects.count() == 2
+        assert 'Would delete 2 sessions' in out.getvalue()
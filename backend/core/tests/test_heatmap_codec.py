@@ -0,0 +1,87 @@
+import importlib
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from core import heatmap_codec
+from core.models import Invitation, GuestHeatmap
+from core.serializers import GuestHeatmapSerializer
+
+
+class TestHeatmapCodec:
+    def test_roundtrip_dict_points(self):
+        points = [{'x': 100, 'y': 200, 't': 1760000000000 + i * 100} for i in range(50)]
+        blob = heatmap_codec.encode(points)
+        assert heatmap_codec.decode(blob) == points
+        assert len(blob) < len(json.dumps(points)) / 5
+
+    def test_roundtrip_list_points(self):
+        points = [[10, 20, 1], [15, 25, 1], [14, 19, 7]]
+        assert heatmap_codec.decode(heatmap_codec.encode(points)) == points
+
+    def test_large_jumps_use_wide_coordinates(self):
+        points = [[0, 0, 0], [40000, 90000, 10], [-5, 3, 20]]
+        assert heatmap_codec.decode(heatmap_codec.encode(points)) == points
+
+    @pytest.mark.parametrize('points', [
+        [],
+        [{'x': 1.5, 'y': 2, 't': 3}],
+        [{'x': 1, 'y': 2, 't': 3, 'extra': True}],
+        [[1, 2, 10], [1, 2, 5]],  # tempo non monotono
+        [[1, 2]],
+        ['not-a-point'],
+    ])
+    def test_unsupported_points_are_not_packed(self, points):
+        assert heatmap_codec.encode(points) is None
+
+    def test_decode_rejects_foreign_bytes(self):
+        with pytest.raises(ValueError):
+            heatmap_codec.decode(b'{"x": 1}')
+
+    def test_migration_keeps_a_frozen_v1_codec(self):
+        """La migrazione 0029 non importa il codec vivo ma ne legge i blob v1."""
+        migration = importlib.import_module('core.migrations.0029_guestheatmap_mouse_blob')
+        assert not hasattr(migration, 'heatmap_codec')
+        for points in ([{'x': 1, 'y': 2, 't': 3}, {'x': 40000, 'y': -9, 't': 9}], [[10, 20, 1], [15, 25, 1]]):
+            assert migration.encode(points) == heatmap_codec.encode(points)
+            assert migration.decode(heatmap_codec.encode(points)) == points
+        assert migration.encode([[1.5, 2, 3]]) is None
+
+
+@pytest.mark.django_db
+class TestGuestHeatmapStorage:
+    def setup_method(self):
+        self.invitation = Invitation.objects.create(name="Heat", code="heat-01")
+
+    def test_packed_storage_keeps_json_shape(self):
+        points = [{'x': 10, 'y': 20, 't': 1760000000000}, {'x': 12, 'y': 22, 't': 1760000000100}]
+        hm = GuestHeatmap.objects.create(invitation=self.invitation, session_id='s1', mouse_data=points)
+
+        stored = GuestHeatmap.objects.get(pk=hm.pk)
+        assert stored.mouse_blob is not None
+        assert stored.raw_mouse_data == []
+        assert stored.mouse_data == points
+
+    def test_unpackable_points_fall_back_to_json(self):
+        points = [{'x': 10.5, 'y': 20.25, 't': 1}]
+        hm = GuestHeatmap.objects.create(invitation=self.invitation, session_id='s1', mouse_data=points)
+
+        stored = GuestHeatmap.objects.get(pk=hm.pk)
+        assert stored.mouse_blob is None
+        assert stored.mouse_data == points
+
+    def test_serializer_exposes_mouse_data_read_only(self):
+        hm = GuestHeatmap.objects.create(invitation=self.invitation, session_id='s1', mouse_data=[[1, 2, 3]])
+
+        serializer = GuestHeatmapSerializer(hm, data={'mouse_data': [[9, 9, 9]]}, partial=True)
+        assert serializer.is_valid()
+        assert 'mouse_data' not in serializer.validated_data
+        assert GuestHeatmapSerializer(serializer.save()).data['mouse_data'] == [[1, 2, 3]]
+
+
+def test_benchmark_command_reports_size_and_throughput():
+    out = StringIO()
+    call_command('benchmark_heatmap_codec', '--points', '20', '--traces', '5', stdout=out)
+    output = out.getvalue()
+    assert 'Binary size' in output
+    assert 'Binary decode' in output
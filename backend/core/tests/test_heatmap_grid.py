@@ -0,0 +1,78 @@
+import pytest
+from core import heatmap_grid
+from core.models import Invitation, InvitationLabel, GuestHeatmap
+
+
+@pytest.mark.django_db
+class TestHeatmapDensityGrid:
+    url = '/api/admin/heatmaps/grid/'
+
+    def setup_method(self):
+        self.inv = Invitation.objects.create(name="Grid A", code="grid-a")
+        self.other = Invitation.objects.create(name="Grid B", code="grid-b")
+        # Viewport 100x100, griglia 2x2: punti nel quadrante in alto a sinistra e in basso a destra
+        GuestHeatmap.objects.create(invitation=self.inv, session_id='s1', screen_width=100, screen_height=100,
+                                    mouse_data=[{'x': 10, 'y': 10, 't': 1}, {'x': 20, 'y': 20, 't': 2}, {'x': 90, 'y': 90, 't': 3}])
+        # Viewport diverso (200x50): normalizzato, finisce in alto a destra; un punto oltre la piega
+        GuestHeatmap.objects.create(invitation=self.other, session_id='s2', screen_width=200, screen_height=50,
+                                    mouse_data=[[150, 10, 1], [150, 400, 2]])
+
+    def test_invitation_grid_is_normalized(self, client):
+        response = client.get(self.url, {'invitation': self.inv.id, 'cols': 2, 'rows': 2})
+
+        assert response.status_code == 200
+        assert response.data['grid'] == [[1.0, 0], [0, 0.5]]
+        assert response.data['max_count'] == 2
+        assert response.data['points'] == 3
+
+    def test_event_grid_normalizes_per_viewport(self, client):
+        data = client.get(self.url, {'cols': 2, 'rows': 2}).data
+
+        assert data['grid'] == [[1.0, 0.5], [0, 0.5]]
+        assert data['out_of_bounds'] == 1
+
+    def test_label_scope(self, client):
+        label = InvitationLabel.objects.create(name="Amici")
+        self.other.labels.add(label)
+
+        data = client.get(self.url, {'label': label.id, 'cols': 2, 'rows': 2}).data
+
+        assert data['points'] == 1
+        assert data['grid'] == [[0, 1.0], [0, 0]]
+
+    def test_grid_is_cached_until_new_heatmap_data(self, client, django_assert_num_queries):
+        params = {'invitation': self.inv.id, 'cols': 2, 'rows': 2}
+        client.get(self.url, params)
+        with django_assert_num_queries(0):
+            client.get(self.url, params)
+
+        GuestHeatmap.append_chunk(self.inv.id, 's1', [{'x': 90, 'y': 90, 't': 4}], 100, 100)
+
+        assert client.get(self.url, params).data['grid'] == [[1.0, 0], [0, 1.0]]
+
+    def test_invalid_parameters(self, client):
+        assert client.get(self.url, {'cols': 0}).status_code == 400
+        assert client.get(self.url, {'rows': 10000}).status_code == 400
+        assert client.get(self.url, {'invitation': 'abc'}).status_code == 400
+
+    def test_segments_without_viewport_are_excluded(self):
+        seg = GuestHeatmap(screen_width=0, screen_height=0, mouse_data=[[1, 1, 1], [2, 2, 2]])
+        result = heatmap_grid.rasterize([seg], 4, 4)
+        assert result['points'] == 0
+        assert result['out_of_bounds'] == 2
+
+    def test_malformed_points_do_not_break_the_grid(self, client):
+        # Righe salvate prima della validazione: punti troncati, interi, stringhe
+        GuestHeatmap.objects.filter(invitation=self.inv).update(
+            mouse_blob=None, raw_mouse_data=[[1], 5, 'a', {'x': 'a', 'y': 1}, [10, 10, 1]]
+        )
+
+        response = client.get(self.url, {'invitation': self.inv.id, 'cols': 2, 'rows': 2})
+
+        assert response.status_code == 200
+        assert response.data['points'] == 1
+        assert response.data['out_of_bounds'] == 4
+
+    def test_append_chunk_drops_malformed_points(self):
+        segment = GuestHeatmap.append_chunk(self.inv.id, 's9', [[1], 7, [5, 5, 1], {'x': None, 'y': 2}], 100, 100)
+        assert segment.mouse_data == [[5, 5, 1]]
@@ -0,0 +1,295 @@
+import io
+import time
+import zipfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core import imports, link_tokens, search
+from core.models import ImportJob, Invitation, InvitationLabel, Person
+from core.utils import verify_whatsapp_contacts
+
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def _xlsx(rows):
+    """XLSX minimale: prima riga come shared strings, il resto inline/numerico."""
+    shared = rows[0]
+    cells = ''.join(f'<c r="{chr(65 + i)}1" t="s"><v>{i}</v></c>' for i in range(len(shared)))
+    body = [f'<row r="1">{cells}</row>']
+    for r, row in enumerate(rows[1:], start=2):
+        cells = ''.join(
+            f'<c r="{chr(65 + i)}{r}"><v>{value}</v></c>' if isinstance(value, int)
+            else f'<c r="{chr(65 + i)}{r}" t="inlineStr"><is><t>{value}</t></is></c>'
+            for i, value in enumerate(row) if value != ''
+        )
+        body.append(f'<row r="{r}">{cells}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('xl/sharedStrings.xml', f'<sst {ns}>' + ''.join(f'<si><t>{s}</t></si>' for s in shared) + '</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet {ns}><sheetData>{"".join(body)}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+class TestInvitationImport:
+    def test_csv_with_italian_headers(self, tmp_path):
+        path = _write(tmp_path, 'ospiti.csv', (
+            "Nome;Telefono;Lato;Ospiti;Etichette;Alloggio\n"
+            "Famiglia Rossi;333 123 4567;sposa;Mario Rossi, Anna Rossi;Amici;si\n"
+            "Zio Carlo;;;;Parenti, Amici;\n"
+        ))
+        stats = imports.InvitationImport(path).run()
+
+        assert stats['invitations'] == 2 and stats['guests'] == 3 and stats['error_count'] == 0
+        rossi = Invitation.objects.get(name="Famiglia Rossi")
+        assert rossi.code == "famiglia-rossi-393331234567"
+        assert rossi.phone_number == "+393331234567"
+        assert rossi.status == Invitation.Status.IMPORTED
+        assert rossi.origin == Invitation.Origin.BRIDE and rossi.accommodation_offered
+        assert sorted(str(p) for p in rossi.guests.all()) == ["Anna Rossi", "Mario Rossi"]
+        carlo = Invitation.objects.get(name="Zio Carlo")
+        assert carlo.origin == Invitation.Origin.GROOM and carlo.phone_number is None
+        assert [str(p) for p in carlo.guests.all()] == ["Zio Carlo"]
+        assert set(carlo.labels.values_list('name', flat=True)) == {"Parenti", "Amici"}
+        assert InvitationLabel.objects.count() == 2
+
+    def test_invalid_rows_are_reported_and_skipped(self, tmp_path):
+        Invitation.objects.create(name="Esistente", code="esistente", phone_number="+393330000000")
+        path = _write(tmp_path, 'ospiti.csv', (
+            "name,code,phone_number,origin\n"
+            ",,,\n"
+            ",senza-nome,,\n"
+            "Dup Phone,,3330000000,\n"
+            "Dup Code,esistente,,\n"
+            "Bad Code,not a slug,,\n"
+            "Bad Origin,,,cugini\n"
+            "Ok,,,\n"
+            "Ok,,,\n"
+        ))
+        stats = imports.InvitationImport(path).run()
+
+        assert [e['row'] for e in stats['errors']] == [3, 4, 5, 6, 7]
+        assert stats['rows'] == 7 and stats['invitations'] == 2
+        # Codici generati unici anche per nomi uguali nello stesso file
+        assert set(Invitation.objects.filter(name="Ok").values_list('code', flat=True)) == {"ok", "ok-2"}
+
+    def test_missing_name_column_fails(self, tmp_path):
+        path = _write(tmp_path, 'ospiti.csv', "telefono\n3331234567\n")
+        with pytest.raises(imports.ImportFileError):
+            imports.InvitationImport(path).run()
+
+    def test_xlsx_is_streamed(self, tmp_path):
+        path = tmp_path / 'ospiti.xlsx'
+        path.write_bytes(_xlsx([
+            ['Nome', 'Cellulare', 'Ospiti'],
+            ['Famiglia Bianchi', 3471112222, 'Luca Bianchi; Sara Bianchi'],
+            ['Famiglia Neri', '', ''],
+        ]))
+        stats = imports.InvitationImport(str(path)).run()
+
+        assert stats['invitations'] == 2
+        bianchi = Invitation.objects.get(name="Famiglia Bianchi")
+        assert bianchi.phone_number == "+393471112222"
+        assert bianchi.guests.count() == 2
+
+    def test_query_count_does_not_grow_with_rows(self, tmp_path):
+        def run(count, offset):
+            lines = ["name,phone_number,guests,labels"] + [
+                f"Famiglia {i},+39333{i:07d},Ospite{i} A; Ospite{i} B,Lotto" for i in range(offset, offset + count)
+            ]
+            path = _write(tmp_path, f'f{offset}.csv', "\n".join(lines))
+            with CaptureQueriesContext(connection) as ctx:
+                imports.InvitationImport(path, chunk_size=1000).run()
+            return len(ctx.captured_queries)
+
+        few = run(5, 0)
+        start = time.perf_counter()
+        many = run(2000, 5)
+        elapsed = time.perf_counter() - start
+
+        # Due chunk da 1000: al più il doppio delle query di un chunk da 5 righe
+        assert many <= 2 * few
+        assert Invitation.objects.count() == 2005 and Person.objects.count() == 4010
+        assert elapsed < 10  # nell'ordine dei secondi anche su CI lente
+
+    def test_indexes_see_imported_invitations(self, tmp_path):
+        assert search.search_invitations("gianni") == []
+        path = _write(tmp_path, 'ospiti.csv', "name,guests\nFamiglia Verdi,Gianni Verdi\n")
+        imports.InvitationImport(path).run()
+
+        invitation = Invitation.objects.get()
+        assert search.search_invitations("gianni")[0]['id'] == invitation.id
+        assert link_tokens.CODE_INDEX.lookup(invitation.code) == (invitation.id, Invitation.Status.IMPORTED)
+
+
+@pytest.mark.django_db
+class TestImportEndpoint:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def test_upload_queues_job_for_worker(self):
+        upload = SimpleUploadedFile('ospiti.csv', b"name,phone_number\nFamiglia Rossi,3331234567\n,\nX,,\n")
+        response = self.client.post('/api/admin/invitations/import/', {'file': upload, 'origin': 'bride'})
+
+        assert response.status_code == 202
+        assert response.data['status'] == 'queued'
+        assert not Invitation.objects.exists()
+
+        assert imports.run_pending() == 1
+        job = self.client.get(f"/api/admin/invitations/import/{response.data['job_id']}/")
+        assert job.status_code == 200
+        assert job.data['status'] == 'completed'
+        assert (job.data['rows'], job.data['invitations'], job.data['error_count']) == (2, 2, 0)
+        assert set(Invitation.objects.values_list('origin', flat=True)) == {Invitation.Origin.BRIDE}
+        assert ImportJob.objects.get().source is None
+
+    def test_bad_file_marks_job_failed(self):
+        upload = SimpleUploadedFile('ospiti.xlsx', b"not a zip")
+        response = self.client.post('/api/admin/invitations/import/', {'file': upload})
+        assert response.status_code == 202
+        imports.run_pending()
+        data = self.client.get(f"/api/admin/invitations/import/{response.data['job_id']}/").data
+        assert data['status'] == 'failed'
+        assert 'Invalid XLSX' in data['error']
+
+    def test_validation(self):
+        url = '/api/admin/invitations/import/'
+        assert self.client.post(url, {}).status_code == 400
+        assert self.client.post(url, {'file': SimpleUploadedFile('a.txt', b"x")}).status_code == 400
+        upload = SimpleUploadedFile('a.csv', b"name\nx\n")
+        assert self.client.post(url, {'file': upload, 'origin': 'aunt'}).status_code == 400
+        assert self.client.get(f"{url}{'0' * 32}/").status_code == 404
+
+
+@pytest.mark.django_db
+class TestImportCommandAndVerification:
+    def test_command(self, tmp_path):
+        path = _write(tmp_path, 'ospiti.csv', "name\nFamiglia Rossi\n\nFamiglia Verdi\n")
+        out = io.StringIO()
+        call_command('import_invitations', path, '--no-verify', '--origin', 'bride', stdout=out)
+
+        assert "Imported 2 invitations (2 guests), 0 rows with errors" in out.getvalue()
+        assert Invitation.objects.filter(origin=Invitation.Origin.BRIDE).count() == 2
+
+    @patch('core.utils.requests.Session')
+    def test_batched_contact_verification(self, session_cls):
+        ok = Invitation.objects.create(name="A", code="a", phone_number="+393331", origin=Invitation.Origin.BRIDE)
+        missing = Invitation.objects.create(name="B", code="b", phone_number="+393332")
+        no_phone = Invitation.objects.create(name="C", code="c")
+        http = session_cls.return_value.__enter__.return_value
+        http.get.side_effect = lambda url, timeout: MagicMock(
+            status_code=200, json=lambda: {'status': 'ok' if '/bride/' in url else 'not_exist'}
+        )
+        progress = []
+
+        assert verify_whatsapp_contacts([ok.id, missing.id, no_phone.id], batch_size=2, on_progress=progress.append) == 3
+
+        assert progress == [2, 3]
+        assert http.get.call_count == 2
+        statuses = dict(Invitation.objects.values_list('code', 'contact_verified'))
+        assert statuses == {
+            'a': Invitation.ContactVerified.OK,
+            'b': Invitation.ContactVerified.NOT_EXIST,
+            'c': Invitation.ContactVerified.NOT_VALID,
+        }
+
+
+class _WorkerKilled(BaseException):
+    """Come un SIGKILL: non è un Exception, quindi nessun handler lo intercetta."""
+
+
+@pytest.mark.django_db
+class TestImportWorker:
+    CSV = b"name,phone_number\nFamiglia Rossi,3331234567\nFamiglia Verdi,3331234568\nFamiglia Bianchi,\n"
+
+    def _submit(self, content=CSV):
+        return imports.submit(SimpleUploadedFile('ospiti.csv', content), origin=Invitation.Origin.BRIDE)
+
+    def test_interrupted_import_resumes_from_last_chunk(self, settings):
+        settings.IMPORT_CHUNK_SIZE = 1
+        job = self._submit()
+        write = imports.InvitationImport._write
+        calls = []
+
+        def killed_on_second_chunk(importer, chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise _WorkerKilled()
+            return write(importer, chunk)
+
+        with patch.object(imports.InvitationImport, '_write', killed_on_second_chunk):
+            with pytest.raises(_WorkerKilled):
+                imports.run(imports.claim_next())
+
+        job.refresh_from_db()
+        assert job.status == ImportJob.Status.RUNNING
+        assert (job.last_line, job.stats['rows'], job.stats['invitations']) == (2, 1, 1)
+        assert list(Invitation.objects.values_list('name', flat=True)) == ['Famiglia Rossi']
+
+        # Il worker riparte: il job torna in coda e riprende dalla riga 3
+        out = io.StringIO()
+        call_command('run_import_worker', '--once', stdout=out)
+
+        assert 'Requeued 1 interrupted imports' in out.getvalue()
+        job.refresh_from_db()
+        assert job.status == ImportJob.Status.COMPLETED
+        assert job.attempts == 2
+        assert (job.stats['rows'], job.stats['invitations'], job.stats['error_count']) == (3, 3, 0)
+        assert sorted(Invitation.objects.values_list('name', flat=True)) == [
+            'Famiglia Bianchi', 'Famiglia Rossi', 'Famiglia Verdi'
+        ]
+        assert sorted(job.created_ids) == sorted(Invitation.objects.values_list('id', flat=True))
+
+    def test_checkpoint_is_rolled_back_with_its_chunk(self, settings):
+        settings.IMPORT_CHUNK_SIZE = 2
+        self._submit()
+        job = imports.claim_next()
+
+        with patch.object(imports, '_update', side_effect=_WorkerKilled()):
+            with pytest.raises(_WorkerKilled):
+                imports.run(job)
+
+        # Né inviti né checkpoint: la ripresa rilegge il file dall'inizio
+        job.refresh_from_db()
+        assert (job.last_line, job.stats['rows']) == (0, 0)
+        assert not Invitation.objects.exists()
+
+    @patch('core.utils.verify_whatsapp_contacts')
+    def test_verification_resumes_after_verified_contacts(self, verify):
+        job = self._submit()
+        ImportJob.objects.filter(id=job.id).update(verify_contacts=True)
+        verify.side_effect = lambda ids, on_progress: on_progress(len(ids))
+
+        job = imports.run(imports.claim_next())
+
+        assert job.status == ImportJob.Status.COMPLETED
+        assert job.contacts_verified == 2
+        phone_ids = list(Invitation.objects.exclude(phone_number=None).order_by('id').values_list('id', flat=True))
+        assert verify.call_args.args[0] == phone_ids
+
+        # Ripresa dopo il primo contatto verificato: si verifica solo il secondo
+        ImportJob.objects.filter(id=job.id).update(status=ImportJob.Status.RUNNING, contacts_verified=1)
+        job.refresh_from_db()
+        imports._verify(job, job.created_ids)
+        assert verify.call_args.args[0] == phone_ids[1:]
+
+    def test_gives_up_after_max_attempts(self, settings):
+        settings.IMPORT_JOB_MAX_ATTEMPTS = 1
+        job = self._submit()
+        ImportJob.objects.filter(id=job.id).update(attempts=1)
+
+        job = imports.run(imports.claim_next())
+
+        assert job.status == ImportJob.Status.FAILED
+        assert job.source is None
+        assert not Invitation.objects.exists()
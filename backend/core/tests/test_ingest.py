@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch
+from core import guest_auth, ingest
+from core.models import Invitation, GuestInteraction
+
+
+@pytest.fixture
+def authed_client(api_client, invitation_factory, global_config):
+    inv = invitation_factory("ingest-test", "Ingest Test", [])
+    inv.status = Invitation.Status.SENT
+    inv.save()
+    token = inv.generate_verification_token(global_config.invitation_link_secret)
+    api_client.post('/api/public/auth/', {'code': inv.code, 'token': token})
+    api_client.invitation = inv
+    return api_client
+
+
+@pytest.mark.django_db
+class TestInteractionIngestion:
+    def test_events_are_buffered_until_flush(self, authed_client, django_assert_max_num_queries):
+        for i in range(3):
+            response = authed_client.post('/api/public/log-interaction/', {
+                'event_type': 'click_cta', 'metadata': {'button_id': f"btn-{i}"}
+            }, format='json')
+            assert response.status_code == 202
+
+        assert GuestInteraction.objects.count() == 0
+        assert len(ingest.INTERACTIONS) == 3
+
+        # lookup stati + bulk insert (+ savepoint) + transizione SENT -> READ
+        with django_assert_max_num_queries(8):
+            assert ingest.INTERACTIONS.flush() == 3
+
+        assert GuestInteraction.objects.filter(invitation=authed_client.invitation).count() == 3
+        authed_client.invitation.refresh_from_db()
+        assert authed_client.invitation.status == Invitation.Status.READ
+
+    def test_logging_request_does_not_query_db(self, settings, authed_client, django_assert_num_queries):
+        settings.GUEST_AUTH_MODE = 'signed'
+        # Client solo con cookie firmato (nessuna sessione legacy)
+        authed_client.cookies.clear()
+        authed_client.cookies['wedding_guest'] = guest_auth.issue_token(authed_client.invitation.id)
+        with django_assert_num_queries(0):
+            response = authed_client.post('/api/public/log-interaction/', {
+                'event_type': 'visit', 'metadata': {}
+            }, format='json')
+        assert response.status_code == 202
+
+    def test_invalid_events_are_rejected(self, authed_client):
+        assert authed_client.post('/api/public/log-interaction/', {'metadata': {}}, format='json').status_code == 400
+        assert authed_client.post('/api/public/log-interaction/', {
+            'event_type': 'x' * 51
+        }, format='json').status_code == 400
+        assert authed_client.post('/api/public/log-interaction/', {
+            'event_type': 'visit', 'metadata': ['not', 'a', 'dict']
+        }, format='json').status_code == 400
+        assert len(ingest.INTERACTIONS) == 0
+
+    def test_full_buffer_applies_backpressure(self, authed_client):
+        with patch.object(ingest.InteractionBuffer, 'max_size', 1):
+            first = authed_client.post('/api/public/log-interaction/', {'event_type': 'visit'}, format='json')
+            second = authed_client.post('/api/public/log-interaction/', {'event_type': 'visit'}, format='json')
+
+        assert first.status_code == 202
+        assert second.status_code == 503
+        assert second['Retry-After']
+        assert ingest.INTERACTIONS.dropped >= 1
+
+    def test_events_for_deleted_invitations_are_discarded(self, authed_client):
+        authed_client.post('/api/public/log-interaction/', {'event_type': 'visit'}, format='json')
+        authed_client.invitation.delete()
+
+        assert ingest.INTERACTIONS.flush() == 0
+        assert GuestInteraction.objects.count() == 0
+
+    def test_shutdown_hook_flushes_pending_events(self, authed_client):
+        authed_client.post('/api/public/log-interaction/', {'event_type': 'visit'}, format='json')
+
+        ingest._flush_on_shutdown()
+
+        assert GuestInteraction.objects.count() == 1
+        assert len(ingest.INTERACTIONS) == 0
+
+    def test_failed_batch_is_retried_row_by_row(self, authed_client):
+        for _ in range(2):
+            authed_client.post('/api/public/log-interaction/', {'event_type': 'visit'}, format='json')
+        ingest.INTERACTIONS.append({'invitation_id': authed_client.invitation.id, 'event_type': 'visit', 'bogus': 1})
+
+        assert ingest.INTERACTIONS.flush() == 2
+        assert GuestInteraction.objects.count() == 2
+        assert len(ingest.INTERACTIONS) == 0
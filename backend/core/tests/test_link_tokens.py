@@ -0,0 +1,94 @@
+import hashlib
+import pytest
+from core import cache as app_cache, link_tokens
+from core.models import Invitation, GlobalConfig
+
+
+@pytest.fixture
+def sent_invitation(invitation_factory, global_config):
+    inv = invitation_factory("link-test", "Link Test", [{'first_name': 'Mario'}])
+    inv.status = Invitation.Status.SENT
+    inv.save()
+    return inv
+
+
+class TestLinkTokens:
+    def test_generate_is_hmac(self):
+        token = link_tokens.generate("rossi", 7, "secret")
+        assert len(token) == link_tokens.TOKEN_LENGTH
+        assert link_tokens.verify("rossi", 7, token, ["secret"])
+        assert not link_tokens.verify("rossi", 8, token, ["secret"])
+
+    def test_legacy_token_still_valid(self):
+        legacy = hashlib.sha256(b"rossi-7" + b"secret").hexdigest()[:16]
+        assert link_tokens.verify("rossi", 7, legacy, ["secret"])
+
+    def test_previous_secret_still_valid(self):
+        token = link_tokens.generate("rossi", 7, "old-secret")
+        assert link_tokens.verify("rossi", 7, token, ["new-secret", "old-secret"])
+        assert not link_tokens.verify("rossi", 7, token, ["new-secret"])
+
+    def test_syntax_checks(self):
+        assert link_tokens.is_valid_code("famiglia-rossi")
+        assert not link_tokens.is_valid_code("../etc/passwd")
+        assert not link_tokens.is_valid_code("a" * 51)
+        assert link_tokens.is_valid_token("0123456789abcdef")
+        assert not link_tokens.is_valid_token("wrong")
+        assert not link_tokens.is_valid_token(["0123456789abcdef"])
+
+
+@pytest.mark.django_db
+class TestPublicAuthFastPaths:
+    def test_malformed_code_skips_db(self, api_client, sent_invitation, django_assert_num_queries):
+        GlobalConfig.load()  # cache calda, come in produzione
+        with django_assert_num_queries(0):
+            assert api_client.post('/api/public/auth/', {'code': 'bad code!', 'token': 'x'}).status_code == 404
+
+    def test_fresh_unknown_codes_skip_db(self, api_client, sent_invitation, global_config, django_assert_num_queries):
+        assert api_client.post('/api/public/auth/', {'code': 'warm-up', 'token': 'x'}).status_code == 404
+        # Uno scraper prova ogni volta un codice nuovo: nessuna query, nessuna voce per codice
+        with django_assert_num_queries(0):
+            for i in range(20):
+                payload = {'code': f'scraped-{i}', 'token': '0123456789abcdef'}
+                assert api_client.post('/api/public/auth/', payload).status_code == 404
+        assert link_tokens.CODE_INDEX.lookup('link-test') == (sent_invitation.id, sent_invitation.status)
+
+    def test_wrong_token_for_known_code_skips_db(self, api_client, sent_invitation, django_assert_num_queries):
+        payload = {'code': 'link-test', 'token': '0123456789abcdef'}
+        assert api_client.post('/api/public/auth/', payload).status_code == 403
+        with django_assert_num_queries(0):
+            assert api_client.post('/api/public/auth/', payload).status_code == 403
+
+    def test_index_follows_status_changes(self, api_client, sent_invitation, global_config):
+        token = sent_invitation.generate_verification_token(global_config.invitation_link_secret)
+        payload = {'code': 'link-test', 'token': token}
+        assert api_client.post('/api/public/auth/', payload).status_code == 200
+
+        sent_invitation.status = Invitation.Status.CREATED
+        sent_invitation.save()
+        assert api_client.post('/api/public/auth/', payload).status_code == 403
+
+    def test_index_survives_unrelated_invitation_saves(self, sent_invitation):
+        version = app_cache.get_version(app_cache.INVITATION_CODES)
+
+        sent_invitation.name = "Link Test Renamed"
+        sent_invitation.save()
+        sent_invitation.save(update_fields=['phone_number'])
+        assert app_cache.get_version(app_cache.INVITATION_CODES) == version
+
+        sent_invitation.code = "link-test-2"
+        sent_invitation.save(update_fields=['code'])
+        assert app_cache.get_version(app_cache.INVITATION_CODES) != version
+
+    def test_rotated_secret_keeps_old_links(self, api_client, sent_invitation, global_config):
+        old_token = sent_invitation.generate_verification_token(global_config.invitation_link_secret)
+        global_config.invitation_link_previous_secrets = global_config.invitation_link_secret
+        global_config.invitation_link_secret = "rotated-secret"
+        global_config.save()
+
+        response = api_client.post('/api/public/auth/', {'code': 'link-test', 'token': old_token})
+        assert response.status_code == 200
+
+        new_token = sent_invitation.generate_verification_token("rotated-secret")
+        response = api_client.post('/api/public/auth/', {'code': 'link-test', 'token': new_token})
+        assert response.status_code == 200
@@ -58,3 +58,40 @@ class TestGlobalConfig:
         from django.core.exceptions import ValidationError
         with pytest.raises(ValidationError):
             GlobalConfig.objects.create(price_adult_meal=200)
+
+    def test_load_is_cached_until_save(self, global_config, django_assert_num_queries):
+        """load() legge il DB una sola volta finché il record non viene salvato"""
+        GlobalConfig.load()
+        with django_assert_num_queries(0):
+            config = GlobalConfig.load()
+        assert config.invitation_link_secret == 'test-secret'
+
+        global_config.invitation_link_secret = 'rotated'
+        global_config.save()
+        assert GlobalConfig.load().invitation_link_secret == 'rotated'
+
+    def test_load_returns_isolated_copy(self, global_config):
+        """Le modifiche del chiamante non sporcano l'istanza cachata"""
+        config = GlobalConfig.load()
+        config.price_adult_meal = 999
+        assert GlobalConfig.load().price_adult_meal == 100
+
+    def test_load_without_row_returns_unsaved_defaults(self, db):
+        """Senza record ritorna i default senza scrivere sul DB"""
+        config = GlobalConfig.load()
+        assert config.pk is None
+        assert not GlobalConfig.objects.exists()
+
+    def test_room_prices_read_config_once_per_request(self, global_config, django_assert_num_queries):
+        """Con il memo per-richiesta la config non viene riletta stanza per stanza"""
+        from core import cache as app_cache
+        from core.models import Accommodation
+        acc = Accommodation.objects.create(name="Hotel", address="Via")
+        rooms = [Room.objects.create(accommodation=acc, room_number=str(i), price=100) for i in range(3)]
+
+        with app_cache.request_memo():
+            GlobalConfig.load()
+            # 2 COUNT per stanza (adulti/bambini), nessuna query sulla config
+            with django_assert_num_queries(2 * len(rooms)):
+                for room in rooms:
+                    room.adults_price()
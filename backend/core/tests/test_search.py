@@ -0,0 +1,114 @@
+import time
+import pytest
+from rest_framework.test import APIClient
+from core import cache as app_cache, search
+from core.models import Invitation, Person
+
+
+class TestRanking:
+    def _doc(self, pk, name, code, phone='', guests=()):
+        doc = search.Document(pk, (name, code, phone))
+        for first_name, last_name in guests:
+            doc.add_guest(first_name, last_name)
+        return doc
+
+    def test_prefix_beats_typo(self):
+        docs = [self._doc(1, "Famiglia Rosi", "rosi"), self._doc(2, "Famiglia Rossi", "rossi")]
+        ranked = search.rank_documents("rossi", docs)
+        assert [pk for _, pk, _ in ranked] == [2, 1]
+
+    def test_typo_and_accents_are_tolerated(self):
+        docs = [self._doc(1, "Famiglia Bianchi", "bianchi", guests=[("Niccolò", "Bianchi")])]
+        assert search.rank_documents("biancii", docs)
+        assert search.rank_documents("niccolo", docs)[0][2] == ["Niccolò Bianchi"]
+
+    def test_unrelated_documents_are_dropped(self):
+        docs = [self._doc(1, "Famiglia Verdi", "verdi")]
+        assert search.rank_documents("zanzibar", docs) == []
+        assert search.rank_documents("   ", docs) == []
+
+
+@pytest.mark.django_db
+class TestSearchAction:
+    def setup_method(self):
+        self.client = APIClient()
+        self.rossi = Invitation.objects.create(name="Famiglia Rossi", code="rossi", phone_number="+393331234567")
+        Person.objects.create(invitation=self.rossi, first_name="Mario", last_name="Rossi")
+        self.verdi = Invitation.objects.create(name="Famiglia Verdi", code="verdi")
+        Person.objects.create(invitation=self.verdi, first_name="Giulia", last_name="Bianchi")
+
+    def _search(self, q, **params):
+        response = self.client.get('/api/admin/invitations/search/', {'q': q, **params})
+        assert response.status_code == 200
+        return response.data['results']
+
+    def test_matches_invitation_fields_and_guests(self):
+        assert self._search("rossi")[0]['code'] == "rossi"
+        assert self._search("3331234")[0]['id'] == self.rossi.id
+        guest_hit = self._search("giulia")[0]
+        assert guest_hit['id'] == self.verdi.id
+        assert guest_hit['matched_guests'] == ["Giulia Bianchi"]
+
+    def test_typo_tolerant_ranked_results(self):
+        results = self._search("famiglia rosi")
+        assert [r['code'] for r in results][:2] == ["rossi", "verdi"]
+        assert results[0]['score'] > results[1]['score']
+
+    def test_index_follows_model_changes(self):
+        assert self._search("gianni") == []
+
+        Person.objects.create(invitation=self.verdi, first_name="Gianni", last_name="Verdi")
+        assert self._search("gianni")[0]['id'] == self.verdi.id
+
+        self.verdi.delete()
+        assert self._search("gianni") == []
+
+    def test_limit_and_validation(self):
+        assert len(self._search("famiglia", limit=1)) == 1
+        response = self.client.get('/api/admin/invitations/search/', {'q': 'x', 'limit': 'many'})
+        assert response.status_code == 400
+        assert self.client.get('/api/admin/invitations/search/').status_code == 400
+
+    def test_type_ahead_latency_at_thousands_of_guests(self):
+        invitations = Invitation.objects.bulk_create([
+            Invitation(name=f"Famiglia {i:04d}", code=f"fam-{i:04d}") for i in range(1000)
+        ])
+        Person.objects.bulk_create([
+            Person(invitation=inv, first_name=name, last_name=f"Cognome{inv.id}")
+            for inv in invitations for name in ("Luca", "Sara", "Paolo")
+        ])
+        search.search_invitations("luca")  # costruzione indice
+
+        start = time.perf_counter()
+        results = search.search_invitations("paol")
+        elapsed = time.perf_counter() - start
+
+        assert len(results) == search.DEFAULT_LIMIT
+        assert elapsed < 0.5  # margine ampio per CI lente: il target è < 10 ms
+
+    def test_status_change_keeps_index(self):
+        version = app_cache.get_version(app_cache.SEARCH_INDEX)
+
+        self.rossi.status = Invitation.Status.READ
+        self.rossi.save()
+        Person.objects.filter(invitation=self.rossi).first().save(update_fields=['not_coming'])
+        assert app_cache.get_version(app_cache.SEARCH_INDEX) == version
+
+        self.rossi.name = "Famiglia Rossini"
+        self.rossi.save()
+        assert app_cache.get_version(app_cache.SEARCH_INDEX) != version
+
+    def test_rsvp_renames_are_indexed(self):
+        guest = self.verdi.guests.get()
+        assert self._search("ottavia") == []
+        session = self.client.session
+        session['invitation_id'] = self.verdi.id
+        session.save()
+
+        # Il PublicRSVPView salva con bulk_update: nessun post_save sugli ospiti
+        response = self.client.post('/api/public/rsvp/', {
+            'status': 'confirmed', 'guest_updates': {str(guest.id): {'first_name': 'Ottavia'}},
+        }, format='json')
+
+        assert response.status_code == 200
+        assert self._search("ottavia")[0]['id'] == self.verdi.id
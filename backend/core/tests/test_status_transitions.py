@@ -0,0 +1,105 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core import link_tokens, status_transitions
+from core.models import GlobalConfig, Invitation, Person, WhatsAppMessageQueue, WhatsAppTemplate
+
+
+@pytest.mark.django_db
+class TestBulkTransition:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def _create(self, count, offset=0, status=Invitation.Status.CREATED):
+        invitations = []
+        for i in range(offset, offset + count):
+            inv = Invitation.objects.create(
+                name=f"Family {i}", code=f"bulk-{i}", phone_number=f"39333{i:05d}",
+                status=status, origin=Invitation.Origin.BRIDE
+            )
+            Person.objects.create(invitation=inv, first_name="Anna", last_name=f"F{i}")
+            invitations.append(inv)
+        return invitations
+
+    def _sent_template(self, **kwargs):
+        defaults = dict(
+            name="Invito", condition=WhatsAppTemplate.Condition.STATUS_CHANGE,
+            trigger_status=Invitation.Status.SENT, content="Ciao {guest_names}: {link}", is_active=True
+        )
+        defaults.update(kwargs)
+        return WhatsAppTemplate.objects.create(**defaults)
+
+    def _bulk_send_queries(self, invitations):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/admin/invitations/bulk-send/', {
+                'invitation_ids': [inv.id for inv in invitations]
+            }, format='json')
+        assert response.status_code == 200
+        return len(ctx.captured_queries)
+
+    def test_statement_count_does_not_grow_with_batch(self, global_config):
+        self._sent_template()
+        GlobalConfig.load()  # config già in cache come in produzione
+        few = self._bulk_send_queries(self._create(2))
+        many = self._bulk_send_queries(self._create(30, offset=2))
+
+        assert many == few
+        assert WhatsAppMessageQueue.objects.count() == 32
+        assert Invitation.objects.filter(status=Invitation.Status.SENT).count() == 32
+
+    def test_messages_match_single_save_path(self, global_config):
+        self._sent_template()
+        bulk_inv, = self._create(1)
+        single_inv, = self._create(1, offset=1)
+
+        status_transitions.bulk_transition([bulk_inv.id], Invitation.Status.SENT)
+        single_inv.status = Invitation.Status.SENT
+        single_inv.save()
+
+        bulk_msg, single_msg = WhatsAppMessageQueue.objects.order_by('id')
+        assert bulk_msg.message_body.startswith("Ciao Anna F0: http")
+        assert f"code={bulk_inv.code}" in bulk_msg.message_body
+        assert single_msg.message_body.startswith("Ciao Anna F1: http")
+        assert (bulk_msg.session_type, bulk_msg.recipient_number) == ('bride', bulk_inv.phone_number)
+        assert (single_msg.session_type, single_msg.recipient_number) == ('bride', single_inv.phone_number)
+
+    def test_unchanged_invitations_are_left_alone(self, global_config):
+        self._sent_template()
+        already_sent, = self._create(1, status=Invitation.Status.SENT)
+        fresh, = self._create(1, offset=1)
+
+        previous = status_transitions.bulk_transition([already_sent.id, fresh.id], Invitation.Status.SENT)
+
+        assert previous == {already_sent.id: Invitation.Status.SENT, fresh.id: Invitation.Status.CREATED}
+        assert WhatsAppMessageQueue.objects.get().recipient_number == fresh.phone_number
+
+    def test_spouse_template_without_phone(self, global_config):
+        self._sent_template(recipient=WhatsAppTemplate.Recipient.SPOUSE)
+        self._sent_template(name="Ospite")
+        inv = Invitation.objects.create(name="No Phone", code="nophone")
+
+        status_transitions.bulk_transition([inv.id], Invitation.Status.SENT)
+
+        assert list(WhatsAppMessageQueue.objects.values_list('recipient_number', flat=True)) == ['spouse']
+
+    def test_code_index_sees_new_status(self, global_config):
+        inv, = self._create(1)
+        assert link_tokens.CODE_INDEX.lookup(inv.code) == (inv.id, Invitation.Status.CREATED)
+
+        status_transitions.bulk_transition([inv.id], Invitation.Status.SENT)
+
+        assert link_tokens.CODE_INDEX.lookup(inv.code) == (inv.id, Invitation.Status.SENT)
+
+    def test_without_saved_config_no_message_is_signed(self):
+        # load() ritorna i default non salvati: niente link con il secret di default
+        self._sent_template()
+        bulk_inv, = self._create(1)
+        single_inv, = self._create(1, offset=1)
+
+        status_transitions.bulk_transition([bulk_inv.id], Invitation.Status.SENT)
+        single_inv.status = Invitation.Status.SENT
+        single_inv.save()
+
+        assert not WhatsAppMessageQueue.objects.exists()
+        assert Invitation.objects.filter(status=Invitation.Status.SENT).count() == 2
@@ -2,8 +2,10 @@ import pytest
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.db import IntegrityError
-from core.models import Invitation, GlobalConfig, Person, Accommodation, Room, WhatsAppSessionStatus, GuestHeatmap
+from core.models import Invitation, GlobalConfig, Person, Accommodation, Room, WhatsAppSessionStatus, GuestHeatmap, GuestInteraction, RSVPIdempotencyRecord
 from unittest.mock import patch
+from core import preload
+from core.idempotency import RSVPIdempotency
 import os
 
 
@@ -114,6 +116,141 @@ class TestPublicRSVPView:
         
         assert self.p2.not_coming is True
 
+    def test_rsvp_reintegrates_and_syncs_dietary_label_once(self):
+        data = {
+            'status': 'confirmed',
+            'guest_updates': {str(self.p2.id): {'dietary_requirements': 'Celiachia'}},
+            'excluded_guests': [],
+        }
+        response = self.client.post('/api/public/rsvp/', data, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert self.invitation.labels.filter(name="Intolleranze").exists()
+        self.p1.refresh_from_db()
+        assert self.p1.not_coming is False
+
+        data['guest_updates'] = {
+            str(self.p1.id): {'dietary_requirements': ''},
+            str(self.p2.id): {'dietary_requirements': ''},
+        }
+        calls = []
+        original = Invitation.sync_dietary_label
+
+        def spy(invitation, *args, **kwargs):
+            calls.append(kwargs)
+            return original(invitation, *args, **kwargs)
+
+        with patch.object(Invitation, 'sync_dietary_label', spy):
+            self.client.post('/api/public/rsvp/', data, format='json')
+        assert calls == [{'has_dietary': False}]
+        assert not self.invitation.labels.filter(name="Intolleranze").exists()
+
+    def _rsvp(self, data, capture, **extra):
+        with capture(execute=True):
+            return self.client.post('/api/public/rsvp/', data, format='json', **extra)
+
+    def test_rsvp_replay_by_fingerprint_skips_lock_and_writes(self, django_capture_on_commit_callbacks, django_assert_max_num_queries):
+        data = {'status': 'confirmed', 'excluded_guests': []}
+        first = self._rsvp(data, django_capture_on_commit_callbacks)
+        assert first.status_code == 200
+
+        with django_assert_max_num_queries(2):  # solo lettura sessione (nessun lock/scrittura)
+            replay = self._rsvp(data, django_capture_on_commit_callbacks)
+
+        assert replay.status_code == 200
+        assert replay.data == first.data
+        assert replay['Idempotent-Replayed'] == 'true'
+        assert GuestInteraction.objects.filter(invitation=self.invitation, event_type='rsvp_submit').count() == 1
+
+    def test_changed_answer_is_not_deduplicated(self, django_capture_on_commit_callbacks):
+        confirm = {'status': 'confirmed', 'excluded_guests': []}
+        decline = {'status': 'declined', 'excluded_guests': []}
+        for payload in (confirm, decline, confirm):
+            response = self._rsvp(payload, django_capture_on_commit_callbacks)
+            assert not response.has_header('Idempotent-Replayed')
+
+        self.invitation.refresh_from_db()
+        assert self.invitation.status == 'confirmed'
+        assert GuestInteraction.objects.filter(invitation=self.invitation, event_type='rsvp_submit').count() == 3
+
+    def test_rsvp_replay_by_idempotency_key(self, django_capture_on_commit_callbacks):
+        first = self._rsvp({'status': 'confirmed'}, django_capture_on_commit_callbacks, HTTP_IDEMPOTENCY_KEY='wizard-1')
+        replay = self._rsvp({'status': 'confirmed'}, django_capture_on_commit_callbacks, HTTP_IDEMPOTENCY_KEY='wizard-1')
+
+        assert replay['Idempotent-Replayed'] == 'true'
+        assert replay.data == first.data
+
+    def test_idempotency_key_reused_with_other_payload_is_rejected(self, django_capture_on_commit_callbacks):
+        self._rsvp({'status': 'confirmed'}, django_capture_on_commit_callbacks, HTTP_IDEMPOTENCY_KEY='wizard-1')
+        # Stessa chiave, payload diverso: errore del client, nessuna scrittura
+        reused = self._rsvp({'status': 'declined'}, django_capture_on_commit_callbacks, HTTP_IDEMPOTENCY_KEY='wizard-1')
+
+        assert reused.status_code == 422
+        assert not reused.has_header('Idempotent-Replayed')
+        self.invitation.refresh_from_db()
+        assert self.invitation.status == 'confirmed'
+
+    def test_duplicate_waiting_on_the_lock_is_replayed(self):
+        # A e B con la stessa chiave: B supera il controllo senza lock prima che A
+        # scriva, poi A applica l'RSVP mentre B aspetta su select_for_update
+        data = {'status': 'confirmed', 'excluded_guests': []}
+        real_replay = RSVPIdempotency.replay
+        responses = []
+
+        def replay(dedup):
+            if not responses:
+                responses.append(None)
+                responses.append(self.client.post('/api/public/rsvp/', data, format='json', HTTP_IDEMPOTENCY_KEY='tap'))
+                return None
+            return real_replay(dedup)
+
+        with patch.object(RSVPIdempotency, 'replay', replay):
+            second = self.client.post('/api/public/rsvp/', data, format='json', HTTP_IDEMPOTENCY_KEY='tap')
+
+        first = responses[1]
+        assert first.status_code == second.status_code == 200
+        assert not first.has_header('Idempotent-Replayed')
+        assert second['Idempotent-Replayed'] == 'true'
+        assert GuestInteraction.objects.filter(invitation=self.invitation, event_type='rsvp_submit').count() == 1
+
+    def test_expired_outcome_is_not_replayed(self, settings):
+        settings.RSVP_IDEMPOTENCY_TTL = 0
+        data = {'status': 'confirmed', 'excluded_guests': []}
+        self.client.post('/api/public/rsvp/', data, format='json', HTTP_IDEMPOTENCY_KEY='old')
+        again = self.client.post('/api/public/rsvp/', data, format='json', HTTP_IDEMPOTENCY_KEY='old')
+
+        assert not again.has_header('Idempotent-Replayed')
+        # Il record scaduto viene sostituito: uno per chiave, più l'ultimo RSVP
+        assert RSVPIdempotencyRecord.objects.filter(invitation=self.invitation).count() == 2
+
+    def test_failed_rsvp_is_not_stored(self, django_capture_on_commit_callbacks):
+        bad = self._rsvp({'status': 'maybe'}, django_capture_on_commit_callbacks)
+        again = self._rsvp({'status': 'maybe'}, django_capture_on_commit_callbacks)
+        assert bad.status_code == again.status_code == 400
+        assert not again.has_header('Idempotent-Replayed')
+
+    def test_rsvp_query_count_is_flat_in_guest_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def run(num_guests, code):
+            inv = Invitation.objects.create(name=f"Big {num_guests}", code=code, status=Invitation.Status.SENT)
+            guests = [Person.objects.create(invitation=inv, first_name=f"G{i}") for i in range(num_guests)]
+            client = APIClient()
+            session = client.session
+            session['invitation_id'] = inv.id
+            session.save()
+            data = {
+                'status': 'confirmed',
+                'guest_updates': {str(g.id): {'first_name': f"New {g.first_name}"} for g in guests},
+                'excluded_guests': [guests[0].id],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                assert client.post('/api/public/rsvp/', data, format='json').status_code == 200
+            assert Person.objects.filter(invitation=inv, first_name__startswith="New").count() == num_guests
+            return len(ctx.captured_queries)
+
+        assert run(2, "BIG02") == run(25, "BIG25")
+
 @pytest.mark.django_db
 class TestDashboardStatsView:
     def setup_method(self):
@@ -244,18 +381,73 @@ class TestAdminGoogleFontsProxyView:
         response = self.client.get(url)
         
         assert response.status_code == status.HTTP_200_OK
-        assert "items" in response.data
-        assert isinstance(response.data["items"], list)
-        assert len(response.data["items"]) > 0
+        data = response.json()
+        assert "items" in data
+        assert isinstance(data["items"], list)
+        assert len(data["items"]) > 0
         
-        first_font = response.data["items"][0]
+        first_font = data["items"][0]
         assert "family" in first_font
         assert "category" in first_font
 
-    @patch('os.path.exists')
-    def test_get_fonts_file_not_found(self, mock_exists):
-        mock_exists.return_value = False
+    def test_get_fonts_file_not_found(self):
         url = '/api/admin/google-fonts/'
-        response = self.client.get(url)
+        with patch.object(preload.GOOGLE_FONTS, 'relative_path', 'assets/missing.json'):
+            response = self.client.get(url)
         
-        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
\ No newline at end of file
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def test_get_fonts_invalid_file(self, tmp_path):
+        broken = tmp_path / 'fontInfo.json'
+        broken.write_text('not json')
+        url = '/api/admin/google-fonts/'
+        with patch.object(preload.GOOGLE_FONTS, 'relative_path', str(broken)):
+            response = self.client.get(url)
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+@pytest.mark.django_db
+class TestHeatmapSessionAggregation:
+    def setup_method(self):
+        self.client = APIClient()
+        self.config = GlobalConfig.objects.create(invitation_link_secret="secret")
+        self.invitation = Invitation.objects.create(
+            name="Agg Fam", code="AGG01", status=Invitation.Status.SENT, origin=Invitation.Origin.GROOM
+        )
+        WhatsAppSessionStatus.objects.create(session_type='groom', state='connected')
+        token = self.invitation.generate_verification_token("secret")
+        self.client.post('/api/public/auth/', {'code': 'AGG01', 'token': token})
+
+    def _send(self, points, session_id='sess-1', width=1920, height=1080):
+        return self.client.post('/api/public/log-heatmap/', {
+            'mouse_data': points, 'screen_width': width, 'screen_height': height, 'session_id': session_id
+        }, format='json')
+
+    def test_chunks_of_same_session_are_appended_to_one_row(self):
+        for i in range(5):
+            assert self._send([{'x': i, 'y': i, 't': 1000 + i * 100}]).status_code == 200
+
+        rows = GuestHeatmap.objects.filter(invitation=self.invitation, session_id='sess-1')
+        assert rows.count() == 1
+        assert [p['x'] for p in rows.get().mouse_data] == [0, 1, 2, 3, 4]
+
+    def test_new_segment_on_viewport_change_or_full_segment(self):
+        self._send([[1, 1, 1]])
+        self._send([[2, 2, 2]], width=800)
+        with patch.object(GuestHeatmap, 'SEGMENT_MAX_POINTS', 2):
+            self._send([[3, 3, 3], [4, 4, 4]], width=800)
+
+        segments = GuestHeatmap.objects.filter(session_id='sess-1').order_by('timestamp', 'id')
+        assert [len(s.mouse_data) for s in segments] == [1, 1, 2]
+
+    def test_replay_reads_segments_in_order(self):
+        self._send([[1, 1, 1]])
+        self._send([[2, 2, 2]], width=800)
+        self._send([[9, 9, 9]], session_id='other')
+
+        response = self.client.get(f'/api/admin/invitations/{self.invitation.id}/interactions/')
+        session = next(s for s in response.data if s['session_id'] == 'sess-1')
+        assert session['heatmap']['mouse_data'] == [[1, 1, 1], [2, 2, 2]]
+
+    def test_invalid_screen_size_is_rejected(self):
+        assert self._send([[1, 1, 1]], width='wide').status_code == 400
@@ -1,7 +1,12 @@
 import pytest
-from core.models import Invitation, InvitationLabel, WhatsAppMessageQueue, Person, GuestHeatmap, GuestInteraction
-from rest_framework.test import APIClient
+from core.models import Invitation, InvitationLabel, WhatsAppMessageQueue, Person, GuestHeatmap, GuestInteraction, Accommodation, Room
+from rest_framework.test import APIClient, APIRequestFactory
+from core.pagination import InvitationCursorPagination
+from core.views import InvitationViewSet
+from rest_framework.request import Request
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
 
 @pytest.mark.django_db
@@ -291,6 +296,109 @@ class TestInvitationViewSetWithLabels:
         assert len(inv_data['labels']) == 1
         assert inv_data['labels'][0]['name'] == 'TestLabel'
 
+@pytest.mark.django_db
+class TestInvitationListQueryBudget:
+    def setup_method(self):
+        self.client = APIClient()
+        self.label = InvitationLabel.objects.create(name="Budget")
+        self.accommodation = Accommodation.objects.create(name="Hotel", address="Via Roma 1")
+        self.room = Room.objects.create(accommodation=self.accommodation, room_number="101", capacity_adults=4)
+
+    def _create_invitations(self, count, offset=0):
+        for i in range(offset, offset + count):
+            invitation = Invitation.objects.create(name=f"Family {i}", code=f"budget-{i}", accommodation=self.accommodation)
+            invitation.labels.add(self.label)
+            Person.objects.create(invitation=invitation, first_name="A", assigned_room=self.room)
+            Person.objects.create(invitation=invitation, first_name="B")
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/admin/invitations/')
+        assert response.status_code == 200
+        return len(ctx.captured_queries), response.data
+
+    def test_query_count_is_constant(self):
+        self._create_invitations(2)
+        few_queries, _ = self._list_queries()
+
+        self._create_invitations(20, offset=2)
+        many_queries, data = self._list_queries()
+
+        assert len(data) == 22
+        assert many_queries == few_queries
+        # inviti + guests (con stanze) + labels
+        assert many_queries <= 3
+
+    def test_annotated_fields_match_relations(self):
+        self._create_invitations(1)
+
+        response = self.client.get('/api/admin/invitations/', {'label': self.label.id})
+
+        inv = response.data[0]
+        assert inv['guests_count'] == 2
+        assert inv['accommodation_name'] == "Hotel"
+        assert inv['labels'][0]['name'] == "Budget"
+        assert sorted(g['assigned_room_number'] or '' for g in inv['guests']) == ['', '101']
+
+@pytest.mark.django_db
+class TestInvitationListPaginationAndFields:
+    def setup_method(self):
+        self.client = APIClient()
+        for i in range(5):
+            inv = Invitation.objects.create(name=f"Family {i}", code=f"page-{i}", status=Invitation.Status.SENT if i % 2 else Invitation.Status.CREATED)
+            Person.objects.create(invitation=inv, first_name="Guest")
+
+    def test_list_without_params_is_not_paginated(self):
+        response = self.client.get('/api/admin/invitations/')
+        assert isinstance(response.data, list)
+        assert len(response.data) == 5
+
+    def test_cursor_walks_every_invitation_once(self):
+        seen = []
+        url = '/api/admin/invitations/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == 200
+            assert len(response.data['results']) <= 2
+            seen.extend(inv['code'] for inv in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Invitation.objects.order_by('-created_at', 'id').values_list('code', flat=True))
+        assert seen == expected
+
+    def test_cursor_on_repeated_values_is_total(self):
+        for ordering in ('status', '-name'):
+            seen = []
+            url = f'/api/admin/invitations/?page_size=2&ordering={ordering}'
+            while url:
+                response = self.client.get(url)
+                seen.extend(inv['code'] for inv in response.data['results'])
+                url = response.data['next']
+
+            expected = list(Invitation.objects.order_by(ordering, 'id').values_list('code', flat=True))
+            assert seen == expected
+
+        view = InvitationViewSet()
+        request = Request(APIRequestFactory().get('/', {'ordering': 'status'}))
+        assert InvitationCursorPagination().get_ordering(request, Invitation.objects.all(), view) == ('status', 'id')
+
+    def test_sparse_fields_skip_relations(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/admin/invitations/', {
+                'fields': 'id,name,status,guests_count', 'page_size': 10, 'status': 'sent'
+            })
+
+        results = response.data['results']
+        assert len(results) == 2
+        assert set(results[0]) == {'id', 'name', 'status', 'guests_count'}
+        assert results[0]['guests_count'] == 1
+        # Nessun prefetch di guests/labels: solo la query della pagina
+        assert len(ctx.captured_queries) == 1
+
+    def test_sparse_fields_combined_with_search(self):
+        response = self.client.get('/api/admin/invitations/', {'fields': 'code,unknown', 'search': 'page-3'})
+        assert response.data == [{'code': 'page-3'}]
+
 @pytest.mark.django_db
 class TestInvitationViewSetExtraActions:
     def setup_method(self):
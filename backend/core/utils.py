@@ -2,6 +2,7 @@ import logging
 import time
 import requests
 import os
+from collections import defaultdict
 from django.conf import settings
 from .models import Invitation, GlobalConfig
 
@@ -24,45 +25,74 @@ def verify_whatsapp_contact_task(invitation_id):
         invitation.save(update_fields=['contact_verified'])
         return
 
+    status = _contact_status(requests, phone_number, invitation.origin)
+
+    # Aggiorna stato (senza triggerare nuovi segnali ricorsivi se possibile)
+    invitation.contact_verified = status
+    invitation.save(update_fields=['contact_verified'])
+    logger.info(f"✅ Contact verification result for {invitation.code}: {status}")
+
+
+def _contact_status(http, phone_number, origin):
+    """Chiede al servizio di integrazione lo stato WhatsApp del numero. `http`: requests o una Session."""
     # Determina sessione (groom/bride)
-    session = 'groom' if invitation.origin == Invitation.Origin.GROOM else 'bride'
-    
+    session = 'groom' if origin == Invitation.Origin.GROOM else 'bride'
+
     # URL del servizio di integrazione (Internal Docker Network)
     # Default to http://whatsapp-integration:3000 if not set
     integration_base_url = os.environ.get('WHATSAPP_INTEGRATION_URL', 'http://whatsapp-integration:3000')
-    
+
     # Costruzione URL RESTful: /:session/:phone/check
     integration_url = f"{integration_base_url}/{session}/{phone_number}/check"
-    
+
     logger.info(f"🔍 VERIFYING CONTACT {phone_number} on session {session} via {integration_url}...")
-    
+
     try:
-        response = requests.get(integration_url, timeout=10)
-        
+        response = http.get(integration_url, timeout=10)
+
         if response.status_code == 200:
             data = response.json()
             status_str = data.get('status')
-            
+
             # Map response status to Enum
             if status_str == 'ok':
-                status = Invitation.ContactVerified.OK
+                return Invitation.ContactVerified.OK
             elif status_str == 'not_present':
-                status = Invitation.ContactVerified.NOT_PRESENT
+                return Invitation.ContactVerified.NOT_PRESENT
             elif status_str == 'not_exist':
-                status = Invitation.ContactVerified.NOT_EXIST
-            else:
-                status = Invitation.ContactVerified.NOT_VALID
-                logger.warning(f"Unknown verification status received: {status_str}")
-                
+                return Invitation.ContactVerified.NOT_EXIST
+            logger.warning(f"Unknown verification status received: {status_str}")
         else:
             logger.error(f"Integration service error: {response.status_code} - {response.text}")
-            status = Invitation.ContactVerified.NOT_VALID
-             
+
     except Exception as e:
         logger.error(f"Error calling verification service: {e}")
-        status = Invitation.ContactVerified.NOT_VALID
+    return Invitation.ContactVerified.NOT_VALID
 
-    # Aggiorna stato (senza triggerare nuovi segnali ricorsivi se possibile)
-    invitation.contact_verified = status
-    invitation.save(update_fields=['contact_verified'])
-    logger.info(f"✅ Contact verification result for {invitation.code}: {status}")
+
+def verify_whatsapp_contacts(invitation_ids, batch_size=50, on_progress=None):
+    """
+    Verifica in batch i contatti di molti inviti (es. dopo un import massivo).
+    Per batch: una SELECT, le chiamate HTTP su una Session keep-alive e un
+    UPDATE per esito. update() non emette post_save, quindi nessun loop con
+    il signal di verifica. Ritorna il numero di inviti verificati.
+    """
+    invitation_ids = list(invitation_ids)
+    verified = 0
+    with requests.Session() as http:
+        for start in range(0, len(invitation_ids), batch_size):
+            batch = invitation_ids[start:start + batch_size]
+            by_status = defaultdict(list)
+            rows = Invitation.objects.filter(id__in=batch).values_list('id', 'phone_number', 'origin')
+            for pk, phone_number, origin in rows:
+                if phone_number:
+                    by_status[_contact_status(http, phone_number, origin)].append(pk)
+                else:
+                    by_status[Invitation.ContactVerified.NOT_VALID].append(pk)
+            for status, pks in by_status.items():
+                Invitation.objects.filter(id__in=pks).update(contact_verified=status)
+            verified += len(batch)
+            if on_progress:
+                on_progress(verified)
+    logger.info(f"✅ Batch contact verification completed for {verified} invitations")
+    return verified
@@ -2,10 +2,17 @@ from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
-from django.db.models import F, Sum, Count, Q, Min, OuterRef, Subquery
-from django.contrib.sessions.models import Session
+from django.db.models import F, Sum, Count, Q, Min, OuterRef, Subquery, Prefetch
 from django.db import transaction
 from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils import timezone
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 from .models import (
     Invitation, GlobalConfig, Person, Accommodation, Room, 
     GuestInteraction, GuestHeatmap, WhatsAppTemplate,
@@ -16,8 +23,26 @@ from .serializers import (
     AccommodationSerializer, PublicInvitationSerializer, WhatsAppTemplateSerializer,
     ConfigurableTextSerializer, InvitationLabelSerializer
 )
-from .models import Supplier, SupplierType
+from .models import Supplier, SupplierType, AssignmentJob
 from .serializers import SupplierSerializer, SupplierTypeSerializer
+from .serializers import AssignmentJobSerializer, AssignmentJobSummarySerializer
+from . import cache as app_cache
+from . import preload
+from . import guest_auth
+from . import link_tokens
+from . import ingest
+from . import heatmap_grid
+from . import idempotency
+from . import status_transitions
+from . import search
+from . import imports
+from . import exports
+from . import assignment
+from . import assignment_jobs
+from .guest_auth import GuestAuthMixin
+from .pagination import InvitationCursorPagination
+from .idempotency import RSVPIdempotency
+import hashlib
 import logging
 import os
 import json
@@ -31,93 +56,164 @@ logger = logging.getLogger(__name__)
 class PublicLanguagesView(APIView):
     """
     Endpoint pubblico per recuperare le lingue disponibili.
-    Legge dal file generato automaticamente 'core/fixtures/languages.json'.
+    Serve il file generato automaticamente 'core/fixtures/languages.json',
+    pre-caricato all'avvio (vedi core.preload) e ricaricato se rigenerato.
     """
     def get(self, request):
-        fixture_path = os.path.join(settings.BASE_DIR, 'core/fixtures/languages.json')
-        try:
-            if os.path.exists(fixture_path):
-                with open(fixture_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return Response(data)
-            else:
-                # Fallback se il file non è stato generato
-                return Response([
-                    {"code": "it", "label": "Italiano", "flag": "🇮🇹"},
-                    {"code": "en", "label": "English", "flag": "🇬🇧"}
-                ])
-        except Exception as e:
-            logger.error(f"Error reading languages fixture: {e}")
-            return Response([{"code": "it", "label": "Italiano", "flag": "🇮🇹"}])
+        return preload.LANGUAGES.as_response(request)
+
+def _build_configurable_texts(lang):
+    """
+    Costruisce il dizionario testi per `lang` con una sola query.
+    Ritorna {'texts', 'etag', 'last_modified'} pronto per la cache.
+    last_modified considera anche l'ultima invalidazione del namespace: una
+    cancellazione non lascia righe con updated_at più recente.
+    """
+    rows = ConfigurableText.objects.filter(
+        language__in={'it', lang}
+    ).values_list('key', 'language', 'content', 'updated_at')
+
+    # Fallback logic: prima 'it' (default), poi override con la lingua richiesta.
+    # Se manca una chiave in 'en', si vede quella 'it'
+    base, override = {}, {}
+    last_modified = None
+    for key, language, content, updated_at in rows:
+        (base if language == 'it' else override)[key] = content
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    base.update(override)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    changed_at = app_cache.changed_at(app_cache.CONFIGURABLE_TEXTS)
+    if changed_at is not None and (last_modified is None or changed_at > last_modified):
+        last_modified = changed_at
+
+    digest = hashlib.md5(
+        json.dumps(base, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+    return {
+        'texts': base,
+        'etag': quote_etag(f"{lang}-{digest}"),
+        'last_modified': last_modified,
+    }
+
+
+def _text_language(lang):
+    """Lingua dei testi: solo quelle di preload.LANGUAGES, altrimenti 'it' (chiavi di cache limitate)."""
+    return lang if lang in preload.language_codes() else 'it'
+
+
+def _configurable_texts_payload(lang):
+    lang = _text_language(lang)
+    return app_cache.get_or_compute(
+        app_cache.CONFIGURABLE_TEXTS, lang,
+        lambda: _build_configurable_texts(lang)
+    )
+
+
+def _configurable_texts_response(request, payload, response_class):
+    """Risposta testi (o 304) con gli header di validazione del payload cachato."""
+    not_modified = get_conditional_response(
+        request, etag=payload['etag'], last_modified=payload['last_modified']
+    )
+    response = not_modified or response_class(payload['texts'])
+    response['ETag'] = payload['etag']
+    if payload['last_modified'] is not None:
+        response['Last-Modified'] = http_date(payload['last_modified'])
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 
 class PublicConfigurableTextView(APIView):
     """
     Endpoint pubblico per recuperare i testi configurati.
-    Supporta filtro lingua (?lang=en). Fallback a 'it' se non trovato.
+    Supporta filtro lingua (?lang=en). Fallback a 'it' se non trovato o se la
+    lingua non è tra preload.LANGUAGES.
+
+    Il dizionario per lingua è servito dalla cache condivisa (vedi core.cache),
+    invalidata dai signal su ConfigurableText. Risponde 304 se il client
+    invia If-None-Match / If-Modified-Since ancora validi.
     """
     def get(self, request):
-        lang = request.query_params.get('lang', 'it')
-        
-        # Recupera tutti i testi
-        texts = ConfigurableText.objects.all()
-        
-        # Costruisce dizionario con fallback logic:
-        # Prima carica 'it' (default), poi sovrascrive con la lingua richiesta
-        # Questo assicura che se manca una chiave in 'en', si veda quella 'it'
-        
-        data = {}
-        
-        # 1. Base Layer (Italiano/Default)
-        base_texts = texts.filter(language='it')
-        for t in base_texts:
-            data[t.key] = t.content
-            
-        # 2. Override Layer (Requested Language)
-        if lang != 'it':
-            lang_texts = texts.filter(language=lang)
-            for t in lang_texts:
-                data[t.key] = t.content # Override
-        
-        return Response(data)
+        payload = _configurable_texts_payload(request.query_params.get('lang', 'it'))
+        return _configurable_texts_response(request, payload, Response)
 
 class PublicInvitationAuthView(APIView):
+    # Stati in cui il link pubblico è attivo
+    ACTIVE_STATUSES = (
+        Invitation.Status.SENT, Invitation.Status.READ, Invitation.Status.CONFIRMED, Invitation.Status.DECLINED
+    )
+
     def post(self, request):
-        code = request.data.get('code')
-        token = request.data.get('token')
-        config, _ = GlobalConfig.objects.get_or_create(pk=1)
+        status_code, body, invitation = self.authenticate(request.data.get('code'), request.data.get('token'))
+        response = Response(body, status=status_code)
+        if invitation is not None:
+            guest_auth.login(request, response, invitation, request.data.get('token'))
+        return response
+
+    @classmethod
+    def authenticate(cls, code, token):
+        """
+        Verifica code/token del link pubblico. Ritorna (status, body, invitation):
+        invitation è valorizzato solo se l'accesso è consentito.
+        """
         if not code or not token:
-            return Response({'valid': False, 'message': 'Parametri mancanti'}, status=status.HTTP_400_BAD_REQUEST)
+            return status.HTTP_400_BAD_REQUEST, {'valid': False, 'message': 'Parametri mancanti'}, None
+        config = GlobalConfig.load()
+        not_found = (status.HTTP_404_NOT_FOUND, {'valid': False, 'message': config.unauthorized_message}, None)
+        forbidden = (status.HTTP_403_FORBIDDEN, {'valid': False, 'message': config.unauthorized_message}, None)
+
+        # Scarti senza query DB: codice malformato/sconosciuto, token errato, invito non attivo
+        if not link_tokens.is_valid_code(code):
+            return not_found
+        entry = link_tokens.CODE_INDEX.lookup(code)
+        if entry is None:
+            return not_found
+        invitation_id, invitation_status = entry
+        if not link_tokens.is_valid_token(token) or not link_tokens.verify(code, invitation_id, token, link_tokens.active_secrets(config)):
+            return forbidden
+        if invitation_status not in cls.ACTIVE_STATUSES:
+            return forbidden
+
         try:
-            invitation = Invitation.objects.get(code=code)
-            if not invitation.verify_token(token, config.invitation_link_secret):
-                return Response({'valid': False, 'message': config.unauthorized_message}, status=status.HTTP_403_FORBIDDEN)
-            if not invitation.status in [Invitation.Status.SENT, Invitation.Status.READ, Invitation.Status.CONFIRMED, Invitation.Status.DECLINED ]:
-                return Response({'valid': False, 'message': config.unauthorized_message}, status=status.HTTP_403_FORBIDDEN)
-            request.session['invitation_code'] = code
-            request.session['invitation_token'] = token
-            request.session['invitation_id'] = invitation.id
-            request.session.save()
-            serializer = PublicInvitationSerializer(invitation, context={'config': config})
-            return Response({'valid': True, 'invitation': serializer.data})
+            invitation = Invitation.objects.prefetch_related(
+                *PublicInvitationSerializer.PUBLIC_PREFETCH
+            ).get(id=invitation_id, code=code)
         except Invitation.DoesNotExist:
-            return Response({'valid': False, 'message': config.unauthorized_message}, status=status.HTTP_404_NOT_FOUND)
-
-class PublicRSVPView(APIView):
+            return not_found
+        # L'indice può essere indietro di un commit: lo stato reale è quello in DB
+        if invitation.status not in cls.ACTIVE_STATUSES:
+            return forbidden
+        serializer = PublicInvitationSerializer(invitation, context={'config': config})
+        return status.HTTP_200_OK, {'valid': True, 'invitation': serializer.data}, invitation
+
+class PublicRSVPView(GuestAuthMixin, APIView):
     """
     Enhanced RSVP Endpoint supporting Multi-Step Wizard payload:
     - phone_number: str (tracks old/new)
     - guest_updates: dict {guest_index: {first_name, last_name}}
     - excluded_guests: list [guest_indices] → sets Person.not_coming=True
     - travel_info: dict {transport_type, schedule, car_option, carpool_interest} → persisted to Invitation.travel_*
+    Header opzionale Idempotency-Key (vedi core/idempotency.py): i replay ricevono la risposta originale,
+    la stessa chiave con un payload diverso riceve 422.
     """
     def post(self, request):
-        invitation_id = request.session.get('invitation_id')
+        invitation_id = self.get_invitation_id(request)
         if not invitation_id:
             return Response({'success': False, 'message': 'Sessione scaduta'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Replay (doppio invio / retry): risposta originale senza lock né scritture
+        dedup = RSVPIdempotency(request, invitation_id)
+        replay = self._replay_response(dedup)
+        if replay:
+            return replay
         
         try:
             with transaction.atomic():
                 invitation = Invitation.objects.select_for_update().get(id=invitation_id)
+                # Richiesta gemella in attesa sul lock: l'altra ha già applicato l'RSVP
+                replay = self._replay_response(dedup)
+                if replay:
+                    return replay
                 
                 # Metadata logging container
                 metadata = {
@@ -142,54 +238,71 @@ class PublicRSVPView(APIView):
                     else:
                         metadata['phone_number_changed'] = False
                 
+                # Ospiti caricati una volta: diff in memoria, poi un solo bulk_update
+                guests = list(invitation.guests.all())
+                guests_by_id = {g.id: g for g in guests}
+                positions = {g.id: idx for idx, g in enumerate(guests)}
+                changed_fields = {}  # guest_id -> set(campi modificati)
+
+                def _set(guest, field, value):
+                    if getattr(guest, field) != value:
+                        setattr(guest, field, value)
+                        changed_fields.setdefault(guest.id, set()).add(field)
+
                 # 3. Apply Guest Updates (Edit Names)
                 guest_updates = request.data.get('guest_updates', {})
                 if guest_updates:
-                    guests = list(invitation.guests.all())
                     updated_guests = []
                     for guest_id_str, updates in guest_updates.items():
                         try:
                             guest_id = int(guest_id_str)
-                            # se l'idx appartiene ad una delle persone dell'invito
-                            if guest_id in [g.id for g in guests]:
-                                idx = [g.id for g in guests].index(guest_id)
-                                if 0 <= idx < len(guests):
-                                    guest = guests[idx]
-                                    old_name = f"{guest.first_name} {guest.last_name or ''}".strip()
-                                    if 'first_name' in updates:
-                                        guest.first_name = updates['first_name']
-                                    if 'last_name' in updates:
-                                        guest.last_name = updates['last_name']
-                                    if 'dietary_requirements' in updates:
-                                        guest.dietary_requirements = updates['dietary_requirements']
-                                    guest.save()
-                                    new_name = f"{guest.first_name} {guest.last_name or ''} [{guest.dietary_requirements or ''}]".strip()
-                                    updated_guests.append({'idx': idx, 'old': old_name, 'new': new_name})
-                                    logger.info(f"Guest updated: {old_name} → {new_name}")
-                        except (ValueError, IndexError) as e:
+                        except (TypeError, ValueError) as e:
                             logger.warning(f"Invalid guest update index {guest_id_str}: {e}")
+                            continue
+                        # se l'id appartiene ad una delle persone dell'invito
+                        guest = guests_by_id.get(guest_id)
+                        if guest is None or not isinstance(updates, dict):
+                            continue
+                        old_name = f"{guest.first_name} {guest.last_name or ''}".strip()
+                        for field in ('first_name', 'last_name', 'dietary_requirements'):
+                            if field in updates:
+                                _set(guest, field, updates[field])
+                        new_name = f"{guest.first_name} {guest.last_name or ''} [{guest.dietary_requirements or ''}]".strip()
+                        updated_guests.append({'idx': positions[guest_id], 'old': old_name, 'new': new_name})
+                        logger.info(f"Guest updated: {old_name} → {new_name}")
                     metadata['updated_guests'] = updated_guests
                 
                 # 4. Handle Excluded Guests (Hard Flag: not_coming=True)
                 excluded_guests = request.data.get('excluded_guests', [])
-                if excluded_guests or invitation.guests.filter(not_coming=True).exists():
-                    guests = list(invitation.guests.all())
+                if excluded_guests or any(g.not_coming for g in guests):
                     excluded_ids = []
                     for guest in guests:
                         if guest.id not in excluded_guests:
-                            if guest.not_coming == True:
-                                guest.not_coming = False
-                                guest.save()
+                            if guest.not_coming:
+                                _set(guest, 'not_coming', False)
                                 logger.info(f"Guest reintegrated (not_coming=False): {guest.first_name} {guest.last_name or ''}")
                         else:
                             # Set not_coming flag
-                            guest.not_coming = True
-                            # Clear room assignment for consistency
-                            guest.assigned_room = None
-                            guest.save()
+                            _set(guest, 'not_coming', True)
+                            # Clear room assignment for consistency (confronto sull'id: nessuna query FK)
+                            if guest.assigned_room_id is not None:
+                                guest.assigned_room = None
+                                changed_fields.setdefault(guest.id, set()).add('assigned_room')
                             excluded_ids.append(guest.id)
                             logger.info(f"Guest excluded (not_coming=True): {guest.first_name} {guest.last_name or ''}")
                     metadata['excluded_guests_ids'] = excluded_ids
+
+                if changed_fields:
+                    fields = sorted(set().union(*changed_fields.values()))
+                    Person.objects.bulk_update([guests_by_id[gid] for gid in changed_fields], fields)
+                    # ...né invalida l'indice di ricerca: i nomi rinominati vanno reindicizzati
+                    if {'first_name', 'last_name'} & set(fields):
+                        app_cache.invalidate(app_cache.SEARCH_INDEX)
+                    # bulk_update non emette post_save: etichetta intolleranze riconciliata una volta
+                    if 'dietary_requirements' in fields:
+                        invitation.sync_dietary_label(has_dietary=any(
+                            g.dietary_requirements and g.dietary_requirements.strip() for g in guests
+                        ))
                 
                 # 5. Persist Travel Info to Invitation Fields
                 travel_info = request.data.get('travel_info')
@@ -223,10 +336,13 @@ class PublicRSVPView(APIView):
                 # 7. Log Interaction with Enhanced Metadata
                 _log_interaction(request, invitation, 'rsvp_submit', metadata=metadata)
                 
-                return Response({
+                data = {
                     'success': True, 
                     'message': 'Risposta registrata con successo!'
-                })
+                }
+                # Nella transazione, prima che il lock venga rilasciato al commit
+                dedup.store(status.HTTP_200_OK, data)
+                return Response(data)
                 
         except Invitation.DoesNotExist:
             return Response({'success': False, 'message': 'Invito non trovato'}, status=status.HTTP_404_NOT_FOUND)
@@ -234,7 +350,24 @@ class PublicRSVPView(APIView):
             logger.error(f"Error processing RSVP: {e}", exc_info=True)
             return Response({'success': False, 'message': 'Errore interno. Riprova.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def _log_interaction(request, invitation, event_type, metadata=None):
+    def _replay_response(self, dedup):
+        try:
+            replay = dedup.replay()
+        except idempotency.KeyReusedError:
+            logger.warning(f"RSVP for invitation {dedup.invitation_id}: Idempotency-Key reused with a different payload")
+            return Response(
+                {'success': False, 'message': 'Idempotency-Key già usata per una risposta diversa'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if replay is None:
+            return None
+        status_code, data = replay
+        logger.info(f"RSVP replay for invitation {dedup.invitation_id}: skipped")
+        response = Response(data, status=status_code)
+        response[idempotency.REPLAY_HEADER] = 'true'
+        return response
+
+def _interaction_fields(request, event_type, metadata=None):
     user_agent = request.META.get('HTTP_USER_AGENT', '')
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
@@ -247,69 +380,158 @@ def _log_interaction(request, invitation, event_type, metadata=None):
         geo_data = metadata['geo']
         geo_country = geo_data.get('country_name') or geo_data.get('country')
         geo_city = geo_data.get('city')
-    GuestInteraction.objects.create(
-        invitation=invitation,
-        event_type=event_type,
-        ip_address=ip,
-        user_agent=user_agent,
-        device_type=device_type,
-        geo_country=geo_country,
-        geo_city=geo_city,
-        metadata=metadata or {}
-    )
+    return {
+        'event_type': event_type,
+        'ip_address': ip,
+        'user_agent': user_agent,
+        'device_type': device_type,
+        'geo_country': geo_country,
+        'geo_city': geo_city,
+        'metadata': metadata or {},
+    }
 
-def _auto_mark_as_read_if_first_visit(invitation):
+def _log_interaction(request, invitation, event_type, metadata=None):
+    GuestInteraction.objects.create(invitation=invitation, **_interaction_fields(request, event_type, metadata))
+
+def _enqueue_interaction(request, invitation_id, data):
+    """Valida l'evento e lo accoda nel buffer write-behind. Ritorna (status, body)."""
+    event_type = data.get('event_type')
+    metadata = data.get('metadata', {})
+    max_length = GuestInteraction._meta.get_field('event_type').max_length
+    if not event_type or not isinstance(event_type, str) or len(event_type) > max_length:
+        return status.HTTP_400_BAD_REQUEST, None
+    if not isinstance(metadata, dict):
+        return status.HTTP_400_BAD_REQUEST, None
+
+    event = _interaction_fields(request, event_type, metadata)
+    event['invitation_id'] = invitation_id
+    event['timestamp'] = timezone.now()
+    if not ingest.INTERACTIONS.append(event):
+        return status.HTTP_503_SERVICE_UNAVAILABLE, {"logged": False}
+    return status.HTTP_202_ACCEPTED, {"logged": True}
+
+class PublicLogInteractionView(GuestAuthMixin, APIView):
     """
-    Auto-trigger status transition sent -> read on first analytics interaction.
-    Called internally when logging 'visit' events.
+    Tracking eventi frontend (write-behind): l'evento viene validato e accodato
+    in ingest.INTERACTIONS, scritto a batch dal flusher. Risponde 202 senza DB.
     """
-    if invitation.status == Invitation.Status.SENT:
-        logger.info(f"📬 Auto-marking invitation {invitation.code} as READ (first visit detected)")
-        invitation.status = Invitation.Status.READ
-        invitation.save(update_fields=['status', 'updated_at'])
-
-class PublicLogInteractionView(APIView):
     def post(self, request):
-        invitation_id = request.session.get('invitation_id')
+        invitation_id = self.get_invitation_id(request)
         if not invitation_id: return Response(status=status.HTTP_401_UNAUTHORIZED)
-        event_type = request.data.get('event_type')
-        metadata = request.data.get('metadata', {})
-        if event_type:
-            try:
-                invitation = Invitation.objects.get(pk=invitation_id)
-                
-                # Auto-trigger mark_as_read on first visit
-                _auto_mark_as_read_if_first_visit(invitation)
-                
-                _log_interaction(request, invitation, event_type, metadata)
-                return Response({"logged": True})
-            except Invitation.DoesNotExist:
-                return Response(status=status.HTTP_404_NOT_FOUND)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
-
-class PublicLogHeatmapView(APIView):
+        status_code, body = _enqueue_interaction(request, invitation_id, request.data)
+        response = Response(body, status=status_code)
+        if status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = '5'
+        return response
+
+def _store_heatmap_chunk(invitation_id, data):
+    """Valida e salva un chunk heatmap (vedi GuestHeatmap.append_chunk). Ritorna (status, body)."""
+    mouse_data = data.get('mouse_data', [])
+    session_id = data.get('session_id', 'unknown')
+    try:
+        screen_w = int(data.get('screen_width', 0))
+        screen_h = int(data.get('screen_height', 0))
+    except (TypeError, ValueError):
+        return status.HTTP_400_BAD_REQUEST, {"logged": False}
+    if not isinstance(mouse_data, list):
+        return status.HTTP_400_BAD_REQUEST, {"logged": False}
+    # Punti malformati ([1], interi, stringhe...) scartati qui: la griglia non li vede mai
+    mouse_data = heatmap_grid.valid_points(mouse_data)
+    if not mouse_data:
+        return status.HTTP_400_BAD_REQUEST, {"logged": False}
+    try:
+        invitation = Invitation.objects.get(pk=invitation_id)
+    except Invitation.DoesNotExist:
+        return status.HTTP_404_NOT_FOUND, None
+    ingest.mark_as_read_if_first_visit(invitation)
+    GuestHeatmap.append_chunk(invitation_id, session_id, mouse_data, screen_w, screen_h)
+    return status.HTTP_200_OK, {"logged": True}
+
+class PublicLogHeatmapView(GuestAuthMixin, APIView):
     def post(self, request):
-        invitation_id = request.session.get('invitation_id')
+        invitation_id = self.get_invitation_id(request)
         if not invitation_id: return Response(status=status.HTTP_401_UNAUTHORIZED)
-        mouse_data = request.data.get('mouse_data', [])
-        screen_w = request.data.get('screen_width', 0)
-        screen_h = request.data.get('screen_height', 0)
-        session_id = request.data.get('session_id', 'unknown')
-        if mouse_data:
-            try:
-                invitation = Invitation.objects.get(pk=invitation_id)
-                _auto_mark_as_read_if_first_visit(invitation)
-                GuestHeatmap.objects.create(
-                    invitation_id=invitation_id,
-                    session_id=session_id,
-                    mouse_data=mouse_data,
-                    screen_width=screen_w,
-                    screen_height=screen_h
-                )
-                return Response({"logged": True})
-            except Invitation.DoesNotExist:
-                return Response(status=status.HTTP_404_NOT_FOUND)
-        return Response({"logged": False}, status=status.HTTP_400_BAD_REQUEST)
+        status_code, body = _store_heatmap_chunk(invitation_id, request.data)
+        return Response(body, status=status_code)
+
+
+# ========================================
+# PUBLIC API ASYNC (ASGI)
+# ========================================
+# Versioni async delle view pubbliche più colpite durante un invio massivo.
+# Instradate al posto delle APIView quando settings.ASGI_MODE è attivo
+# (wedding/asgi.py): la verifica del cookie firmato e l'accodamento eventi
+# restano nell'event loop, le parti ORM/serializer passano da sync_to_async.
+
+def _json_response(body, status_code=status.HTTP_200_OK):
+    if body is None:
+        return HttpResponse(status=status_code)
+    return JsonResponse(body, status=status_code)
+
+
+def _request_data(request):
+    """Body JSON o form come dict (come request.data di DRF); None se non valido."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+class AsyncPublicView(View):
+    """Base delle view async pubbliche: come APIView sono esenti da CSRF."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+
+class AsyncPublicConfigurableTextView(AsyncPublicView):
+    async def get(self, request):
+        payload = await sync_to_async(_configurable_texts_payload)(request.GET.get('lang', 'it'))
+        return _configurable_texts_response(request, payload, JsonResponse)
+
+
+class AsyncPublicInvitationAuthView(AsyncPublicView):
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _json_response(None, status.HTTP_400_BAD_REQUEST)
+        code, token = data.get('code'), data.get('token')
+        status_code, body, invitation = await sync_to_async(PublicInvitationAuthView.authenticate)(code, token)
+        response = _json_response(body, status_code)
+        if invitation is not None:
+            await guest_auth.alogin(request, response, invitation, token)
+        return response
+
+
+class AsyncPublicLogInteractionView(AsyncPublicView):
+    async def post(self, request):
+        invitation_id = await guest_auth.aget_invitation_id(request)
+        if not invitation_id:
+            return _json_response(None, status.HTTP_401_UNAUTHORIZED)
+        data = _request_data(request)
+        if data is None:
+            return _json_response(None, status.HTTP_400_BAD_REQUEST)
+        status_code, body = _enqueue_interaction(request, invitation_id, data)
+        response = _json_response(body, status_code)
+        if status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = '5'
+        return guest_auth.finalize(request, response)
+
+
+class AsyncPublicLogHeatmapView(AsyncPublicView):
+    async def post(self, request):
+        invitation_id = await guest_auth.aget_invitation_id(request)
+        if not invitation_id:
+            return _json_response(None, status.HTTP_401_UNAUTHORIZED)
+        data = _request_data(request)
+        if data is None:
+            return _json_response({"logged": False}, status.HTTP_400_BAD_REQUEST)
+        status_code, body = await sync_to_async(_store_heatmap_chunk)(invitation_id, data)
+        return guest_auth.finalize(request, _json_response(body, status_code))
 
 
 # ========================================
@@ -319,41 +541,73 @@ class PublicLogHeatmapView(APIView):
 class AdminGoogleFontsProxyView(APIView):
     """
     Proxy sicuro per Google Fonts → OFFLINE MODE.
-    Legge dal file statico backend/assets/fontInfo.json invece di chiamare l'API.
+    Serve il file statico backend/assets/fontInfo.json (formato Google API),
+    pre-caricato all'avvio invece di chiamare l'API o rileggerlo ad ogni richiesta.
+    """
+    def get(self, request):
+        return preload.GOOGLE_FONTS.as_response(request)
+
+class AdminHeatmapGridView(APIView):
+    """
+    Griglia di densità heatmap calcolata lato server (vedi core/heatmap_grid.py).
+    GET /api/admin/heatmaps/grid/?invitation=<id> | ?label=<id> [&cols=64&rows=36]
+    Senza filtri aggrega l'intero evento.
     """
     def get(self, request):
-        font_file_path = os.path.join(settings.BASE_DIR, 'assets', 'fontInfo.json')
-        
-        if not os.path.exists(font_file_path):
-            logger.error(f"Font info file not found at {font_file_path}")
-            return Response(
-                {'error': 'Font database not available'}, 
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-        
         try:
-            with open(font_file_path, 'r', encoding='utf-8') as f:
-                fonts_data = json.load(f)
-            
-            # Trasforma la struttura locale nel formato che il frontend si aspetta (Google API format)
-            items = []
-            for font in fonts_data:
-                items.append({
-                    'family': font.get('name'),
-                    'category': font.get('category', 'sans-serif'),
-                    'variants': font.get('variants', []),
-                    'subsets': font.get('subsets', [])
-                })
-            
-            # Restituisce nel formato Google API standard per compatibilità
-            return Response({'items': items})
-            
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error reading font info file: {e}")
-            return Response(
-                {'error': 'Failed to load font database'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            cols = int(request.query_params.get('cols', heatmap_grid.DEFAULT_COLS))
+            rows = int(request.query_params.get('rows', heatmap_grid.DEFAULT_ROWS))
+            invitation_id = request.query_params.get('invitation')
+            label_id = request.query_params.get('label')
+            invitation_id = int(invitation_id) if invitation_id else None
+            label_id = int(label_id) if label_id else None
+        except ValueError:
+            return Response({'error': 'Parametri non validi'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= cols <= heatmap_grid.MAX_RESOLUTION and 1 <= rows <= heatmap_grid.MAX_RESOLUTION):
+            return Response({'error': f'Risoluzione massima {heatmap_grid.MAX_RESOLUTION}x{heatmap_grid.MAX_RESOLUTION}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if invitation_id is not None:
+            scope, scope_id = heatmap_grid.SCOPE_INVITATION, invitation_id
+        elif label_id is not None:
+            scope, scope_id = heatmap_grid.SCOPE_LABEL, label_id
+        else:
+            scope, scope_id = heatmap_grid.SCOPE_EVENT, None
+        return Response(heatmap_grid.density_grid(scope, scope_id, cols, rows))
+
+class AdminExportView(APIView):
+    """
+    Export in streaming di inviti/ospiti/logistica (vedi core/exports.py).
+    GET /api/admin/export/?format=csv|jsonl|xlsx [&columns=invitation_code,first_name,...]
+    Filtri come la lista inviti: ?status= ?origin= ?label=
+    """
+    renderer_classes = exports.RENDERERS
+
+    def get(self, request):
+        try:
+            columns = exports.parse_columns(request.query_params.get('columns'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e), 'available_columns': list(exports.COLUMNS)}, status=400)
+
+        qs = Invitation.objects.all()
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            qs = qs.filter(status=status_filter)
+        origin_filter = request.query_params.get('origin')
+        if origin_filter:
+            qs = qs.filter(origin=origin_filter)
+        label_filter = request.query_params.get('label')
+        if label_filter:
+            qs = qs.filter(labels__id=label_filter)
+
+        renderer = request.accepted_renderer
+        stream = renderer.stream(columns, exports.iter_rows(qs, columns))
+        if settings.ASGI_MODE:
+            stream = exports.aiter_stream(stream)
+        content_type = renderer.media_type + (f'; charset={renderer.charset}' if renderer.charset else '')
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        filename = f"invitations_export_{timezone.localdate().isoformat()}.{renderer.format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 class ConfigurableTextViewSet(viewsets.ModelViewSet):
     """
@@ -392,6 +646,8 @@ class ConfigurableTextViewSet(viewsets.ModelViewSet):
         """
         key = kwargs.get('key')
         lang = request.query_params.get('lang', 'it')
+        if lang not in preload.language_codes():
+            return Response({'error': f"Unsupported language: {lang}"}, status=status.HTTP_400_BAD_REQUEST)
         partial = kwargs.pop('partial', False)
         
         instance, created = ConfigurableText.objects.get_or_create(
@@ -428,6 +684,7 @@ class InvitationLabelViewSet(viewsets.ModelViewSet):
 class InvitationViewSet(viewsets.ModelViewSet):
     """CRUD completo inviti (solo admin)"""
     queryset = Invitation.objects.all().order_by('-created_at')
+    pagination_class = InvitationCursorPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'code']
     ordering_fields = ['created_at', 'status', 'name']
@@ -443,8 +700,26 @@ class InvitationViewSet(viewsets.ModelViewSet):
         - ?status=confirmed
         - ?label=<label_id>
         - ?origin=groom|bride
+
+        La list carica relazioni e conteggio ospiti in un numero costante di
+        query (annotate + select_related + Prefetch), indipendente dal numero
+        di inviti restituiti. Con ?fields= carica solo le relazioni richieste.
         """
         qs = super().get_queryset()
+        if self.action == 'list':
+            requested = InvitationListSerializer.requested_fields(self.request)
+
+            def wanted(field):
+                return requested is None or field in requested
+
+            if wanted('accommodation_name'):
+                qs = qs.select_related('accommodation')
+            if wanted('guests_count'):
+                qs = qs.annotate(guests_count=Count('guests', distinct=True))
+            if wanted('guests'):
+                qs = qs.prefetch_related(Prefetch('guests', queryset=Person.objects.select_related('assigned_room')))
+            if wanted('labels'):
+                qs = qs.prefetch_related('labels')
         
         # Filtro per status
         status_filter = self.request.query_params.get('status')
@@ -465,9 +740,23 @@ class InvitationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def search(self, request):
+        """
+        - ?q=rossi: ricerca ranked e tollerante ai refusi su nome/codice/telefono
+          dell'invito e nome/cognome degli ospiti (vedi core.search). ?limit= max 100.
+        - ?code=...: lookup esatto del singolo invito (InvitationSerializer).
+        """
+        query = request.query_params.get('q', '').strip()
+        if query:
+            try:
+                limit = min(int(request.query_params.get('limit', search.DEFAULT_LIMIT)), search.MAX_LIMIT)
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            results = search.search_invitations(query, limit=max(limit, 1))
+            return Response({'query': query, 'results': results})
+
         code = request.query_params.get('code', None)
         if not code:
-            return Response({'error': 'Code parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'q or code parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             invitation = Invitation.objects.get(code=code)
             serializer = InvitationSerializer(invitation)
@@ -478,7 +767,7 @@ class InvitationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def generate_link(self, request, pk=None):
         invitation = self.get_object()
-        config, _ = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         token = invitation.generate_verification_token(config.invitation_link_secret)
         frontend_url = os.environ.get('FRONTEND_PUBLIC_URL', 'http://localhost')
         public_url = f"{frontend_url}?code={invitation.code}&token={token}"
@@ -497,8 +786,8 @@ class InvitationViewSet(viewsets.ModelViewSet):
         """
         Bulk mark-as-sent action.
         Body: {"invitation_ids": [1, 2, 3]}
-        Effetto: Imposta status='sent' per tutti gli inviti specificati.
-        Identico a chiamare mark-as-sent su ogni singolo invito.
+        Effetto: Imposta status='sent' per tutti gli inviti specificati, con gli
+        stessi messaggi automatici di mark-as-sent ma in un'unica transazione.
         """
         invitation_ids = request.data.get('invitation_ids', [])
         
@@ -522,13 +811,9 @@ class InvitationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Iteriamo e salviamo per scatenare i segnali (WhatsApp automation)
-        updated_count = 0
-        with transaction.atomic():
-            for invitation in invitations:
-                invitation.status = Invitation.Status.SENT
-                invitation.save()
-                updated_count += 1
+        # Un solo UPDATE + messaggi WhatsApp accodati in blocco (vedi core.status_transitions)
+        previous = status_transitions.bulk_transition(found_ids, Invitation.Status.SENT)
+        updated_count = len(previous)
         
         logger.info(f"📤 Bulk-send: {updated_count} invitations marked as SENT")
         
@@ -543,6 +828,7 @@ class InvitationViewSet(viewsets.ModelViewSet):
         Bulk handle labels action.
         Body: {"invitation_ids": [1, 2, 3], "label_ids": [1, 3], "action": 'add' | 'remove'}
         Effetto: Aggiunge o rimuove label per tutti gli inviti specificati.
+        affected_per_label riporta, per ogni label, le associazioni davvero create/rimosse.
         """
         invitation_ids = request.data.get('invitation_ids', [])
         label_ids = request.data.get('label_ids', [])
@@ -591,25 +877,49 @@ class InvitationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        updated_count = 0
-        with transaction.atomic():
-            if action_type == 'add':
-                for inv in invitations:
-                    inv.labels.add(*labels)
-                updated_count = invitations.count()
-            elif action_type == 'remove':
-                for inv in invitations:
-                    inv.labels.remove(*labels)
-                updated_count = invitations.count()
+        # Scrittura diretta sulla tabella through (vedi InvitationLabel.bulk_assign)
+        if action_type == 'add':
+            affected = InvitationLabel.bulk_assign(found_ids, found_label_ids)
+        else:
+            affected = InvitationLabel.bulk_unassign(found_ids, found_label_ids)
+        updated_count = len(found_ids)
         
-        logger.info(f"🏷️ Bulk-labels: {action_type} labels for {updated_count} invitations")
+        logger.info(f"🏷️ Bulk-labels: {action_type} labels for {updated_count} invitations ({sum(affected.values())} changes)")
         
         return Response({
             'success': True,
             'updated_count': updated_count,
+            'affected_per_label': affected,
             'message': f'Etichette aggiornate per {updated_count} inviti'
         })
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        Import massivo da CSV/XLSX (multipart: file, origin opzionale groom|bride).
+        Risponde subito 202 con job_id: l'import è eseguito dal worker run_import_worker
+        (vedi core.imports), l'avanzamento si legge da GET import/<job_id>/.
+        """
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not uploaded.name.lower().endswith(('.csv', '.xlsx')):
+            return Response({'error': 'Only .csv and .xlsx files are supported'}, status=status.HTTP_400_BAD_REQUEST)
+        origin = request.data.get('origin', Invitation.Origin.GROOM)
+        if origin not in Invitation.Origin.values:
+            return Response({'error': 'origin must be groom or bride'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = imports.submit(uploaded, origin=origin)
+        logger.info(f"📥 Import {job.id} queued for {uploaded.name}")
+        return Response({'job_id': job.id.hex, **imports.job_state(job)}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<job_id>[0-9a-f]{32})')
+    def import_status(self, request, job_id=None):
+        job = imports.get_job(job_id)
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'job_id': job_id, **job})
+
     @action(detail=True, methods=['post'], url_path='mark-as-read')
     def mark_as_read(self, request, pk=None):
         """
@@ -648,12 +958,14 @@ class InvitationViewSet(viewsets.ModelViewSet):
     def interactions(self, request, pk=None):
         invitation = self.get_object()
         interactions = GuestInteraction.objects.filter(invitation=invitation).order_by('timestamp')
-        heatmaps = GuestHeatmap.objects.filter(invitation=invitation)
+        # Segmenti già aggregati per sessione, letti in ordine dall'indice (invitation, session_id, timestamp)
+        heatmaps = GuestHeatmap.objects.filter(invitation=invitation).order_by('session_id', 'timestamp', 'id')
         sessions_map = {}
         for hm in heatmaps:
             sid = hm.session_id
             if sid not in sessions_map:
-                sessions_map[sid] = {'session_id': sid, 'start_time': hm.timestamp, 'heatmap': {'id': hm.id, 'mouse_data': hm.mouse_data, 'screen_width': hm.screen_width, 'screen_height': hm.screen_height}, 'events': [], 'device_info': 'Unknown'}
+                # Copia: mouse_data è la lista decodificata cachata sull'istanza
+                sessions_map[sid] = {'session_id': sid, 'start_time': hm.timestamp, 'heatmap': {'id': hm.id, 'mouse_data': list(hm.mouse_data), 'screen_width': hm.screen_width, 'screen_height': hm.screen_height}, 'events': [], 'device_info': 'Unknown'}
             else:
                 sessions_map[sid]['heatmap']['mouse_data'].extend(hm.mouse_data)
         for evt in interactions:
@@ -692,12 +1004,12 @@ class InvitationViewSet(viewsets.ModelViewSet):
 
 class GlobalConfigViewSet(viewsets.ViewSet):
     def list(self, request):
-        config, created = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         serializer = GlobalConfigSerializer(config)
         return Response(serializer.data)
 
     def create(self, request):
-        config, created = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         serializer = GlobalConfigSerializer(config, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -741,284 +1053,26 @@ class AccommodationViewSet(viewsets.ModelViewSet):
         2. Assignment algorithm execution
         
         Their rooms are considered occupied and unavailable for new assignments.
+
+        Le strategie girano in memoria su uno snapshot (vedi core/assignment.py):
+        la simulazione non scrive nulla, l'esecuzione salva solo il piano finale.
         """
         strategy_code = request.data.get('strategy', 'SIMULATION')
         is_simulation = strategy_code == 'SIMULATION'
-        
-        strategies = {
-            'STANDARD': {
-                'name': 'Standard (Default)',
-                'description': 'Processa prima i gruppi affini, stanze ordinate per capienza decrescente.',
-                'invitation_sort': lambda i: i.id,
-                'room_sort': lambda r: -r.total_capacity(),
-                'group_affinity': True
-            },
-            'SPACE_OPTIMIZER': {
-                'name': 'Space Optimizer (Tetris)',
-                'description': 'Priorità ai gruppi numerosi su stanze "Best Fit" (piccole ma sufficienti).',
-                'invitation_sort': lambda i: -(i.guests.filter(not_coming=False).count()),
-                'room_sort': lambda r: r.total_capacity(),
-                'group_affinity': True
-            },
-            'CHILDREN_FIRST': {
-                'name': 'Children First',
-                'description': 'Priorità alle famiglie con bambini per occupare slot specifici.',
-                'invitation_sort': lambda i: -(i.guests.filter(is_child=True, not_coming=False).count()),
-                'room_sort': lambda r: -(r.capacity_children),
-                'group_affinity': True
-            },
-            'PERFECT_MATCH': {
-                'name': 'Perfect Match Only',
-                'description': 'Cerca di riempire le stanze al 100% della capienza.',
-                'invitation_sort': lambda i: -(i.guests.filter(not_coming=False).count()),
-                'room_sort': lambda r: r.total_capacity(),
-                'group_affinity': False,
-                'perfect_match_only': True
-            },
-            'SMALLEST_FIRST': {
-                'name': 'Smallest First',
-                'description': 'Riempimento dal basso (coppie e singoli prima).',
-                'invitation_sort': lambda i: i.guests.filter(not_coming=False).count(),
-                'room_sort': lambda r: r.total_capacity(),
-                'group_affinity': False
-            },
-            'AFFINITY_CLUSTER': {
-                'name': 'Affinity Cluster',
-                'description': 'Massimizza la coesione dei gruppi affini trattandoli come blocchi unici.',
-                'invitation_sort': lambda i: -(i.guests.filter(not_coming=False).count() + sum(a.guests.filter(not_coming=False).count() for a in i.affinities.all())),
-                'room_sort': lambda r: -r.total_capacity(),
-                'group_affinity': True,
-                'force_cluster': True
-            }
-        }
-
-        def run_strategy(strategy_key, strategy_params, dry_run=True):
-            sid = transaction.savepoint()
-            
-            try:
-                # CRITICAL: Reset ONLY non-pinned invitations
-                if request.data.get('reset_previous', False):
-                    # Reset only guests belonging to NON-PINNED invitations
-                    Person.objects.filter(
-                        assigned_room__isnull=False,
-                        accommodation_pinned=False
-                    ).update(assigned_room=None)
-                    
-                    Invitation.objects.filter(
-                        accommodation__isnull=False,
-                        guests__accommodation_pinned=False
-                    ).update(accommodation=None)
-                    
-                    logger.info("🔄 Reset completed (pinned invitations preserved)")
-
-                # CRITICAL: Fetch only NON-PINNED invitations for assignment
-                invitations = list(Invitation.objects.filter(
-                    status=Invitation.Status.CONFIRMED,
-                    accommodation_requested=True,
-                    guests__accommodation_pinned=False,  # EXCLUDE PINNED
-                    guests__assigned_room__isnull=True,
-                    guests__not_coming=False
-                ).distinct().prefetch_related('guests', 'affinities', 'non_affinities'))
-
-                accommodations = list(Accommodation.objects.prefetch_related(
-                    'rooms__assigned_guests__invitation',
-                    'assigned_invitations__non_affinities'
-                ).all())
-                
-                assigned_count = 0
-                wasted_beds = 0
-                assignment_log = []
-
-                def get_room_owner(room):
-                    """
-                    CRITICAL: Query LIVE (not prefetched) to avoid stale data.
-                    Returns:
-                    - None: room is empty
-                    - int: invitation_id (single owner)
-                    - -1: multiple owners (violation, should never happen)
-                    """
-                    owner_ids = list(Person.objects.filter(
-                        assigned_room=room, 
-                        not_coming=False
-                    ).values_list('invitation_id', flat=True).distinct())
-                    
-                    if not owner_ids: 
-                        return None
-                    if len(owner_ids) > 1: 
-                        return -1  # Multi-owner violation
-                    return owner_ids[0]
-
-                def is_accommodation_compatible(acc, inv):
-                    """Check if invitation can coexist with current occupants (affinity check)"""
-                    non_affine_ids = set(inv.non_affinities.values_list('id', flat=True))
-                    existing_inv_ids = set(Person.objects.filter(
-                        assigned_room__accommodation=acc,
-                        not_coming=False
-                    ).values_list('invitation_id', flat=True))
-                    
-                    if non_affine_ids.intersection(existing_inv_ids):
-                        return False
-                    return True
-
-                def can_fit(room, person, inv_id):
-                    """Check if person can be assigned to room (capacity + ownership rules)"""
-                    owner = get_room_owner(room)
-                    if owner == -1: 
-                        return False  # Room corrupted
-                    if owner is not None and owner != inv_id: 
-                        return False  # Room owned by another invitation
-                    
-                    slots = room.available_slots()
-                    if person.is_child:
-                        return (slots['child_slots_free'] > 0) or (slots['adult_slots_free'] > 0)
-                    else:
-                        return slots['adult_slots_free'] > 0
-
-                def assign_invitation(inv, acc):
-                    """Attempt to assign all guests of invitation to accommodation (atomic)"""
-                    nonlocal assigned_count, wasted_beds
-                    
-                    if strategy_params.get('perfect_match_only', False):
-                        if acc.available_capacity() < inv.guests.filter(not_coming=False).count(): 
-                            return False
-
-                    if not is_accommodation_compatible(acc, inv): 
-                        return False
-
-                    persons = list(inv.guests.filter(assigned_room__isnull=True, not_coming=False))
-                    if not persons: 
-                        return True  # Already assigned
+        reset_previous = request.data.get('reset_previous', False)
 
-                    rooms = list(acc.rooms.all())
-                    rooms.sort(key=strategy_params['room_sort'])
+        if not is_simulation and strategy_code not in assignment.STRATEGIES:
+            return Response({'error': 'Invalid Strategy'}, status=status.HTTP_400_BAD_REQUEST)
 
-                    temp_assignments = []
-                    sid_inv = transaction.savepoint()
-                    
-                    all_assigned = True
-                    for p in persons:
-                        assigned = False
-                        for r in rooms:
-                            if can_fit(r, p, inv.id):
-                                p.assigned_room = r
-                                p.save()
-                                temp_assignments.append((p, r))
-                                assigned = True
-                                break
-                        if not assigned:
-                            all_assigned = False
-                            break
-                    
-                    if all_assigned:
-                        transaction.savepoint_commit(sid_inv)
-                        inv.accommodation = acc
-                        inv.save()
-                        assigned_count += len(temp_assignments)
-                        for p, r in temp_assignments:
-                            assignment_log.append({
-                                'person': str(p),
-                                'room': str(r),
-                                'invitation': inv.name
-                            })
-                        return True
-                    else:
-                        transaction.savepoint_rollback(sid_inv)
-                        return False
-
-                invitations.sort(key=strategy_params['invitation_sort'])
-                processed_ids = set()
-
-                for inv in invitations:
-                    if inv.id in processed_ids: 
-                        continue
-                    
-                    group = [inv]
-                    if strategy_params.get('group_affinity', True):
-                        affinities = list(inv.affinities.filter(
-                            status=Invitation.Status.CONFIRMED,
-                            accommodation_requested=True,
-                            guests__accommodation_pinned=False  # EXCLUDE PINNED from affinity groups
-                        ).exclude(id__in=processed_ids))
-                        group.extend(affinities)
-                    
-                    assigned_group = False
-                    accommodations.sort(key=lambda a: a.available_capacity(), reverse=True)
-
-                    for acc in accommodations:
-                        sid_group = transaction.savepoint()
-                        group_success = True
-                        
-                        for g_inv in group:
-                            if not assign_invitation(g_inv, acc):
-                                group_success = False
-                                break
-                        
-                        if group_success:
-                            transaction.savepoint_commit(sid_group)
-                            for g_inv in group: 
-                                processed_ids.add(g_inv.id)
-                            assigned_group = True
-                            break
-                        else:
-                            transaction.savepoint_rollback(sid_group)
-                    
-                    if not assigned_group and not strategy_params.get('force_cluster', False):
-                         for g_inv in group:
-                            if g_inv.id in processed_ids: 
-                                continue
-                            for acc in accommodations:
-                                if assign_invitation(g_inv, acc):
-                                    processed_ids.add(g_inv.id)
-                                    break
-
-                # Count unassigned (excluding pinned and not_coming)
-                unassigned_count = Person.objects.filter(
-                    invitation__status=Invitation.Status.CONFIRMED,
-                    invitation__accommodation_requested=True,
-                    accommodation_pinned=False,  # Exclude pinned
-                    assigned_room__isnull=True,
-                    not_coming=False
-                ).count()
-
-                # Calculate wasted beds (only in occupied rooms)
-                occupied_rooms = Room.objects.filter(
-                    assigned_guests__isnull=False, 
-                    assigned_guests__not_coming=False
-                ).distinct()
-                for r in occupied_rooms:
-                    slots = r.available_slots()
-                    wasted_beds += slots['total_free']
-
-                results = {
-                    'strategy_code': strategy_key,
-                    'strategy_name': strategy_params['name'],
-                    'assigned_guests': assigned_count,
-                    'unassigned_guests': unassigned_count,
-                    'wasted_beds': wasted_beds,
-                    'assignment_log': assignment_log
-                }
-
-            except Exception as e:
-                logger.error(f"Strategy {strategy_key} failed: {e}", exc_info=True)
-                results = {'error': str(e)}
-            
-            finally:
-                if dry_run:
-                    transaction.savepoint_rollback(sid)
-                else:
-                    transaction.savepoint_commit(sid)
-            
-            return results
+        snapshot = assignment.Snapshot.load()
 
         if is_simulation:
-            simulation_results = []
-            for key, params in strategies.items():
-                logger.info(f"🧪 Simulating Strategy: {key}")
-                res = run_strategy(key, params, dry_run=True)
-                simulation_results.append(res)
-            
-            simulation_results.sort(key=lambda x: (-x.get('assigned_guests', 0), x.get('wasted_beds', 9999)))
-            
+            logger.info("🧪 Simulating all strategies")
+            simulation_results = assignment.simulate(snapshot, reset_previous)
+            for result in simulation_results:
+                if 'error' in result:
+                    logger.error(f"Strategy {result['strategy_code']} failed: {result['error']}")
+
             return Response({
                 'mode': 'SIMULATION',
                 'results': simulation_results,
@@ -1026,17 +1080,91 @@ class AccommodationViewSet(viewsets.ModelViewSet):
             })
         
         else:
-            if strategy_code not in strategies:
-                return Response({'error': 'Invalid Strategy'}, status=status.HTTP_400_BAD_REQUEST)
-            
             logger.info(f"🚀 Executing Strategy: {strategy_code}")
-            result = run_strategy(strategy_code, strategies[strategy_code], dry_run=False)
+            try:
+                result, plan = assignment.run_strategy(snapshot, strategy_code, reset_previous)
+                plan.apply()
+                if reset_previous:
+                    logger.info("🔄 Reset completed (pinned invitations preserved)")
+            except Exception as e:
+                logger.error(f"Strategy {strategy_code} failed: {e}", exc_info=True)
+                result = {'error': str(e)}
             return Response({
                 'mode': 'EXECUTION',
                 'result': result
             })
 
 
+    @action(detail=False, methods=['post'], url_path='auto-assign/incremental')
+    def auto_assign_incremental(self, request):
+        """
+        Assegna solo gli inviti confermati ancora senza stanza (conferme tardive):
+        gli ospiti già in stanza, pinned o no, restano dove sono.
+
+        - dry_run: restituisce il piano senza salvarlo.
+        - max_repair_moves (default 0): quanti inviti non pinned si possono
+          spostare in altre stanze dello stesso alloggio per far posto.
+        """
+        dry_run = bool(request.data.get('dry_run', False))
+        try:
+            max_repair_moves = assignment.parse_repair_moves(request.data.get('max_repair_moves', 0))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result, plan = assignment.run_incremental(assignment.Snapshot.load(), max_repair_moves)
+        if not dry_run:
+            plan.apply()
+        logger.info(f"➕ Incremental assignment: {result['assigned_guests']} guests placed, "
+                    f"{len(result['repair_moves'])} repair moves")
+        return Response({
+            'mode': 'SIMULATION' if dry_run else 'EXECUTION',
+            'result': result
+        })
+
+
+    @action(detail=False, methods=['get', 'post'], url_path='auto-assign/jobs')
+    def auto_assign_jobs(self, request):
+        """
+        POST: accoda un auto-assign per il worker (run_assignment_worker) e
+        risponde subito 202 con il job. Parametri come /auto-assign/
+        (strategy, reset_previous) più strategy='INCREMENTAL' con
+        max_repair_moves e dry_run.
+        GET: ultimi job (?kind=simulation|execution|incremental) con i
+        risultati senza log, per confrontare le simulazioni.
+        """
+        if request.method == 'GET':
+            jobs = AssignmentJob.objects.all()
+            kind = request.query_params.get('kind')
+            if kind:
+                jobs = jobs.filter(kind=kind)
+            return Response(AssignmentJobSummarySerializer(jobs[:20], many=True).data)
+
+        try:
+            job = assignment_jobs.submit(
+                strategy=request.data.get('strategy', 'SIMULATION'),
+                reset_previous=request.data.get('reset_previous', False),
+                max_repair_moves=request.data.get('max_repair_moves', 0),
+                dry_run=request.data.get('dry_run', False),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(AssignmentJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'auto-assign/jobs/(?P<job_id>\d+)')
+    def auto_assign_job(self, request, job_id=None):
+        """Stato, avanzamento e risultati (anche parziali) di un job."""
+        job = get_object_or_404(AssignmentJob, pk=job_id)
+        return Response(AssignmentJobSerializer(job).data)
+
+    @action(detail=False, methods=['post'], url_path=r'auto-assign/jobs/(?P<job_id>\d+)/cancel')
+    def auto_assign_job_cancel(self, request, job_id=None):
+        job = get_object_or_404(AssignmentJob, pk=job_id)
+        if not assignment_jobs.cancel(job):
+            return Response({'error': 'Job already finished'}, status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        return Response(AssignmentJobSerializer(job).data)
+
+
 class SupplierTypeViewSet(viewsets.ModelViewSet):
     """CRUD per i tipi di fornitore"""
     queryset = SupplierType.objects.all().order_by('name')
@@ -1075,7 +1203,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
 class DashboardStatsView(APIView):
     """Statistiche dashboard (solo admin) - UPDATED to exclude not_coming guests"""
     def get(self, request):
-        config, _ = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         
         confirmed_invitations = Invitation.objects.filter(status=Invitation.Status.CONFIRMED)
         pending_invitations = Invitation.objects.filter(status__in=[Invitation.Status.IMPORTED, Invitation.Status.CREATED, Invitation.Status.SENT, Invitation.Status.READ])
@@ -1235,12 +1363,12 @@ class DashboardStatsView(APIView):
 
 class GlobalConfigViewSet(viewsets.ViewSet):
     def list(self, request):
-        config, created = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         serializer = GlobalConfigSerializer(config)
         return Response(serializer.data)
 
     def create(self, request):
-        config, created = GlobalConfig.objects.get_or_create(pk=1)
+        config = GlobalConfig.load()
         serializer = GlobalConfigSerializer(config, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
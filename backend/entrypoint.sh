@@ -15,8 +15,10 @@ run_as_appuser() {
 # Se siamo root e esiste appuser, fixiamo permessi delle cartelle critiche
 if [ "$(id -u)" = "0" ] && id "appuser" > /dev/null 2>&1; then
     echo "Fixing permissions for appuser..."
-    mkdir -p /app/staticfiles /app/media
-    chown -R appuser:appuser /app/staticfiles /app/media
+    # La cache (volume condiviso tra backend e worker) nasce di root
+    CACHE_DIR="${CACHE_LOCATION:-/tmp/wedding_cache}"
+    mkdir -p /app/staticfiles /app/media "$CACHE_DIR"
+    chown -R appuser:appuser /app/staticfiles /app/media "$CACHE_DIR"
 fi
 
 echo "Waiting for PostgreSQL..."
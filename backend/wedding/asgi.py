@@ -3,6 +3,14 @@ ASGI config for wedding project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Opt-in: la produzione resta su WSGI (wedding.wsgi) finché il confronto con
+tests/load_test_connections.py --compare non mostra un guadagno misurato.
+Per provarlo:
+    gunicorn wedding.asgi:application -k uvicorn_worker.UvicornWorker --workers 4
+
+Importare questo modulo attiva settings.ASGI_MODE: gli endpoint pubblici
+auth/texts/log-interaction/log-heatmap usano le view async di core.views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -12,5 +20,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wedding.settings')
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
@@ -39,9 +39,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestMemoMiddleware',  # Memo per-richiesta (GlobalConfig & co.)
     'core.middleware.JsonExceptionMiddleware',  # Custom Error Handler for API
 ]
 
+# Server ASGI (opt-in, wedding/asgi.py imposta DJANGO_ASGI=True): le view
+# pubbliche ad alto traffico sono servite dalle versioni async. WhiteNoise resta
+# attivo anche qui (Django lo adatta su un thread) per servire /static/.
+ASGI_MODE = os.environ.get('DJANGO_ASGI', 'False') == 'True'
+
 ROOT_URLCONF = 'wedding.urls'
 
 TEMPLATES = [
@@ -86,6 +92,20 @@ DATABASES = {
     'default': db_config
 }
 
+# ========================================
+# Cache (condivisa tra i worker gunicorn)
+# ========================================
+# FileBasedCache su filesystem locale del container: tutti i worker vedono
+# le stesse chiavi senza servizi esterni. Sovrascrivibile via ENV (es. LocMem).
+# core.cache versiona e invalida i dati condivisi: backend e worker devono usare
+# la stessa cache (in compose un volume comune montato su CACHE_LOCATION)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', '/tmp/wedding_cache'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -146,6 +166,28 @@ SESSION_COOKIE_SECURE = not DEBUG  # True in produzione (HTTPS only)
 SESSION_COOKIE_SAMESITE = 'Lax'  # Protezione CSRF
 SESSION_SAVE_EVERY_REQUEST = False  # Risparmia write DB
 
+# Autenticazione ospiti Public API (vedi core/guest_auth.py):
+# - 'session': invitation_id nella sessione DB (default)
+# - 'signed': cookie firmato HMAC con scadenza, verificato senza query DB
+GUEST_AUTH_MODE = os.environ.get('GUEST_AUTH_MODE', 'session')
+GUEST_TOKEN_MAX_AGE = SESSION_COOKIE_AGE
+
+# Buffer write-behind per il tracking ospiti (vedi core/ingest.py)
+INTERACTION_BUFFER_MAX_SIZE = int(os.environ.get('INTERACTION_BUFFER_MAX_SIZE', 5000))
+INTERACTION_BUFFER_BATCH_SIZE = 200
+INTERACTION_BUFFER_FLUSH_INTERVAL = float(os.environ.get('INTERACTION_BUFFER_FLUSH_INTERVAL', 2.0))
+
+# Simulazione auto-assign (vedi core/assignment.py): processi del pool nel
+# run_assignment_worker (0/1 = in linea; i worker web girano sempre in linea)
+# e timeout per strategia in secondi
+AUTO_ASSIGN_WORKERS = int(os.environ.get('AUTO_ASSIGN_WORKERS', min(os.cpu_count() or 1, 7)))
+AUTO_ASSIGN_TIMEOUT = float(os.environ.get('AUTO_ASSIGN_TIMEOUT', 20.0))
+# Budget della ricerca esatta (strategia OPTIMAL): oltre si tiene la soluzione migliore trovata
+AUTO_ASSIGN_OPTIMAL_BUDGET = float(os.environ.get('AUTO_ASSIGN_OPTIMAL_BUDGET', 5.0))
+
+# Finestra di deduplicazione RSVP (Idempotency-Key / fingerprint payload), in secondi
+RSVP_IDEMPOTENCY_TTL = 600
+
 # ========================================
 # CSRF Configuration
 # ========================================
@@ -5,22 +5,38 @@ from core.views import (
     # Admin Views
     InvitationViewSet, GlobalConfigViewSet, DashboardStatsView, AccommodationViewSet, 
     WhatsAppTemplateViewSet, ConfigurableTextViewSet, AdminGoogleFontsProxyView,
-    InvitationLabelViewSet,
+    InvitationLabelViewSet, AdminHeatmapGridView, AdminExportView,
     SupplierViewSet, SupplierTypeViewSet,
     # Public Views
     PublicInvitationAuthView, PublicRSVPView,
     PublicLogInteractionView, PublicLogHeatmapView, PublicConfigurableTextView,
-    PublicLanguagesView
+    PublicLanguagesView,
+    # Public Views async (ASGI)
+    AsyncPublicInvitationAuthView, AsyncPublicLogInteractionView,
+    AsyncPublicLogHeatmapView, AsyncPublicConfigurableTextView,
 )
 # Importa WhatsApp ViewSet dal modulo corretto
 from whatsapp.views import WhatsAppMessageQueueViewSet, WhatsAppMessageEventViewSet
 from core.dashboard import DynamicDashboardStatsView
 
+from django.conf import settings
 from django.http import HttpResponse
 
 def health_check(request):
     return HttpResponse("OK")
 
+# Sotto ASGI gli endpoint pubblici ad alto traffico usano le view async
+if settings.ASGI_MODE:
+    public_auth_view = AsyncPublicInvitationAuthView.as_view()
+    public_log_interaction_view = AsyncPublicLogInteractionView.as_view()
+    public_log_heatmap_view = AsyncPublicLogHeatmapView.as_view()
+    public_texts_view = AsyncPublicConfigurableTextView.as_view()
+else:
+    public_auth_view = PublicInvitationAuthView.as_view()
+    public_log_interaction_view = PublicLogInteractionView.as_view()
+    public_log_heatmap_view = PublicLogHeatmapView.as_view()
+    public_texts_view = PublicConfigurableTextView.as_view()
+
 # ========================================
 # ADMIN ROUTER (Intranet Only)
 # ========================================
@@ -57,6 +73,8 @@ urlpatterns = [
     path('api/admin/', include(admin_router.urls)),
     path('api/admin/dashboard/stats/', DashboardStatsView.as_view(), name='admin-dashboard-stats'),
     path('api/admin/dashboard/dynamic-stats/', DynamicDashboardStatsView.as_view(), name='admin-dashboard-dynamic-stats'),
+    path('api/admin/heatmaps/grid/', AdminHeatmapGridView.as_view(), name='admin-heatmap-grid'),
+    path('api/admin/export/', AdminExportView.as_view(), name='admin-export'),
     # 6. Lingue Disponibili (pubblico)
     path('api/admin/languages/', PublicLanguagesView.as_view(), name='public-languages'),
     
@@ -75,17 +93,17 @@ urlpatterns = [
     # ========================================
     
     # 1. Autenticazione Iniziale (valida code + token, crea sessione)
-    path('api/public/auth/', PublicInvitationAuthView.as_view(), name='public-auth'),
+    path('api/public/auth/', public_auth_view, name='public-auth'),
         
     # 3. RSVP - Conferma/Declino (richiede sessione attiva)
     path('api/public/rsvp/', PublicRSVPView.as_view(), name='public-rsvp'),
     
     # 4. Analytics & Tracking
-    path('api/public/log-interaction/', PublicLogInteractionView.as_view(), name='public-log-interaction'),
-    path('api/public/log-heatmap/', PublicLogHeatmapView.as_view(), name='public-log-heatmap'),
+    path('api/public/log-interaction/', public_log_interaction_view, name='public-log-interaction'),
+    path('api/public/log-heatmap/', public_log_heatmap_view, name='public-log-heatmap'),
     
     # 5. Testi Configurabili (pubblico read-only per Home/Landing)
-    path('api/public/texts/', PublicConfigurableTextView.as_view(), name='public-texts'),
+    path('api/public/texts/', public_texts_view, name='public-texts'),
 
     # 6. Lingue Disponibili (pubblico)
     path('api/public/languages/', PublicLanguagesView.as_view(), name='public-languages'),
@@ -62,7 +62,9 @@ class Command(BaseCommand):
             time.sleep(int(os.getenv('WAHA_WORKER_INTERVAL', 60)))
 
     def process_queue(self):
-        config = GlobalConfig.objects.first()
+        # Letta dal DB a ogni giro, non da GlobalConfig.load(): le modifiche
+        # dell'admin (rate limit) valgono subito anche in questo container
+        config = GlobalConfig.objects.order_by('pk').first()
         if not config:
             return
 
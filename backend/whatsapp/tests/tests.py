@@ -85,6 +85,42 @@ class WhatsAppWorkerTest(TestCase):
         self.assertEqual(msg.status, WhatsAppMessageQueue.Status.SENT)
         self.assertIsNotNone(msg.sent_at)
 
+    @patch('whatsapp.management.commands.run_whatsapp_worker.requests.post')
+    def test_process_queue_without_saved_config(self, mock_post):
+        # GlobalConfig.load() ritorna i default non salvati: il worker non invia
+        self.config.delete()
+        msg = WhatsAppMessageQueue.objects.create(
+            session_type='groom',
+            recipient_number='123456789',
+            message_body='Hello',
+            status=WhatsAppMessageQueue.Status.PENDING
+        )
+
+        self.cmd.process_queue()
+
+        mock_post.assert_not_called()
+        self.assertFalse(msg.events.exists())
+        msg.refresh_from_db()
+        self.assertEqual(msg.status, WhatsAppMessageQueue.Status.PENDING)
+
+    @patch('whatsapp.management.commands.run_whatsapp_worker.requests.post')
+    def test_process_queue_reads_config_from_db(self, mock_post):
+        # Modifica fatta da un altro container: la cache locale non è stata invalidata
+        GlobalConfig.load()
+        GlobalConfig.objects.filter(pk=self.config.pk).update(whatsapp_rate_limit=0)
+        msg = WhatsAppMessageQueue.objects.create(
+            session_type='groom',
+            recipient_number='123456789',
+            message_body='Hello',
+            status=WhatsAppMessageQueue.Status.PENDING
+        )
+
+        self.cmd.process_queue()
+
+        mock_post.assert_not_called()
+        msg.refresh_from_db()
+        self.assertEqual(msg.status, WhatsAppMessageQueue.Status.SKIPPED)
+
     @patch('whatsapp.management.commands.run_whatsapp_worker.requests.post')
     def test_rate_limiting_logic(self, mock_post):
         # Create 2 SENT messages in the last hour
@@ -324,6 +324,30 @@ describe('API Service', () => {
       );
     });
 
+    it('auto-assign job calls use the jobs endpoints', async () => {
+      globalThis.fetch.mockResolvedValue(mockResponse({ id: 7, status: 'pending' }));
+      await api.submitAutoAssignJob(true, 'SIMULATION');
+      expect(globalThis.fetch).toHaveBeenCalledWith(
+        expect.stringContaining('/accommodations/auto-assign/jobs/'),
+        expect.objectContaining({
+          method: 'POST',
+          body: JSON.stringify({ reset_previous: true, strategy: 'SIMULATION' })
+        })
+      );
+
+      await api.fetchAutoAssignJob(7);
+      expect(globalThis.fetch).toHaveBeenLastCalledWith(
+        expect.stringContaining('/accommodations/auto-assign/jobs/7/'),
+        expect.anything()
+      );
+
+      await api.cancelAutoAssignJob(7);
+      expect(globalThis.fetch).toHaveBeenLastCalledWith(
+        expect.stringContaining('/accommodations/auto-assign/jobs/7/cancel/'),
+        expect.objectContaining({ method: 'POST' })
+      );
+    });
+
     it('fetchUnassignedInvitations calls correct endpoint', async () => {
       globalThis.fetch.mockResolvedValue(mockResponse([]));
       await api.fetchUnassignedInvitations();
@@ -1,5 +1,5 @@
 import { AlertTriangle, BarChart2, Loader, Sparkles, X } from 'lucide-react';
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { useTranslation } from 'react-i18next';
 import { useConfirm } from '../../contexts/ConfirmDialogContext';
 import { api } from '../../services/api';
@@ -11,29 +11,58 @@ const STRATEGIES = [
     { code: 'PERFECT_MATCH', label: 'Perfect Match Only' },
     { code: 'SMALLEST_FIRST', label: 'Smallest First' },
     { code: 'AFFINITY_CLUSTER', label: 'Affinity Cluster' },
+    { code: 'OPTIMAL', label: 'Optimal (Branch & Bound)' },
 ];
 
+// La simulazione gira come job nel worker (parallela, fuori dal worker web): polling dello stato
+const POLL_INTERVAL_MS = 1000;
+const FINAL_STATUSES = ['completed', 'failed', 'cancelled'];
+
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const AutoAssignStrategyModal = ({ isOpen, onClose, onSuccess, onError }) => {
     const { confirm } = useConfirm();
     const { t } = useTranslation();
     const [step, setStep] = useState('SIMULATE'); // SIMULATE | RESULTS
     const [isLoading, setIsLoading] = useState(false);
     const [simResults, setSimResults] = useState([]);
+    const [progress, setProgress] = useState(null);
+    const jobRef = useRef(null); // id del job in corso, annullato se la modale viene chiusa
 
     if (!isOpen) return null;
 
     const runSimulation = async () => {
         setIsLoading(true);
         try {
-            // Trigger auto-assign in SIMULATION mode
-            const response = await api.triggerAutoAssign(true, 'SIMULATION');
-            setSimResults(response.results);
+            let job = await api.submitAutoAssignJob(true, 'SIMULATION');
+            jobRef.current = job.id;
+            while (!FINAL_STATUSES.includes(job.status)) {
+                setProgress({ done: job.progress_done, total: job.progress_total });
+                await wait(POLL_INTERVAL_MS);
+                if (jobRef.current !== job.id) return; // modale chiusa nel frattempo
+                job = await api.fetchAutoAssignJob(job.id);
+            }
+            jobRef.current = null;
+            if (job.status !== 'completed') {
+                throw new Error(job.error || job.status);
+            }
+            setSimResults(job.results);
             setStep('RESULTS');
         } catch (err) {
+            jobRef.current = null;
             onError(err);
         } finally {
             setIsLoading(false);
+            setProgress(null);
+        }
+    };
+
+    const handleClose = () => {
+        if (jobRef.current) {
+            api.cancelAutoAssignJob(jobRef.current).catch(() => {});
+            jobRef.current = null;
         }
+        onClose();
     };
 
     const applyStrategy = async (strategyCode) => {
@@ -71,7 +100,7 @@ const AutoAssignStrategyModal = ({ isOpen, onClose, onSuccess, onError }) => {
                             <p className="text-sm text-gray-500">{t('admin.accommodations.auto_assign_modal.subtitle')}</p>
                         </div>
                     </div>
-                    <button onClick={onClose} className="text-gray-400 hover:text-gray-600 transition-colors">
+                    <button onClick={handleClose} className="text-gray-400 hover:text-gray-600 transition-colors">
                         <X size={24} />
                     </button>
                 </div>
@@ -94,7 +123,9 @@ const AutoAssignStrategyModal = ({ isOpen, onClose, onSuccess, onError }) => {
                                     {isLoading ? (
                                         <>
                                             <Loader className="animate-spin h-5 w-5 text-white" />
-                                            {t('common.loading')}
+                                            {progress
+                                                ? t('admin.accommodations.auto_assign_modal.simulation.progress', progress)
+                                                : t('common.loading')}
                                         </>
                                     ) : (
                                         <>
@@ -152,6 +183,18 @@ const AutoAssignStrategyModal = ({ isOpen, onClose, onSuccess, onError }) => {
                                                     <span className="text-gray-500">{t('admin.accommodations.auto_assign_modal.results.wasted_beds')}:</span>
                                                     <span className="font-bold text-orange-600">{res.wasted_beds}</span>
                                                 </div>
+                                                {res.optimality_gap !== undefined && (
+                                                    <div className="flex justify-between">
+                                                        <span className="text-gray-500">{t('admin.accommodations.auto_assign_modal.results.optimality_gap')}:</span>
+                                                        <span
+                                                            className={`font-semibold ${res.optimality_gap > 0 ? 'text-orange-600' : 'text-green-600'}`}
+                                                            title={res.optimality_gap_trivial ? t('admin.accommodations.auto_assign_modal.results.optimality_gap_trivial') : undefined}
+                                                        >
+                                                            {res.optimality_gap_exact === false ? `≤ ${res.optimality_gap}` : res.optimality_gap}
+                                                            {res.optimality_gap_trivial && ' *'}
+                                                        </span>
+                                                    </div>
+                                                )}
                                             </div>
 
                                             <button
@@ -231,6 +231,28 @@ export const api = {
     });
   },
 
+  // Job in background: la simulazione gira nel worker, il client fa polling
+  submitAutoAssignJob: async (resetPrevious = false, strategy = 'SIMULATION') => {
+    return fetchClient(`${API_BASE_URL}/accommodations/auto-assign/jobs/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        reset_previous: resetPrevious,
+        strategy: strategy
+      })
+    });
+  },
+
+  fetchAutoAssignJob: async (jobId) => {
+    return fetchClient(`${API_BASE_URL}/accommodations/auto-assign/jobs/${jobId}/`);
+  },
+
+  cancelAutoAssignJob: async (jobId) => {
+    return fetchClient(`${API_BASE_URL}/accommodations/auto-assign/jobs/${jobId}/cancel/`, {
+      method: 'POST'
+    });
+  },
+
   fetchUnassignedInvitations: async () => {
     return fetchClient(`${API_BASE_URL}/accommodations/unassigned-invitations/`);
   },
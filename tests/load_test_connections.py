@@ -7,20 +7,32 @@ Script per verificare la risoluzione del problema "too many clients" su PostgreS
 Simula 100 richieste concorrenti all'endpoint di autenticazione per testare il pooling
 con pgBouncer.
 
+Modalità --compare: confronta throughput e latenze (p50/p99) degli endpoint
+pubblici (auth, texts, log-interaction, log-heatmap) tra due backend con lo
+stesso numero di worker, es. WSGI (worker sync) vs ASGI (worker uvicorn):
+
+    docker compose run -d -p 8001:8000 backend \
+        gunicorn wedding.wsgi:application --bind 0.0.0.0:8000 --workers 4
+    docker compose run -d -p 8002:8000 backend \
+        gunicorn wedding.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:8000 --workers 4
+    python tests/load_test_connections.py --compare http://localhost:8001 http://localhost:8002
+
 Usage:
     export TEST_CODE="test-load-user"
     export TEST_TOKEN="valid-token-from-backend"
     python tests/load_test_connections.py
+    python tests/load_test_connections.py --compare WSGI_URL ASGI_URL [--requests 500] [--workers 100]
 
 Requirements:
     pip install requests
 """
 
+import argparse
 import requests
 import time
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 # Configurazione Test
 BASE_URL = "http://localhost/api/public/auth/"
@@ -137,8 +149,120 @@ def run_load_test():
     return errors_5xx == 0 and errors_network == 0
 
 
+# ==============================================
+# Benchmark comparativo WSGI vs ASGI
+# ==============================================
+
+COMPARE_ENDPOINTS = ("auth", "texts", "log-interaction", "log-heatmap")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile nearest-rank (pct in 0..100)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def guest_cookies(base_url: str) -> Dict[str, str]:
+    """Autentica una volta l'ospite di test: i cookie servono agli endpoint di tracking."""
+    response = requests.post(f"{base_url}/api/public/auth/", json=TEST_PAYLOAD, timeout=30)
+    if response.status_code != 200:
+        print(f"⚠️  Auth on {base_url} returned {response.status_code}: tracking calls will get 401")
+    return response.cookies.get_dict()
+
+
+def endpoint_request(base_url: str, endpoint: str, cookies: Dict[str, str], request_id: int) -> Tuple[int, float]:
+    """Una richiesta all'endpoint pubblico; ritorna (status_code, elapsed)."""
+    url = f"{base_url}/api/public/{endpoint}/"
+    start_time = time.perf_counter()
+    try:
+        if endpoint == "auth":
+            response = requests.post(url, json=TEST_PAYLOAD, timeout=30)
+        elif endpoint == "texts":
+            response = requests.get(url, params={"lang": "it"}, timeout=30)
+        elif endpoint == "log-interaction":
+            response = requests.post(url, json={
+                "event_type": "load_test", "metadata": {"request_id": request_id}
+            }, cookies=cookies, timeout=30)
+        else:
+            response = requests.post(url, json={
+                "session_id": f"load-{request_id}",
+                "screen_width": 1920, "screen_height": 1080,
+                "mouse_data": [{"x": i, "y": i, "t": 1_760_000_000_000 + i * 100} for i in range(50)],
+            }, cookies=cookies, timeout=30)
+        return response.status_code, time.perf_counter() - start_time
+    except requests.RequestException:
+        return 0, time.perf_counter() - start_time
+
+
+def measure_endpoint(base_url: str, endpoint: str, cookies: Dict[str, str], num_requests: int, max_workers: int) -> Dict:
+    """Lancia num_requests richieste concorrenti e riassume throughput/latenze."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        start_total = time.perf_counter()
+        futures = [executor.submit(endpoint_request, base_url, endpoint, cookies, i) for i in range(num_requests)]
+        results = [future.result() for future in as_completed(futures)]
+        total_time = time.perf_counter() - start_total
+
+    latencies = [elapsed for _, elapsed in results]
+    return {
+        "rps": num_requests / total_time,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "errors": sum(1 for code, _ in results if code == 0 or code >= 500),
+    }
+
+
+def run_comparison(baseline_url: str, candidate_url: str, num_requests: int, max_workers: int, endpoints: List[str]) -> bool:
+    """Stesso carico su entrambi i backend, endpoint per endpoint."""
+    print("═" * 78)
+    print("⚖️  Public API - WSGI vs ASGI Comparative Load Test")
+    print("═" * 78)
+    print(f"Baseline:  {baseline_url}")
+    print(f"Candidate: {candidate_url}")
+    print(f"Requests per endpoint: {num_requests} | Client threads: {max_workers}")
+    print("═" * 78)
+
+    targets = {"baseline": baseline_url, "candidate": candidate_url}
+    cookies = {name: guest_cookies(url) for name, url in targets.items()}
+    ok = True
+
+    print(f"\n{'Endpoint':<16}{'Target':<11}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    print("─" * 65)
+    for endpoint in endpoints:
+        stats = {}
+        for name, url in targets.items():
+            stats[name] = measure_endpoint(url, endpoint, cookies[name], num_requests, max_workers)
+            row = stats[name]
+            ok = ok and row["errors"] == 0
+            print(f"{endpoint:<16}{name:<11}{row['rps']:>10.1f}{row['p50'] * 1000:>10.1f}"
+                  f"{row['p99'] * 1000:>10.1f}{row['errors']:>8}")
+        base, cand = stats["baseline"], stats["candidate"]
+        print(f"{'':<16}{'Δ':<11}{(cand['rps'] / base['rps'] - 1) * 100:>+9.1f}%"
+              f"{'':>10}{(cand['p99'] / base['p99'] - 1) * 100:>+9.1f}%")
+        print("─" * 65)
+
+    print("\n✅ No server errors." if ok else "\n❌ Server/network errors detected: check backend logs.")
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test degli endpoint pubblici")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE_URL", "CANDIDATE_URL"),
+                        help="Confronta due backend (es. WSGI vs ASGI) allo stesso numero di worker")
+    parser.add_argument("--requests", type=int, default=NUM_REQUESTS, help="Richieste per endpoint")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Thread client concorrenti")
+    parser.add_argument("--endpoints", default=",".join(COMPARE_ENDPOINTS),
+                        help="Endpoint da confrontare, separati da virgola")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
+        if args.compare:
+            endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip() in COMPARE_ENDPOINTS]
+            success = run_comparison(*(url.rstrip("/") for url in args.compare), args.requests, args.workers, endpoints)
+            exit(0 if success else 1)
         success = run_load_test()
         exit(0 if success else 1)
     except KeyboardInterrupt: